@@ -0,0 +1,141 @@
+"""Command-line admin tools, run against the configured database.
+
+Usage (from backend/):
+    python -m app.cli export users --format csv --output users.csv
+    python -m app.cli export calls --since 2026-01-01 --until 2026-02-01 --output calls.ndjson
+    python -m app.cli export calls --since 2026-01-01 --until 2026-02-01 --output calls.ndjson --resume
+    python -m app.cli provision roster.csv --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from app.core.database import SessionLocal
+from app.utils.exports import (
+    EXPORT_DATASETS, EXPORT_FORMATS, decode_export_cursor, export_cursor_for, stream_export
+)
+from app.utils.provisioning import provision_users
+
+
+def _last_complete_record(path: str, export_format: str) -> tuple[dict | None, int]:
+    """The last complete row of a partial export file and the byte offset just past it.
+
+    An interrupted export can end in a cut-off row; it is not counted. A CSV file
+    with no complete row reports offset 0 so the header is written again.
+    """
+    last, end = None, 0
+    with open(path, "rb") as f:
+        if export_format == "ndjson":
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    last = json.loads(line)
+                end = f.tell()
+            return last, end
+
+        position = {"end": 0, "complete": False}
+
+        def lines():
+            for line in iter(f.readline, b""):
+                position["end"], position["complete"] = f.tell(), line.endswith(b"\n")
+                yield line.decode("utf-8")
+
+        # strict: a quoted field cut off at the end of the file is an error, not a row
+        reader = csv.reader(lines(), strict=True)
+        try:
+            header = next(reader, None)
+            if header is None or not position["complete"]:
+                return None, 0
+            for row in reader:
+                if not position["complete"] or len(row) != len(header):
+                    break
+                last, end = dict(zip(header, row)), position["end"]
+        except csv.Error:
+            pass
+    return last, end
+
+
+def export(args: argparse.Namespace) -> int:
+    after = decode_export_cursor(args.cursor) if args.cursor else None
+    mode = "w"
+    if args.resume and os.path.exists(args.output):
+        record, end = _last_complete_record(args.output, args.format)
+        if record is not None:
+            after = decode_export_cursor(export_cursor_for(args.dataset, record))
+            mode = "a"
+        with open(args.output, "r+b") as f:
+            f.truncate(end)
+
+    out = open(args.output, mode, newline="", encoding="utf-8") if args.output else sys.stdout
+    db = SessionLocal()
+    try:
+        for chunk in stream_export(db, args.dataset, args.format, args.since, args.until, after, args.batch_size):
+            out.write(chunk)
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def provision(args: argparse.Namespace) -> int:
+    roster = open(args.roster, newline="", encoding="utf-8-sig") if args.roster != "-" else sys.stdin
+    db = SessionLocal()
+    try:
+        result = provision_users(db, roster, args.batch_size, args.workers)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+        if roster is not sys.stdin:
+            roster.close()
+    for error in result.errors:
+        print(error, file=sys.stderr)
+    print(
+        f"created {result.created}, skipped {result.skipped} in {result.seconds:.2f}s "
+        f"({result.rows_per_second:.0f} rows/s)"
+    )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="stream a table as CSV or NDJSON")
+    export_parser.add_argument("dataset", choices=sorted(EXPORT_DATASETS))
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    export_parser.add_argument("--since", type=datetime.fromisoformat, help="include rows at or after this time")
+    export_parser.add_argument("--until", type=datetime.fromisoformat, help="include rows before this time")
+    export_parser.add_argument("--cursor", help="continue after the row this cursor points at")
+    export_parser.add_argument("--output", help="file to write (default: stdout)")
+    export_parser.add_argument("--resume", action="store_true",
+                               help="continue an interrupted export after the last complete row in --output")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser.set_defaults(handler=export)
+
+    provision_parser = commands.add_parser("provision", help="create student accounts from a CSV roster")
+    provision_parser.add_argument("roster", help="CSV with columns email, username, full_name, password (- for stdin)")
+    provision_parser.add_argument("--batch-size", type=int, help="rows per transaction (default: PROVISION_BATCH_SIZE)")
+    provision_parser.add_argument("--workers", type=int, help="password hashing threads (default: PROVISION_HASH_WORKERS)")
+    provision_parser.set_defaults(handler=provision)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "resume", False) and not args.output:
+        parser.error("--resume needs --output")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
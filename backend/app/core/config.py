@@ -11,11 +11,26 @@ class Settings(BaseSettings):
     # JWT
     SECRET_KEY: str = "change-this-to-a-strong-random-key-in-production-min-32-chars"
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Access tokens are checked from claims alone, so keep them short; clients renew
+    # them with a rotating refresh token
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    # Bloom filter of sessions revoked within the last access token lifetime
+    REVOCATION_FILTER_BITS: int = 1 << 20
+    REVOCATION_FILTER_HASHES: int = 4
     
-    # Email - SendGrid
+    # Email
     SENDGRID_API_KEY: str = ""
     EMAIL_FROM: str = ""
+    # Outbox delivery: sendgrid / log / file (empty = sendgrid when SENDGRID_API_KEY is set, else log)
+    EMAIL_TRANSPORT: str = ""
+    EMAIL_FILE_PATH: str = "outbox_emails.jsonl"
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_CONCURRENCY: int = 10
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 5
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS: float = 5.0
+    EMAIL_OUTBOX_LEASE_SECONDS: float = 60.0
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0
     FRONTEND_URL: str = "http://localhost:3000"
     
     # Server
@@ -26,10 +41,73 @@ class Settings(BaseSettings):
     ALLOWED_HOSTS: List[str] | str = Field(default_factory=lambda: ["localhost", "127.0.0.1"])
     ALLOWED_ORIGINS: List[str] | str = Field(default_factory=lambda: ["http://localhost:3000", "http://localhost:3001", "http://localhost:5173"])
     
+    # Process-local cache of verified token claims and user snapshots for get_current_user
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    
+    # Process-local block graph (who each user blocked / is blocked by); blocks made
+    # by other workers are picked up when an entry expires
+    BLOCK_GRAPH_MAX_USERS: int = 50000
+    BLOCK_GRAPH_TTL_SECONDS: int = 300
+    # /calls/available pages are cut from a shared snapshot rebuilt at most this often
+    AVAILABLE_USERS_SNAPSHOT_SECONDS: float = 2.0
+    # In-process search index (non-Postgres databases only) is rebuilt this often
+    USER_SEARCH_INDEX_SECONDS: int = 300
+    # ETags on polled GETs come from process-local change counters; they roll over
+    # this often so a change made by another worker is never hidden for longer
+    ETAG_MAX_AGE_SECONDS: int = 60
+    # Most ids accepted by one GET /users/batch
+    USER_BATCH_MAX_IDS: int = 50
+    # Moderation: a user is suppressed (hidden from availability and matching) once
+    # reports within any window reach its threshold, as {window hours: reports}
+    REPORT_SUPPRESSION_THRESHOLDS: dict[int, int] = {24: 5, 168: 10}
+    # The cached suppressed set is reloaded this often to pick up other workers' changes
+    SUPPRESSED_USERS_REFRESH_SECONDS: int = 30
+    
+    # Login OTPs: memory (process-local, single worker) or sql (login_otps table)
+    OTP_STORE: str = "memory"
+    LOGIN_OTP_TTL_SECONDS: int = 600
+    LOGIN_OTP_MAX_ATTEMPTS: int = 5
+    
+    # bcrypt runs on a bounded thread pool; requests beyond MAX_PENDING get 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Bulk provisioning: roster rows per transaction, and hashing threads of its own
+    # (separate from the request pool so a large roster does not starve logins)
+    PROVISION_BATCH_SIZE: int = 500
+    PROVISION_HASH_WORKERS: int = 4
+    
     # Rate Limiting (requests per minute)
     RATE_LIMIT_AUTH: int = 10
     RATE_LIMIT_API: int = 60
     
+    # Unanswered calls are marked missed after ringing this long
+    CALL_RING_TIMEOUT_SECONDS: int = 45
+    
+    # Finished calls older than this move to calls_archive (background task, off the request path)
+    CALL_HISTORY_HOT_DAYS: int = 30
+    CALL_HISTORY_ARCHIVE_INTERVAL_SECONDS: int = 300
+    CALL_HISTORY_ARCHIVE_BATCH_SIZE: int = 1000
+    CALL_HISTORY_ARCHIVE_MAX_BATCHES: int = 20
+    CALL_HISTORY_ARCHIVE_PAUSE_SECONDS: float = 0.5
+    
+    # Periodic recount of user_call_stats to repair drift
+    CALL_STATS_RECONCILE_INTERVAL_SECONDS: int = 3600
+    CALL_STATS_RECONCILE_BATCH_SIZE: int = 1000
+    CALL_STATS_RECONCILE_PAUSE_SECONDS: float = 0.1
+    
+    # Retention job: expired/used tokens, expired OTPs, resolved reports and delivered email
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_MAX_BATCHES: int = 20
+    RETENTION_PAUSE_SECONDS: float = 0.5
+    RETENTION_EXPIRED_TOKEN_DAYS: int = 7
+    RETENTION_USED_TOKEN_DAYS: int = 1
+    RETENTION_RESOLVED_REPORT_DAYS: int = 90
+    RETENTION_SENT_EMAIL_DAYS: int = 7
+    RETENTION_FAILED_EMAIL_DAYS: int = 30
+    RETENTION_EXPIRED_REFRESH_TOKEN_DAYS: int = 1
+    
     # Sentry Error Tracking
     SENTRY_DSN: str = ""
     SENTRY_TRACES_SAMPLE_RATE: float = 0.1  # 10% of transactions
@@ -1,6 +1,7 @@
 import logging
 from sqlalchemy import create_engine
-from sqlalchemy.engine.url import make_url
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -52,6 +53,40 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def async_database_url(url: URL) -> URL:
+    """Same database through an asyncio driver (asyncpg / aiosqlite)"""
+    if url.get_backend_name() == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+# Async engine for async def routes and WebSocket handlers: queries await the driver
+# instead of blocking the event loop
+if "pooler.supabase.com" in database_url:
+    async_engine = create_async_engine(
+        async_database_url(url),
+        echo=settings.ENVIRONMENT == "development",
+        poolclass=NullPool,
+        # The transaction pooler cannot keep asyncpg's per-connection prepared statements
+        connect_args={"ssl": "require", "timeout": 10, "statement_cache_size": 0},
+        pool_pre_ping=True,
+    )
+else:
+    async_engine = create_async_engine(
+        async_database_url(url),
+        echo=settings.ENVIRONMENT == "development",
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20
+    )
+
+# expire_on_commit=False: returned objects stay readable after commit without a lazy
+# (blocking) refresh, which async sessions cannot do implicitly
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -61,3 +96,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,71 @@
+"""Version-based ETags and If-None-Match handling for polled GET endpoints"""
+import hashlib
+import secrets
+import threading
+import time
+from typing import Hashable
+
+from fastapi import Request, Response, status
+
+from app.core.config import settings
+
+
+class ChangeCounters:
+    """Process-local version numbers, bumped whenever the data behind a key changes.
+
+    Keys are tuples such as ("user", user_id) or ("calls", user_id). A key that was
+    never bumped is at version 0. Only changes made through this process are seen;
+    etag_for() mixes in a per-process nonce and a time bucket so a version can
+    never be mistaken for another process's, and anything a counter missed is
+    served fresh again within ETAG_MAX_AGE_SECONDS.
+    """
+
+    def __init__(self):
+        self._versions: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, key: Hashable) -> int:
+        return self._versions.get(key, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+change_counters = ChangeCounters()
+
+_process_nonce = secrets.token_hex(8)
+
+
+def etag_for(*parts) -> str:
+    """Strong ETag for a response identified by parts (versions, query parameters, ids)"""
+    bucket = int(time.time() // settings.ETAG_MAX_AGE_SECONDS)
+    digest = hashlib.blake2b(repr((_process_nonce, bucket, parts)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): ignore W/ prefixes
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """Tag the response with etag; return a 304 to send instead if the client's copy is current.
+
+    Call before loading or serializing the body. Cache-Control makes browsers keep
+    the body privately and revalidate it on every request.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,64 @@
+"""Process-local Bloom filter of recently revoked ids"""
+import hashlib
+import threading
+import time
+
+
+class RevocationFilter:
+    """Compact "might be revoked" set for ids that only matter for a bounded window.
+
+    Ids are added to the current generation; generations rotate every window_seconds
+    and the previous one is kept, so an id is remembered for at least window_seconds
+    (set this to the access token lifetime). might_contain() has no false negatives
+    within the window; a hit can be a false positive, so callers confirm it against
+    the database.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, window_seconds: float):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.window_seconds = window_seconds
+        self._current = bytearray((num_bits + 7) // 8)
+        self._previous = bytearray((num_bits + 7) // 8)
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.num_hashes).digest()
+        return [
+            int.from_bytes(digest[8 * i:8 * (i + 1)], "big") % self.num_bits
+            for i in range(self.num_hashes)
+        ]
+
+    def _rotate_if_due(self) -> None:
+        now = time.monotonic()
+        if now - self._rotated_at < self.window_seconds:
+            return
+        if now - self._rotated_at >= 2 * self.window_seconds:
+            self._previous = bytearray(len(self._current))
+        else:
+            self._previous = self._current
+        self._current = bytearray(len(self._previous))
+        self._rotated_at = now
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            for position in positions:
+                self._current[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            return any(
+                all(bits[position >> 3] & (1 << (position & 7)) for position in positions)
+                for bits in (self._current, self._previous)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._current = bytearray(len(self._current))
+            self._previous = bytearray(len(self._previous))
+            self._rotated_at = time.monotonic()
@@ -1,16 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, TypeVar
+import asyncio
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
 from .config import settings
-from .database import get_db
+from .database import get_async_db
+from .etag import change_counters
+from .revocation import RevocationFilter
+from app.models.user import UserRole
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Verified JWT claims by raw token, and detached User snapshots by id, so repeat
+# requests from the same client skip both signature checks and the user SELECT
+token_claims_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+# Sessions (sid claim) revoked by logout or deactivation. An access token outlives its
+# session's revocation by at most its own lifetime, which is the filter's window.
+revoked_sessions = RevocationFilter(
+    settings.REVOCATION_FILTER_BITS,
+    settings.REVOCATION_FILTER_HASHES,
+    settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+
+T = TypeVar("T")
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_in_flight = 0
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,13 +47,39 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_hashing(fn: Callable[..., T], *args) -> T:
+    """Run a bcrypt call on the hashing pool, shedding load with 503 once too many are queued"""
+    global _hash_in_flight
+    if _hash_in_flight >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    _hash_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded hashing pool (raises 503 when saturated)"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bounded hashing pool (raises 503 when saturated)"""
+    return await _run_hashing(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access", "jti": str(uuid.uuid4())})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -39,12 +92,37 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(credentials = Depends(security), db: Session = Depends(get_db)):
-    """Get current authenticated user from JWT token"""
-    token = credentials.credentials
-    payload = decode_token(token)
+def invalidate_cached_user(*user_ids: str) -> None:
+    """Drop cached user snapshots after the rows changed (profile, presence, status, blocks)"""
+    for user_id in user_ids:
+        user_cache.pop(user_id)
+    change_counters.bump(*(("user", user_id) for user_id in user_ids))
+
+
+def _decode_token_cached(token: str) -> Optional[dict]:
+    """decode_token, remembering valid claims until the token expires"""
+    payload = token_claims_cache.get(token)
+    if payload is None:
+        payload = decode_token(token)
+        if payload:
+            expires_in = payload.get("exp", 0) - datetime.utcnow().timestamp()
+            token_claims_cache.set(token, payload, expires_in)
+    return payload
+
+
+async def authenticate_access_token(db: AsyncSession, token: str) -> str:
+    """The user id of a valid, unrevoked access token; raises 401 otherwise.
+
+    Shared by get_current_user_id and the WebSocket handlers (which pass the token
+    as a query parameter and close the socket on HTTPException). The token's session
+    is checked against the in-memory revocation filter; only a filter hit (a revoked
+    session or a false positive) is confirmed with a query.
+    """
+    if token.startswith("Bearer "):
+        token = token[7:]
+    payload = _decode_token_cached(token)
     
-    if not payload:
+    if not payload or payload.get("type", "access") != "access":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
@@ -59,16 +137,68 @@ async def get_current_user(credentials = Depends(security), db: Session = Depend
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Import here to avoid circular imports
-    from app.utils.user_service import get_user_by_id
+    session_id = payload.get("sid")
+    if session_id and revoked_sessions.might_contain(session_id):
+        # Import here to avoid circular imports
+        from app.utils.token_service import is_session_revoked_async
+        
+        if await is_session_revoked_async(db, session_id):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Session has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
     
-    user = get_user_by_id(db, user_id)
+    return user_id
+
+
+async def get_current_user_id(credentials = Depends(security), db: AsyncSession = Depends(get_async_db)) -> str:
+    """Get the authenticated user's id from the verified JWT, normally without touching the database.
+
+    For endpoints that only need the id. Use get_current_user where the account's
+    current state (e.g. is_active) matters.
+    """
+    return await authenticate_access_token(db, credentials.credentials)
+
+
+async def get_current_user(user_id: str = Depends(get_current_user_id), db: AsyncSession = Depends(get_async_db)):
+    """Get current authenticated user from JWT token.
+
+    The returned user may be a cached snapshot detached from db; services that write
+    to it must re-load the row first.
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        # Import here to avoid circular imports
+        from app.utils.user_service import get_user_by_id_async
+        
+        user = await get_user_by_id_async(db, user_id)
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # Detach so later commits in this request do not expire the cached snapshot
+        db.expunge(user)
+        user_cache.set(user_id, user)
     
-    if not user:
+    if not user.is_active:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
         )
     
     return user
+
+
+async def get_current_admin(user = Depends(get_current_user)):
+    """get_current_user, restricted to admins"""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return user
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.openapi.utils import get_openapi
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from starlette.middleware.base import BaseHTTPMiddleware
 import asyncio
 import logging
@@ -11,11 +12,22 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from sqlalchemy import text
 from app.core.config import settings
-from app.core.database import Base, engine, SessionLocal
+from app.core.database import Base, engine, async_engine, SessionLocal
 from app.core.limiter import limiter
 from app.core.sentry import init_sentry
-from app.routes import auth, users, calls, webrtc
-from app.models.user import User, Call, BlockedUser, Report, VerificationToken
+from app.routes import auth, users, calls, webrtc, dashboard, admin
+from app.models.user import (
+    User, Call, CallArchive, UserCallStats, BlockedUser, Report, UserReportStats, ReportCountBucket, VerificationToken, EmailOutbox
+)
+from app.utils.call_service import (
+    archive_call_history, reconcile_user_call_stats, active_call_index, expire_pending_calls, schedule_pending_call_timeouts
+)
+from app.utils.call_timeouts import pending_call_timeouts
+from app.utils.email_outbox import email_outbox_worker, create_email_transport
+from app.utils.moderation import suppressed_users
+from app.utils.otp_store import otp_store, MemoryOTPStore
+from app.utils.retention import default_retention_policies, run_retention
+from app.utils.token_service import load_recent_revocations
 
 
 # Custom CORS middleware that handles OPTIONS first
@@ -48,7 +60,7 @@ class CORSPreflight(BaseHTTPMiddleware):
             if origin_allowed:
                 response.headers["Access-Control-Allow-Origin"] = origin
             response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-            response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type, Accept, Origin, X-Requested-With"
+            response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type, Accept, Origin, X-Requested-With, If-None-Match"
             response.headers["Access-Control-Allow-Credentials"] = "true"
             response.headers["Access-Control-Max-Age"] = "3600"
             return response
@@ -58,6 +70,7 @@ class CORSPreflight(BaseHTTPMiddleware):
         if origin_allowed:
             response.headers["Access-Control-Allow-Origin"] = origin
             response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, ETag"
         return response
 
 # Initialize Sentry for error tracking
@@ -104,6 +117,14 @@ async def _init_db_with_retries() -> None:
                 db.query(User).update({User.is_online: False})
                 db.commit()
                 logger.info("All users set to offline on startup")
+                tracked = active_call_index.rebuild(db)
+                logger.info(f"Active call index rebuilt with {tracked} pending/ongoing calls")
+                ringing = schedule_pending_call_timeouts(db)
+                logger.info(f"Scheduled ring timeouts for {ringing} pending calls")
+                revoked = load_recent_revocations(db)
+                logger.info(f"Loaded {revoked} recently revoked sessions")
+                suppressed = suppressed_users.load(db)
+                logger.info(f"Loaded {suppressed} suppressed users")
             finally:
                 db.close()
             return
@@ -112,6 +133,117 @@ async def _init_db_with_retries() -> None:
             await asyncio.sleep(min(30, 2 * attempt))
 
 
+def _archive_call_history_pass() -> int:
+    db = SessionLocal()
+    try:
+        return archive_call_history(
+            db,
+            older_than=datetime.utcnow() - timedelta(days=settings.CALL_HISTORY_HOT_DAYS),
+            batch_size=settings.CALL_HISTORY_ARCHIVE_BATCH_SIZE,
+            max_batches=settings.CALL_HISTORY_ARCHIVE_MAX_BATCHES,
+            pause_seconds=settings.CALL_HISTORY_ARCHIVE_PAUSE_SECONDS,
+        )
+    finally:
+        db.close()
+
+
+async def _call_history_archive_loop() -> None:
+    """Move old finished calls to the archive in bounded batches on a worker thread, off the request path."""
+    pass_limit = settings.CALL_HISTORY_ARCHIVE_BATCH_SIZE * settings.CALL_HISTORY_ARCHIVE_MAX_BATCHES
+    while True:
+        await asyncio.sleep(settings.CALL_HISTORY_ARCHIVE_INTERVAL_SECONDS)
+        total = 0
+        try:
+            while True:
+                archived = await asyncio.to_thread(_archive_call_history_pass)
+                total += archived
+                if archived < pass_limit:
+                    break
+                await asyncio.sleep(settings.CALL_HISTORY_ARCHIVE_PAUSE_SECONDS)
+        except Exception as e:
+            logger.error(f"Call history archiving failed: {e}")
+        if total:
+            logger.info(f"Call history archiving moved {total} calls")
+
+
+def _reconcile_user_call_stats_pass() -> int:
+    db = SessionLocal()
+    try:
+        return reconcile_user_call_stats(
+            db,
+            batch_size=settings.CALL_STATS_RECONCILE_BATCH_SIZE,
+            pause_seconds=settings.CALL_STATS_RECONCILE_PAUSE_SECONDS,
+        )
+    finally:
+        db.close()
+
+
+async def _call_stats_reconcile_loop() -> None:
+    """Recount call stats on a worker thread to repair any drift from the incremental updates."""
+    while True:
+        await asyncio.sleep(settings.CALL_STATS_RECONCILE_INTERVAL_SECONDS)
+        try:
+            repaired = await asyncio.to_thread(_reconcile_user_call_stats_pass)
+        except Exception as e:
+            logger.error(f"Call stats reconciliation failed: {e}")
+            continue
+        if repaired:
+            logger.info(f"Call stats reconciliation repaired {repaired} users")
+
+
+def _retention_pass() -> dict[str, int]:
+    db = SessionLocal()
+    try:
+        reclaimed = run_retention(
+            db,
+            default_retention_policies(),
+            batch_size=settings.RETENTION_BATCH_SIZE,
+            max_batches=settings.RETENTION_MAX_BATCHES,
+            pause_seconds=settings.RETENTION_PAUSE_SECONDS,
+        )
+        if isinstance(otp_store, MemoryOTPStore):
+            reclaimed["otp_store_expired"] = otp_store.purge(db)
+        return reclaimed
+    finally:
+        db.close()
+
+
+async def _retention_loop() -> None:
+    """Delete rows past their retention policy in bounded batches on a worker thread."""
+    pass_limit = settings.RETENTION_BATCH_SIZE * settings.RETENTION_MAX_BATCHES
+    while True:
+        await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
+        try:
+            reclaimed = await asyncio.to_thread(_retention_pass)
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}")
+            continue
+        total = sum(reclaimed.values())
+        logger.info(f"Retention reclaimed {total} rows: {reclaimed}")
+        backlog = [name for name, count in reclaimed.items() if count >= pass_limit]
+        if backlog:
+            logger.warning(f"Retention hit the per-run limit for {backlog}; the rest is left for the next run")
+
+
+def _expire_pending_calls(call_ids: list[str]) -> list:
+    db = SessionLocal()
+    try:
+        return expire_pending_calls(db, call_ids)
+    finally:
+        db.close()
+
+
+async def _expire_and_notify(call_ids: list[str]) -> None:
+    """Mark due calls missed and tell callers still waiting on the call socket."""
+    missed = await asyncio.to_thread(_expire_pending_calls, call_ids)
+    for row in missed:
+        await webrtc.send_to_user(row.id, row.initiator_id, {
+            "type": "call_missed",
+            "call_id": row.id,
+            "receiver_id": row.receiver_id,
+        })
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -124,9 +256,23 @@ async def lifespan(app: FastAPI):
     else:
         await _init_db_with_retries()
 
+    archive_task = asyncio.create_task(_call_history_archive_loop())
+    timeout_task = asyncio.create_task(pending_call_timeouts.run(_expire_and_notify))
+    stats_task = asyncio.create_task(_call_stats_reconcile_loop())
+    retention_task = asyncio.create_task(_retention_loop())
+    email_transport = create_email_transport()
+    email_task = asyncio.create_task(email_outbox_worker.run(email_transport))
+
     yield
 
     # Shutdown
+    archive_task.cancel()
+    timeout_task.cancel()
+    stats_task.cancel()
+    retention_task.cancel()
+    email_task.cancel()
+    await email_transport.aclose()
+    await async_engine.dispose()
     if startup_task and not startup_task.done():
         startup_task.cancel()
     logger.info("Application shutting down...")
@@ -191,6 +337,8 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(calls.router)
 app.include_router(webrtc.router)
+app.include_router(dashboard.router)
+app.include_router(admin.router)
 
 
 @app.get("/health")
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import DDL, event, Column, String, DateTime, Boolean, Integer, Float, ForeignKey, Text, Index, UniqueConstraint, func, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 import enum
+import random
 from app.core.database import Base
 
 
@@ -35,6 +36,9 @@ class User(Base):
     role = Column(SQLEnum(UserRole), default=UserRole.STUDENT)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Uniform in [0, 1), re-rolled when the user comes online; available-users pages
+    # walk it from a random start so every online user is equally likely to be shown
+    random_key = Column(Float, nullable=False, default=random.random)
 
     # Relationships
     verification_tokens = relationship("VerificationToken",back_populates="user",cascade="all, delete-orphan")
@@ -46,6 +50,30 @@ class User(Base):
     reports_received = relationship("Report", foreign_keys="Report.reported_id", back_populates="reported")
     login_otps = relationship("LoginOTP", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Available-users sampling: only users who can be called, in random_key order
+        Index("ix_users_available_random_key", random_key,
+              postgresql_where=(is_online == True) & (is_verified == True) & (is_active == True),
+              sqlite_where=(is_online == True) & (is_verified == True) & (is_active == True)),
+        # User search (Postgres; other databases use the in-process index in user_search):
+        # trigram GIN for fuzzy and word-prefix LIKE, pattern btree for short prefixes
+        Index("ix_users_username_trgm", func.lower(username).label("username_lower"),
+              postgresql_using="gin", postgresql_ops={"username_lower": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_full_name_trgm", func.lower(full_name).label("full_name_lower"),
+              postgresql_using="gin", postgresql_ops={"full_name_lower": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_username_prefix", func.lower(username).label("username_lower"),
+              postgresql_ops={"username_lower": "text_pattern_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_full_name_prefix", func.lower(full_name).label("full_name_lower"),
+              postgresql_ops={"full_name_lower": "text_pattern_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+
+# The trigram indexes above need pg_trgm
+event.listen(
+    User.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class Call(Base):
     __tablename__ = "calls"
@@ -63,6 +91,62 @@ class Call(Base):
     initiator = relationship("User", foreign_keys=[initiator_id], back_populates="calls_initiated")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="calls_received")
 
+    __table_args__ = (
+        # Active call lookups: (initiator_id = :u OR receiver_id = :u) AND status = 'ongoing'
+        Index("ix_calls_initiator_ongoing", initiator_id,
+              postgresql_where=status == CallStatus.ONGOING, sqlite_where=status == CallStatus.ONGOING),
+        Index("ix_calls_receiver_ongoing", receiver_id,
+              postgresql_where=status == CallStatus.ONGOING, sqlite_where=status == CallStatus.ONGOING),
+        # Incoming call polling: receiver_id = :u AND status = 'pending'
+        Index("ix_calls_receiver_pending", receiver_id,
+              postgresql_where=status == CallStatus.PENDING, sqlite_where=status == CallStatus.PENDING),
+        # History ordered by coalesce(ended_at, started_at), id per participant
+        Index("ix_calls_initiator_recent", initiator_id, func.coalesce(ended_at, started_at), id),
+        Index("ix_calls_receiver_recent", receiver_id, func.coalesce(ended_at, started_at), id),
+        # Archiving finished calls oldest first
+        Index("ix_calls_finished_at", func.coalesce(ended_at, started_at)),
+    )
+
+
+class CallArchive(Base):
+    """Finished calls moved out of the hot calls table, range-partitioned by month on Postgres.
+
+    finished_at is coalesce(ended_at, started_at) at archive time: the history sort key
+    and the partition key, which is why it is part of the primary key.
+    """
+    __tablename__ = "calls_archive"
+
+    id = Column(String, primary_key=True)
+    finished_at = Column(DateTime, primary_key=True)
+    initiator_id = Column(String, ForeignKey("users.id"), nullable=False)
+    receiver_id = Column(String, ForeignKey("users.id"), nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    ended_at = Column(DateTime, nullable=True)
+    duration_seconds = Column(Integer, default=0)
+    status = Column(SQLEnum(CallStatus), nullable=False)
+    call_token = Column(String, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_calls_archive_initiator_recent", initiator_id, finished_at, id),
+        Index("ix_calls_archive_receiver_recent", receiver_id, finished_at, id),
+        {"postgresql_partition_by": "RANGE (finished_at)"},
+    )
+
+
+class UserCallStats(Base):
+    """Per-user rollup of completed calls (across calls and calls_archive).
+
+    Incremented by end_call in the same transaction as the status change and
+    periodically repaired by reconcile_user_call_stats.
+    """
+    __tablename__ = "user_call_stats"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    total_calls = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 
 class BlockedUser(Base):
     __tablename__ = "blocked_users"
@@ -76,6 +160,12 @@ class BlockedUser(Base):
     blocker = relationship("User", foreign_keys=[blocker_id], back_populates="blocked_users")
     blocked = relationship("User", foreign_keys=[blocked_id], back_populates="blocked_by")
 
+    __table_args__ = (
+        # Also serves blocker_id-only lookups through its leading column
+        UniqueConstraint("blocker_id", "blocked_id", name="uq_blocked_users_pair"),
+        Index("idx_blocked_users_blocked_id", blocked_id),
+    )
+
 
 class Report(Base):
     __tablename__ = "reports"
@@ -92,6 +182,48 @@ class Report(Base):
     reporter = relationship("User", foreign_keys=[reporter_id], back_populates="reports_made")
     reported = relationship("User", foreign_keys=[reported_id], back_populates="reports_received")
 
+    __table_args__ = (
+        # Retention: resolved reports oldest first
+        Index("ix_reports_resolved_created_at", created_at,
+              postgresql_where=is_resolved == True, sqlite_where=is_resolved == True),
+        # Admin review queue: unresolved reports oldest first, keyset on (created_at, id)
+        Index("ix_reports_open_created_at", created_at, id,
+              postgresql_where=is_resolved == False, sqlite_where=is_resolved == False),
+        # Repeat-report check: does this reporter already have an open report on this user
+        Index("ix_reports_open_pair", reported_id, reporter_id,
+              postgresql_where=is_resolved == False, sqlite_where=is_resolved == False),
+    )
+
+
+class UserReportStats(Base):
+    """Per-user report counters, updated by report_user and resolve_report in the same transaction.
+
+    suppressed_at is set when a sliding window (ReportCountBucket) crosses its
+    threshold and cleared by an admin; suppressed users are not offered to others.
+    """
+    __tablename__ = "user_report_stats"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    total_reports = Column(Integer, nullable=False, default=0)
+    open_reports = Column(Integer, nullable=False, default=0)
+    suppressed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Loading the suppressed set
+        Index("ix_user_report_stats_suppressed", user_id,
+              postgresql_where=suppressed_at.isnot(None), sqlite_where=suppressed_at.isnot(None)),
+    )
+
+
+class ReportCountBucket(Base):
+    """Reports received per user per hour; a window's count is the sum of its newest buckets"""
+    __tablename__ = "report_count_buckets"
+
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    reports = Column(Integer, nullable=False, default=0)
+
 
 class VerificationToken(Base):
     __tablename__ = "verification_tokens"
@@ -104,6 +236,13 @@ class VerificationToken(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)
 
+    __table_args__ = (
+        # Retention: expired tokens, and used tokens by age
+        Index("ix_verification_tokens_expires_at", expires_at),
+        Index("ix_verification_tokens_used_created_at", created_at,
+              postgresql_where=is_used == True, sqlite_where=is_used == True),
+    )
+
 
 class LoginOTP(Base):
     __tablename__ = "login_otps"
@@ -111,7 +250,65 @@ class LoginOTP(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="login_otps")
-    code = Column(String, nullable=False)
+    code = Column(String, nullable=False)  # keyed hash, see app.utils.otp_store
     is_used = Column(Boolean, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_login_otps_user_id", user_id),
+        # Purging expired codes
+        Index("idx_login_otps_expires_at", expires_at),
+    )
+
+
+class RefreshToken(Base):
+    """One refresh token in a login session; rotating it marks it used and adds the next one"""
+    __tablename__ = "refresh_tokens"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    session_id = Column(String, nullable=False)  # the access tokens' sid claim
+    token_hash = Column(String, unique=True, nullable=False)  # sha256 of the opaque token
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_session_id", session_id),
+        Index("ix_refresh_tokens_user_id", user_id),
+        # Startup reload of recent revocations
+        Index("ix_refresh_tokens_revoked_at", revoked_at),
+        # Retention: expired tokens
+        Index("ix_refresh_tokens_expires_at", expires_at),
+    )
+
+
+class EmailOutbox(Base):
+    """Emails queued inside the request transaction and delivered by the outbox worker"""
+    __tablename__ = "email_outbox"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_content = Column(Text, nullable=False)
+    text_content = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Worker polling: status = 'pending' AND next_attempt_at <= now ORDER BY next_attempt_at
+        Index("ix_email_outbox_due", next_attempt_at,
+              postgresql_where=status == "pending", sqlite_where=status == "pending"),
+        # Retention: delivered and permanently failed messages by age
+        Index("ix_email_outbox_sent_at", sent_at,
+              postgresql_where=status == "sent", sqlite_where=status == "sent"),
+        Index("ix_email_outbox_failed_created_at", created_at,
+              postgresql_where=status == "failed", sqlite_where=status == "failed"),
+    )
@@ -0,0 +1,191 @@
+"""Admin routes: the report review queue, suppression lifts, data exports and bulk provisioning"""
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import datetime
+import io
+import logging
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.limiter import limiter
+from app.core.security import get_current_admin
+from app.schemas.user import ReportReviewResponse
+from app.utils.moderation import (
+    get_open_reports, resolve_report, unsuppress_user, encode_report_cursor, decode_report_cursor
+)
+from app.utils.exports import EXPORT_DATASETS, EXPORT_MEDIA_TYPES, decode_export_cursor, stream_export
+from app.utils.provisioning import provision_users
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get(
+    "/reports",
+    response_model=list[ReportReviewResponse],
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+@limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
+def get_report_queue(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """Get unresolved reports, oldest first.
+
+    Pages are keyset-paginated; when a page is full the X-Next-Cursor response
+    header carries the cursor for the next page.
+    """
+    try:
+        after = decode_report_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    rows = get_open_reports(db, limit=limit, after=after)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_report_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
+
+
+@router.post(
+    "/reports/{report_id}/resolve",
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+def resolve_report_endpoint(
+    report_id: str,
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """Mark a report resolved, removing it from the queue"""
+    if not resolve_report(db, report_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Open report not found"
+        )
+    logger.info(f"Admin {admin.id[:8]}... resolved report {report_id}")
+    return {"message": "Report resolved"}
+
+
+@router.post(
+    "/users/{user_id}/unsuppress",
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+def unsuppress_user_endpoint(
+    user_id: str,
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """Lift a report suppression, making the user available again"""
+    if not unsuppress_user(db, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User is not suppressed"
+        )
+    logger.info(f"Admin {admin.id[:8]}... lifted the suppression of {user_id[:8]}...")
+    return {"message": "Suppression lifted"}
+
+
+@router.get(
+    "/exports/{dataset}",
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+@limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
+def export_dataset(
+    request: Request,
+    dataset: str,
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """Stream users, calls or reports as CSV or NDJSON.
+
+    Rows are in (time, id) order, filtered to [since, until) on created_at
+    (started_at for calls), and read from the database batch by batch, so memory
+    use does not grow with the export. To resume an interrupted export pass the
+    cursor for the last complete row received (app.utils.exports.export_cursor_for;
+    `python -m app.cli export --resume` does this); a resumed CSV has no header.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown export"
+        )
+    try:
+        after = decode_export_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    logger.info(f"Admin {admin.id[:8]}... exporting {dataset} as {format}")
+    # db stays open while the body streams: yield dependencies exit after the response is sent
+    return StreamingResponse(
+        stream_export(db, dataset, format, since, until, after),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'},
+    )
+
+
+@router.post(
+    "/users/provision",
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+@limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
+def provision_users_endpoint(
+    request: Request,
+    roster: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """Create unverified student accounts from a CSV roster upload.
+
+    Columns: email, username, full_name, password. Each created student is sent
+    the usual verification email. Rows that are invalid or already registered are
+    skipped; the response counts them and gives the first reasons by line.
+    """
+    lines = io.TextIOWrapper(roster.file, encoding="utf-8-sig", newline="")
+    try:
+        result = provision_users(db, lines)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Roster must be UTF-8 CSV"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    logger.info(
+        f"Admin {admin.id[:8]}... provisioned {result.created} users "
+        f"({result.skipped} skipped, {result.rows_per_second:.0f} rows/s)"
+    )
+    return {
+        "created": result.created,
+        "skipped": result.skipped,
+        "errors": result.errors,
+        "seconds": round(result.seconds, 3),
+        "rows_per_second": round(result.rows_per_second, 1),
+    }
@@ -1,21 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.config import settings
 from app.core.limiter import limiter
-from app.core.security import create_access_token, get_current_user
+from app.core.security import security, decode_token, get_current_user_id, get_password_hash_async
 from app.schemas.user import (
     UserCreate, LoginRequest, TokenResponse, EmailVerificationRequest,
-    EmailVerificationConfirm, UserResponse, LoginOTPResponse, LoginOTPVerifyRequest
+    EmailVerificationConfirm, UserResponse, LoginOTPResponse, LoginOTPVerifyRequest, RefreshTokenRequest
 )
 from app.utils.user_service import (
-    create_user, get_user_by_email, authenticate_user, 
-    verify_user_email, get_verification_token, set_user_online, set_user_offline,
-    create_verification_token, create_login_otp, get_valid_login_otp
+    create_user_async, get_user_by_email_async, authenticate_user_async,
+    verify_user_email_async, get_verification_token_async, set_user_online_async, set_user_offline_async,
+    create_verification_token_async, get_user_by_id_async
+)
+from app.utils.email import queue_verification_email, generate_verification_token, queue_login_otp_email, generate_otp_code
+from app.utils.email_outbox import email_outbox_worker
+from app.utils.otp_store import otp_store
+from app.utils.token_service import (
+    start_session_async, rotate_refresh_token_async, revoke_session_async, revoke_user_sessions_async
 )
-from app.utils.email import send_verification_email, generate_verification_token, send_login_otp_email, generate_otp_code
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -30,7 +34,7 @@ async def auth_options_handler(request: Request, path: str):
 
 @router.post("/register", response_model=UserResponse)
 @limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
-async def register(request: Request, user_create: UserCreate, db: Session = Depends(get_db)):
+async def register(request: Request, user_create: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user with rate limiting"""
     logger.info(f"Registration attempt for email: {user_create.email}")
     
@@ -43,7 +47,7 @@ async def register(request: Request, user_create: UserCreate, db: Session = Depe
         )
     
     # Check if email already exists
-    existing_user = get_user_by_email(db, user_create.email)
+    existing_user = await get_user_by_email_async(db, user_create.email)
     if existing_user:
         logger.warning(f"Email already registered: {user_create.email}")
         raise HTTPException(
@@ -51,17 +55,18 @@ async def register(request: Request, user_create: UserCreate, db: Session = Depe
             detail="Email already registered"
         )
     
-    # Create user
-    db_user = create_user(db, user_create)
-    db.commit()
+    # Create user (bcrypt runs on the hashing pool, not the event loop)
+    hashed_password = await get_password_hash_async(user_create.password)
+    db_user = await create_user_async(db, user_create, hashed_password=hashed_password)
     
     # Generate and create verification token
     token = generate_verification_token()
-    verification_token_obj = create_verification_token(db, db_user.id, token)
-    db.commit()
+    verification_token_obj = await create_verification_token_async(db, db_user.id, token)
     
-    # Send verification email
-    email_sent = await send_verification_email(db_user.email, token, db_user.username)
+    # Queue the verification email; the outbox worker delivers it after commit
+    await db.run_sync(queue_verification_email, db_user.email, token, db_user.username)
+    await db.commit()
+    email_outbox_worker.wake()
     logger.info(f"User registered successfully: {db_user.email}")
     
     return db_user
@@ -69,11 +74,11 @@ async def register(request: Request, user_create: UserCreate, db: Session = Depe
 
 @router.post("/verify-email", response_model=TokenResponse)
 @limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
-async def verify_email(request: Request, verify_data: EmailVerificationConfirm, db: Session = Depends(get_db)):
+async def verify_email(request: Request, verify_data: EmailVerificationConfirm, db: AsyncSession = Depends(get_async_db)):
     """Verify email with token - rate limited"""
     logger.info("Email verification attempt")
     
-    verification_token = get_verification_token(db, verify_data.token)
+    verification_token = await get_verification_token_async(db, verify_data.token)
     if not verification_token:
         logger.warning("Invalid or expired verification token used")
         raise HTTPException(
@@ -82,32 +87,22 @@ async def verify_email(request: Request, verify_data: EmailVerificationConfirm,
         )
     
     user = verification_token.user
-    verify_user_email(db, user)
+    await verify_user_email_async(db, user)
     verification_token.is_used = True
-    db.commit()
+    await db.commit()
     logger.info(f"Email verified for user: {user.email}")
     
-    # Create access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.id},
-        expires_delta=access_token_expires
-    )
-    
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    # Start a session: short-lived access token plus refresh token
+    return {**await start_session_async(db, user.id), "user": user}
 
 
 @router.post("/login", response_model=LoginOTPResponse, status_code=status.HTTP_202_ACCEPTED)
 @limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
-async def login(request: Request, login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: Request, login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Login user (step 1): validate credentials and send OTP"""
     logger.info(f"Login attempt for email: {login_data.email}")
     
-    user = authenticate_user(db, login_data.email, login_data.password)
+    user = await authenticate_user_async(db, login_data.email, login_data.password)
     if not user:
         logger.warning(f"Failed login attempt for email: {login_data.email}")
         raise HTTPException(
@@ -130,8 +125,10 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
         )
     
     otp_code = generate_otp_code()
-    create_login_otp(db, user.id, otp_code)
-    await send_login_otp_email(user.email, otp_code, user.username)
+    await db.run_sync(otp_store.issue, user.id, otp_code)
+    await db.run_sync(queue_login_otp_email, user.email, otp_code, user.username)
+    await db.commit()
+    email_outbox_worker.wake()
 
     logger.info(f"OTP sent for login: {login_data.email}")
     return {
@@ -142,11 +139,11 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
 
 @router.post("/login/verify-otp", response_model=TokenResponse)
 @limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
-async def verify_login_otp(request: Request, otp_data: LoginOTPVerifyRequest, db: Session = Depends(get_db)):
+async def verify_login_otp(request: Request, otp_data: LoginOTPVerifyRequest, db: AsyncSession = Depends(get_async_db)):
     """Login user (step 2): verify OTP and issue token"""
     logger.info(f"OTP verification attempt for email: {otp_data.email}")
 
-    user = get_user_by_email(db, otp_data.email)
+    user = await get_user_by_email_async(db, otp_data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -165,39 +162,58 @@ async def verify_login_otp(request: Request, otp_data: LoginOTPVerifyRequest, db
             detail="User account is inactive"
         )
 
-    otp = get_valid_login_otp(db, user.id, otp_data.otp)
-    if not otp:
+    # Consumes the code; too many wrong guesses discard it. Committed before
+    # answering so a failed guess still counts against the limit.
+    verified = await db.run_sync(otp_store.verify, user.id, otp_data.otp)
+    await db.commit()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired OTP"
         )
 
-    otp.is_used = True
-    db.commit()
-
-    set_user_online(db, user.id)
+    await set_user_online_async(db, user.id)
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.id},
-        expires_delta=access_token_expires
-    )
+    tokens = await start_session_async(db, user.id)
     logger.info(f"Successful OTP login for user: {otp_data.email}")
 
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    return {**tokens, "user": user}
+
+
+@router.post("/refresh", response_model=TokenResponse)
+@limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
+async def refresh_tokens(request: Request, refresh_data: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """Exchange a refresh token for a new access/refresh token pair (the old refresh token stops working)"""
+    rotated = await rotate_refresh_token_async(db, refresh_data.refresh_token)
+    if not rotated:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+
+    user_id, tokens = rotated
+    user = await get_user_by_id_async(db, user_id)
+    if not user or not user.is_active:
+        await revoke_user_sessions_async(db, user_id)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+
+    return {**tokens, "user": user}
 
 
 @router.post("/logout", openapi_extra={"security": [{"Bearer": []}]})
 @limiter.limit(f"{settings.RATE_LIMIT_AUTH}/minute")
 async def logout(
     request: Request,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    credentials = Depends(security),
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Logout user and mark offline"""
-    set_user_offline(db, current_user.id)
+    """Logout user: revoke the session's tokens and mark offline"""
+    session_id = decode_token(credentials.credentials).get("sid")
+    if session_id:
+        await revoke_session_async(db, session_id)
+    await set_user_offline_async(db, current_user_id)
     return {"message": "Logged out"}
@@ -1,29 +1,32 @@
 """Calls API routes for initiating, accepting, and managing video calls"""
-from fastapi import APIRouter, Depends, HTTPException, status, Request, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, WebSocket, WebSocketDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 from typing import Set
 import os
 import asyncio
 
-from app.core.database import get_db
+from app.core.database import get_async_db, AsyncSessionLocal
 from app.core.config import settings
 from app.core.limiter import limiter
-from app.core.security import get_current_user, decode_token
-from app.models.user import User
+from app.core.etag import change_counters, etag_for, not_modified
+from app.core.security import get_current_user, get_current_user_id, authenticate_access_token
+from app.models.user import User, Call
 from app.schemas.call import (
-    CallCreate, CallResponse, AvailableUserResponse
+    CallCreate, CallResponse, AvailableUserResponse, CallHistoryResponse
 )
 from app.utils.call_service import (
-    create_call, accept_call, reject_call, end_call,
-    get_call_by_id, get_user_call_history, get_active_call,
-    get_pending_call_for_user
+    create_call_async, accept_call_async, reject_call_async, end_call_async,
+    get_call_by_id_async, get_user_call_history_rows_async, get_active_call_async,
+    get_pending_call_for_user_async, encode_history_cursor, decode_history_cursor, CallNotFoundError, CallPermissionError,
+    CallStateConflictError
 )
 from app.utils.webrtc_service import webrtc_manager
+from app.utils.available_users import AvailableUser
 from app.utils.user_service import (
-    get_available_users, get_user_by_id, is_user_blocked, set_user_online, set_user_offline
+    get_available_users_page_async, get_user_by_id_async, is_user_blocked_async, set_user_online_async, set_user_offline_async,
+    encode_available_cursor, decode_available_cursor
 )
-from app.core.database import SessionLocal
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/calls", tags=["calls"])
@@ -32,6 +35,34 @@ router = APIRouter(prefix="/calls", tags=["calls"])
 online_users: Set[str] = set()
 
 
+async def load_available_users(
+    db: AsyncSession, current_user_id: str, limit: int, start: float | None = None, after: float | None = None
+) -> tuple[list[AvailableUser], str | None]:
+    """A page of available users and the cursor for the next page (None when the page is short)"""
+    start, available_users = await get_available_users_page_async(db, current_user_id, limit, start, after)
+    next_cursor = None
+    if len(available_users) == limit:
+        next_cursor = encode_available_cursor(start, available_users[-1].random_key)
+    # Filter to active WebSocket presence to avoid stale online flags
+    is_testing = os.getenv("PYTEST_CURRENT_TEST") is not None
+    if not is_testing:
+        available_users = [user for user in available_users if user.id in online_users]
+    return available_users, next_cursor
+
+
+async def load_active_call(db: AsyncSession, current_user_id: str) -> Call | None:
+    """The user's active call, ended first if its WebRTC session is gone"""
+    call = await get_active_call_async(db, current_user_id)
+    if call:
+        is_testing = os.getenv("PYTEST_CURRENT_TEST") is not None
+        if not is_testing and call.id not in webrtc_manager.peer_connections:
+            try:
+                call = await end_call_async(db, call.id)
+            except Exception as e:
+                logger.warning(f"Failed to auto-end stale call {call.id}: {str(e)}")
+    return call
+
+
 @router.get(
     "/available",
     response_model=list[AvailableUserResponse],
@@ -42,17 +73,39 @@ online_users: Set[str] = set()
 @limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
 async def get_available_users_endpoint(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = None,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of available users online and not blocked"""
+    """Get list of available users online and not blocked.
+
+    Each caller's first page starts at their own random point, so different callers
+    see different users. Pages come from a snapshot shared by all callers and rebuilt
+    at most every AVAILABLE_USERS_SNAPSHOT_SECONDS; the start stays put while the
+    snapshot is unchanged, and an If-None-Match matching the page's ETag gets a 304.
+    When a page is full the X-Next-Cursor response header carries the cursor for the
+    next page of the same shuffle.
+    """
     try:
-        available_users = get_available_users(db, current_user.id, limit=20)
-        # Filter to active WebSocket presence to avoid stale online flags
-        is_testing = os.getenv("PYTEST_CURRENT_TEST") is not None
-        if not is_testing:
-            available_users = [user for user in available_users if user.id in online_users]
-        logger.info(f"User {current_user.username} fetched {len(available_users)} available users")
+        start, after = decode_available_cursor(cursor) if cursor else (None, None)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    try:
+        available_users, next_cursor = await load_available_users(db, current_user_id, limit, start, after)
+
+        # The page is already in memory; its ETag spares serializing and sending it again
+        cached = not_modified(request, response, etag_for("available", tuple(available_users), next_cursor))
+        if cached is not None:
+            return cached
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        logger.info(f"User {current_user_id[:8]}... fetched {len(available_users)} available users")
         return available_users
     except Exception as e:
         logger.error(f"Error fetching available users: {str(e)}")
@@ -74,12 +127,12 @@ async def initiate_call(
     request: Request,
     call_create: CallCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Initiate a call to another user"""
     try:
         # Check if receiver exists
-        receiver = get_user_by_id(db, call_create.receiver_id)
+        receiver = await get_user_by_id_async(db, call_create.receiver_id)
         if not receiver:
             logger.warning(f"Call initiation failed: Receiver {call_create.receiver_id} not found")
             raise HTTPException(
@@ -96,7 +149,7 @@ async def initiate_call(
             )
 
         # Check if blocked
-        if is_user_blocked(db, current_user.id, receiver.id):
+        if await is_user_blocked_async(db, current_user.id, receiver.id):
             logger.warning(f"Call initiation failed: {current_user.username} is blocked by {receiver.username}")
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -104,13 +157,13 @@ async def initiate_call(
             )
 
         # Check if there's already an active call
-        active_call = get_active_call(db, current_user.id)
+        active_call = await get_active_call_async(db, current_user.id)
         if active_call:
             # Clear stale calls if no active WebRTC session exists
             is_testing = os.getenv("PYTEST_CURRENT_TEST") is not None
             if not is_testing and active_call.id not in webrtc_manager.peer_connections:
                 try:
-                    end_call(db, active_call.id)
+                    await end_call_async(db, active_call.id)
                     active_call = None
                 except Exception as e:
                     logger.warning(f"Failed to auto-end stale call {active_call.id}: {str(e)}")
@@ -122,7 +175,7 @@ async def initiate_call(
                 )
 
         # Create the call
-        call = create_call(db, current_user.id, call_create.receiver_id)
+        call = await create_call_async(db, current_user.id, call_create.receiver_id)
         logger.info(f"Call initiated: {current_user.username} -> {receiver.username}")
         
         return call
@@ -148,19 +201,19 @@ async def initiate_call(
 async def get_call_by_id_endpoint(
     request: Request,
     call_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a call by ID (participants only)"""
     try:
-        call = get_call_by_id(db, call_id)
+        call = await get_call_by_id_async(db, call_id)
         if not call:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Call not found"
             )
 
-        if current_user.id not in [call.initiator_id, call.receiver_id]:
+        if current_user_id not in [call.initiator_id, call.receiver_id]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized for this call"
@@ -188,35 +241,35 @@ async def get_call_by_id_endpoint(
 async def accept_call_endpoint(
     request: Request,
     call_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Accept an incoming call"""
     try:
-        call = get_call_by_id(db, call_id)
-        if not call:
-            logger.warning(f"Call acceptance failed: Call {call_id} not found")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Call not found"
-            )
-
-        # Check if current user is the receiver
-        if call.receiver_id != current_user.id:
-            logger.warning(f"Call acceptance failed: {current_user.username} is not the receiver")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not the receiver of this call"
-            )
-
-        # Accept the call
-        call = accept_call(db, call_id)
+        # Single conditional UPDATE: only succeeds if still pending and addressed to this user
+        call = await accept_call_async(db, call_id, receiver_id=current_user_id)
         logger.info(f"Call accepted: {call_id}")
         
         return call
 
-    except HTTPException:
-        raise
+    except CallNotFoundError:
+        logger.warning(f"Call acceptance failed: Call {call_id} not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Call not found"
+        )
+    except CallPermissionError:
+        logger.warning(f"Call acceptance failed: {current_user_id[:8]}... is not the receiver")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not the receiver of this call"
+        )
+    except CallStateConflictError as e:
+        logger.warning(f"Call acceptance failed for {call_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error accepting call: {str(e)}")
         raise HTTPException(
@@ -236,35 +289,35 @@ async def accept_call_endpoint(
 async def reject_call_endpoint(
     request: Request,
     call_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Reject an incoming call"""
     try:
-        call = get_call_by_id(db, call_id)
-        if not call:
-            logger.warning(f"Call rejection failed: Call {call_id} not found")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Call not found"
-            )
-
-        # Check if current user is the receiver
-        if call.receiver_id != current_user.id:
-            logger.warning(f"Call rejection failed: {current_user.username} is not the receiver")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not the receiver of this call"
-            )
-
-        # Reject the call
-        call = reject_call(db, call_id)
+        # Single conditional UPDATE: only succeeds if still pending and addressed to this user
+        call = await reject_call_async(db, call_id, receiver_id=current_user_id)
         logger.info(f"Call rejected: {call_id}")
         
         return call
 
-    except HTTPException:
-        raise
+    except CallNotFoundError:
+        logger.warning(f"Call rejection failed: Call {call_id} not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Call not found"
+        )
+    except CallPermissionError:
+        logger.warning(f"Call rejection failed: {current_user_id[:8]}... is not the receiver")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not the receiver of this call"
+        )
+    except CallStateConflictError as e:
+        logger.warning(f"Call rejection failed for {call_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error rejecting call: {str(e)}")
         raise HTTPException(
@@ -284,35 +337,35 @@ async def reject_call_endpoint(
 async def end_call_endpoint(
     request: Request,
     call_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """End an ongoing call"""
     try:
-        call = get_call_by_id(db, call_id)
-        if not call:
-            logger.warning(f"Call end failed: Call {call_id} not found")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Call not found"
-            )
-
-        # Check if current user is part of the call
-        if call.initiator_id != current_user.id and call.receiver_id != current_user.id:
-            logger.warning(f"Call end failed: {current_user.username} is not part of this call")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not part of this call"
-            )
-
-        # End the call
-        call = end_call(db, call_id)
+        # Single conditional UPDATE: only succeeds if still ongoing and the user is a participant
+        call = await end_call_async(db, call_id, participant_id=current_user_id)
         logger.info(f"Call ended: {call_id} (Duration: {call.duration_seconds}s)")
         
         return call
 
-    except HTTPException:
-        raise
+    except CallNotFoundError:
+        logger.warning(f"Call end failed: Call {call_id} not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Call not found"
+        )
+    except CallPermissionError:
+        logger.warning(f"Call end failed: {current_user_id[:8]}... is not part of this call")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not part of this call"
+        )
+    except CallStateConflictError as e:
+        logger.warning(f"Call end failed for {call_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error ending call: {str(e)}")
         raise HTTPException(
@@ -325,20 +378,14 @@ async def end_call_endpoint(
 @limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
 async def get_active_call_endpoint(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get active call for current user if any"""
     try:
-        call = get_active_call(db, current_user.id)
+        call = await load_active_call(db, current_user_id)
         if call:
-            is_testing = os.getenv("PYTEST_CURRENT_TEST") is not None
-            if not is_testing and call.id not in webrtc_manager.peer_connections:
-                try:
-                    call = end_call(db, call.id)
-                except Exception as e:
-                    logger.warning(f"Failed to auto-end stale call {call.id}: {str(e)}")
-            logger.info(f"User {current_user.username} has active call: {call.id}")
+            logger.info(f"User {current_user_id[:8]}... has active call: {call.id}")
         return call
     except Exception as e:
         logger.error(f"Error fetching active call: {str(e)}")
@@ -352,14 +399,14 @@ async def get_active_call_endpoint(
 @limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
 async def get_pending_call_endpoint(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get pending incoming call for current user if any"""
     try:
-        call = get_pending_call_for_user(db, current_user.id)
+        call = await get_pending_call_for_user_async(db, current_user_id)
         if call:
-            logger.info(f"User {current_user.username} has pending call: {call.id}")
+            logger.info(f"User {current_user_id[:8]}... has pending call: {call.id}")
         return call
     except Exception as e:
         logger.error(f"Error fetching pending call: {str(e)}")
@@ -369,34 +416,58 @@ async def get_pending_call_endpoint(
         )
 
 
-@router.get("/history", response_model=list, openapi_extra={"security": [{"Bearer": []}]})
+@router.get("/history", response_model=list[CallHistoryResponse], openapi_extra={"security": [{"Bearer": []}]})
 @limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
 async def get_call_history_endpoint(
     request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(10, ge=1, le=50),
+    cursor: str | None = None,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get call history for current user"""
+    """Get call history for current user.
+
+    Pages are keyset-paginated; when a page is full the X-Next-Cursor response
+    header carries the cursor for the next (older) page. The ETag follows the
+    user's call changes, so an unchanged page is answered with 304 without a query.
+    """
     try:
-        calls = get_user_call_history(db, current_user.id, limit=10)
-        logger.info(f"User {current_user.username} fetched call history: {len(calls)} calls")
+        before = decode_history_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    # Read the version before the rows so a change in between yields a newer ETag, not a stale body
+    version = change_counters.version(("calls", current_user_id))
+    cached = not_modified(request, response, etag_for("calls", current_user_id, version, limit, cursor))
+    if cached is not None:
+        return cached
+
+    try:
+        rows = await get_user_call_history_rows_async(db, current_user_id, limit=limit, before=before)
+        logger.info(f"User {current_user_id[:8]}... fetched call history: {len(rows)} calls")
         
-        # Convert to response format with usernames
-        history = []
-        for call in calls:
-            history.append({
-                "id": call.id,
-                "initiator_id": call.initiator_id,
-                "receiver_id": call.receiver_id,
-                "initiator_username": call.initiator.username if call.initiator else None,
-                "receiver_username": call.receiver.username if call.receiver else None,
-                "status": call.status.value if hasattr(call.status, 'value') else str(call.status),
-                "started_at": call.started_at,
-                "ended_at": call.ended_at,
-                "duration_seconds": call.duration_seconds
-            })
+        if len(rows) == limit:
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = encode_history_cursor(last.sort_key, last.id)
         
-        return history
+        return [
+            {
+                "id": row.id,
+                "initiator_id": row.initiator_id,
+                "receiver_id": row.receiver_id,
+                "initiator_username": row.initiator_username,
+                "receiver_username": row.receiver_username,
+                "status": row.status.value if hasattr(row.status, 'value') else str(row.status),
+                "started_at": row.started_at,
+                "ended_at": row.ended_at,
+                "duration_seconds": row.duration_seconds
+            }
+            for row in rows
+        ]
     except Exception as e:
         logger.error(f"Error fetching call history: {str(e)}")
         raise HTTPException(
@@ -413,22 +484,21 @@ async def websocket_presence_endpoint(websocket: WebSocket, user_id: str, token:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
         return
     
-    # Decode token to verify it belongs to this user_id
-    if token.startswith("Bearer "):
-        token = token[7:]
-    
-    payload = decode_token(token)
-    if not payload or payload.get("sub") != user_id:
+    # Verify the token (type, expiry, revoked session) and that it belongs to this user_id
+    async with AsyncSessionLocal() as db:
+        try:
+            token_user_id = await authenticate_access_token(db, token)
+        except HTTPException as e:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+            return
+    if token_user_id != user_id:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token mismatch")
         return
     
     await websocket.accept()
     online_users.add(user_id)
-    db = SessionLocal()
-    try:
-        set_user_online(db, user_id)
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        await set_user_online_async(db, user_id)
     logger.info(f"User {user_id[:8]}... came online. Online users: {len(online_users)}")
     
     try:
@@ -439,17 +509,11 @@ async def websocket_presence_endpoint(websocket: WebSocket, user_id: str, token:
                 await websocket.send_text("pong")
     except WebSocketDisconnect:
         online_users.discard(user_id)
-        db = SessionLocal()
-        try:
-            set_user_offline(db, user_id)
-        finally:
-            db.close()
+        async with AsyncSessionLocal() as db:
+            await set_user_offline_async(db, user_id)
         logger.info(f"User {user_id[:8]}... went offline. Online users: {len(online_users)}")
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {str(e)}")
         online_users.discard(user_id)
-        db = SessionLocal()
-        try:
-            set_user_offline(db, user_id)
-        finally:
-            db.close()
\ No newline at end of file
+        async with AsyncSessionLocal() as db:
+            await set_user_offline_async(db, user_id)
\ No newline at end of file
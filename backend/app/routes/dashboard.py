@@ -0,0 +1,57 @@
+"""Dashboard route: everything the dashboard polls for in one round trip"""
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
+
+from app.core.database import get_async_db
+from app.core.config import settings
+from app.core.limiter import limiter
+from app.core.security import get_current_user, get_current_user_id
+from app.schemas.dashboard import DashboardResponse
+from app.routes.calls import load_available_users, load_active_call
+from app.utils.call_service import get_pending_call_for_user_async
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get(
+    "",
+    response_model=DashboardResponse,
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+@limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
+async def get_dashboard(
+    request: Request,
+    limit: int = Query(20, ge=1, le=50),
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the current user's profile, pending call, active call and available users.
+
+    Replaces polling /users/me, /calls/pending, /calls/active and /calls/available
+    separately: one authentication, one rate-limit hit and one database session. The
+    available users are the first page of /calls/available; available_users_cursor
+    continues it there.
+    """
+    user = await get_current_user(current_user_id, db)
+    try:
+        pending_call = await get_pending_call_for_user_async(db, current_user_id)
+        active_call = await load_active_call(db, current_user_id)
+        available_users, next_cursor = await load_available_users(db, current_user_id, limit)
+    except Exception as e:
+        logger.error(f"Error fetching dashboard: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error fetching dashboard"
+        )
+
+    return {
+        "user": user,
+        "pending_call": pending_call,
+        "active_call": active_call,
+        "available_users": available_users,
+        "available_users_cursor": next_cursor,
+    }
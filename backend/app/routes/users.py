@@ -1,47 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Security
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import decode_token
-from app.schemas.user import UserResponse, UserUpdate, BlockUserRequest, ReportUserRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_db, get_async_db
+from app.core.etag import change_counters, etag_for, not_modified
+from app.core.limiter import limiter
+from app.core.security import get_current_user, get_current_user_id
+from app.schemas.user import UserResponse, UserUpdate, UserSearchResponse, BlockUserRequest, ReportUserRequest
+from app.schemas.call import UserCallStatsResponse
 from app.utils.user_service import (
-    get_user_by_id, update_user, block_user, unblock_user, 
+    get_user_by_id, get_users_by_ids, update_user, block_user, unblock_user, 
     report_user, is_user_blocked
 )
+from app.utils.block_graph import block_graph
+from app.utils.call_service import get_user_call_stats
+from app.utils.user_search import search_users, normalize_query, encode_search_cursor, decode_search_cursor
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["users"])
-security = HTTPBearer()
-
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
-    """Get current user from JWT token"""
-    token = credentials.credentials
-    logger.info(f"🔐 Received token: {token[:20]}...")
-    payload = decode_token(token)
-    
-    if not payload:
-        logger.error(f"❌ Token decode failed")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    logger.info(f"✅ Token decoded, user_id: {payload.get('sub')}")
-    user_id = payload.get("sub")
-    user = get_user_by_id(db, user_id)
-    
-    if not user:
-        logger.error(f"❌ User not found: {user_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    logger.info(f"✅ User authenticated: {user.email}")
-    return user
 
 
 @router.get(
@@ -51,9 +28,19 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Security(securi
         "security": [{"Bearer": []}]
     }
 )
-def get_current_user_profile(current_user: UserResponse = Depends(get_current_user)):
-    """Get current user profile"""
-    return current_user
+async def get_current_user_profile(
+    request: Request,
+    response: Response,
+    current_user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get current user profile (304 if If-None-Match matches the profile's ETag)"""
+    # Versions are read before the user so a change in between yields a newer ETag, not a stale body
+    version = change_counters.version(("user", current_user_id))
+    cached = not_modified(request, response, etag_for("user", current_user_id, version))
+    if cached is not None:
+        return cached
+    return await get_current_user(current_user_id, db)
 
 
 @router.put(
@@ -73,6 +60,107 @@ def update_current_user(
     return updated_user
 
 
+def _call_stats_response(db: Session, user_id: str) -> UserCallStatsResponse:
+    stats = get_user_call_stats(db, user_id)
+    total_calls = stats.total_calls if stats else 0
+    total_seconds = stats.total_seconds if stats else 0
+    return UserCallStatsResponse(
+        user_id=user_id,
+        total_calls=total_calls,
+        total_seconds=total_seconds,
+        total_minutes=round(total_seconds / 60, 1),
+        average_duration_seconds=round(total_seconds / total_calls, 1) if total_calls else 0.0,
+    )
+
+
+@router.get(
+    "/me/stats",
+    response_model=UserCallStatsResponse,
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+def get_current_user_stats(
+    db: Session = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get current user's call statistics"""
+    return _call_stats_response(db, current_user_id)
+
+
+@router.get(
+    "/search",
+    response_model=list[UserSearchResponse],
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+@limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
+def search_users_endpoint(
+    request: Request,
+    response: Response,
+    q: str = Query(..., max_length=64),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Search users by username or full name (prefix and fuzzy matches).
+
+    Best matches come first. When a page is full the X-Next-Cursor response header
+    carries the cursor for the next page.
+    """
+    query = normalize_query(q)
+    if len(query) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query must be at least 2 characters"
+        )
+    try:
+        after = decode_search_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    results = search_users(db, current_user_id, query, limit=limit, after=after)
+    if len(results) == limit:
+        last = results[-1]
+        response.headers["X-Next-Cursor"] = encode_search_cursor(last.score, last.id)
+    return results
+
+
+@router.get(
+    "/batch",
+    response_model=list[UserResponse],
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+@limiter.limit(f"{settings.RATE_LIMIT_API}/minute")
+def get_user_profiles_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated user ids"),
+    db: Session = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get several users' profiles in one request.
+
+    Profiles come back in the order asked for; unknown ids and users the caller
+    has blocked are left out, as /users/{user_id} would refuse them.
+    """
+    user_ids = list(dict.fromkeys(user_id for user_id in (part.strip() for part in ids.split(",")) if user_id))
+    if not user_ids or len(user_ids) > settings.USER_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {settings.USER_BATCH_MAX_IDS} user ids are required"
+        )
+
+    blocked = block_graph.edges(db, current_user_id).blocked
+    return get_users_by_ids(db, [user_id for user_id in user_ids if user_id not in blocked])
+
+
 @router.get(
     "/{user_id}",
     response_model=UserResponse,
@@ -82,17 +170,24 @@ def update_current_user(
 )
 def get_user_profile(
     user_id: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user_id: str = Depends(get_current_user_id)
 ):
-    """Get another user's profile"""
+    """Get another user's profile (304 if If-None-Match matches the profile's ETag)"""
     # Check if current user has blocked this user
-    if is_user_blocked(db, user_id, current_user.id):
+    if is_user_blocked(db, user_id, current_user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You cannot view this user's profile"
         )
     
+    version = change_counters.version(("user", user_id))
+    cached = not_modified(request, response, etag_for("user", user_id, version))
+    if cached is not None:
+        return cached
+
     user = get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(
@@ -103,6 +198,34 @@ def get_user_profile(
     return user
 
 
+@router.get(
+    "/{user_id}/stats",
+    response_model=UserCallStatsResponse,
+    openapi_extra={
+        "security": [{"Bearer": []}]
+    }
+)
+def get_user_stats(
+    user_id: str,
+    db: Session = Depends(get_db),
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Get another user's call statistics"""
+    if is_user_blocked(db, user_id, current_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You cannot view this user's profile"
+        )
+    
+    if not get_user_by_id(db, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    return _call_stats_response(db, user_id)
+
+
 @router.post(
     "/block/{user_id}",
     openapi_extra={
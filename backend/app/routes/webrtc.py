@@ -1,13 +1,12 @@
 """WebSocket endpoint for WebRTC signaling"""
-from fastapi import APIRouter, WebSocket, Query, Depends, status, Security
+from fastapi import APIRouter, WebSocket, Query, Depends, HTTPException, status, Security
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
 import json
 import logging
 from typing import Dict, Set
 
-from app.core.database import get_db
-from app.core.security import decode_token, get_current_user
+from app.core.database import AsyncSessionLocal
+from app.core.security import authenticate_access_token, get_current_user
 from app.utils.webrtc_service import (
     initialize_webrtc_session,
     relay_offer,
@@ -16,7 +15,7 @@ from app.utils.webrtc_service import (
     close_webrtc_session,
     webrtc_manager
 )
-from app.utils.call_service import get_call_by_id, end_call
+from app.utils.call_service import get_call_by_id_async, end_call_async
 from app.utils.user_service import get_user_by_id
 
 logger = logging.getLogger(__name__)
@@ -28,25 +27,22 @@ active_connections: Dict[str, Dict[str, WebSocket]] = {}
 
 
 async def get_user_from_token(token: str) -> str | None:
-    """Extract user ID from token"""
+    """The user id of a valid, unrevoked access token, else None"""
     if not token:
         return None
     
-    if token.startswith("Bearer "):
-        token = token[7:]
-    
-    payload = decode_token(token)
-    if payload:
-        return payload.get("sub")
-    return None
+    async with AsyncSessionLocal() as db:
+        try:
+            return await authenticate_access_token(db, token)
+        except HTTPException:
+            return None
 
 
 @router.websocket("/webrtc/{call_id}")
 async def websocket_webrtc_endpoint(
     websocket: WebSocket,
     call_id: str,
-    token: str = Query(None),
-    db: Session = Depends(get_db)
+    token: str = Query(None)
 ):
     """
     WebSocket endpoint for WebRTC signaling
@@ -64,8 +60,9 @@ async def websocket_webrtc_endpoint(
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token")
         return
     
-    # Verify call exists
-    call = get_call_by_id(db, call_id)
+    # Verify call exists (short-lived sessions: no connection is held for the length of the call)
+    async with AsyncSessionLocal() as db:
+        call = await get_call_by_id_async(db, call_id)
     if not call:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Call not found")
         return
@@ -84,7 +81,8 @@ async def websocket_webrtc_endpoint(
     # Initialize WebRTC session if not already done
     if call_id not in active_connections:
         active_connections[call_id] = {}
-        initialize_webrtc_session(db, call_id)
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(initialize_webrtc_session, call_id)
         # Also create in webrtc_manager for tracking
         webrtc_manager.create_peer_connection(call_id, call.initiator_id, call.receiver_id)
         logger.info(f"New WebRTC session for call {call_id}")
@@ -207,7 +205,8 @@ async def websocket_webrtc_endpoint(
                 elif message_type == "end_call":
                     # Notify both users and close sockets
                     try:
-                        end_call(db, call_id)
+                        async with AsyncSessionLocal() as db:
+                            await end_call_async(db, call_id)
                     except Exception as e:
                         logger.warning(f"Failed to mark call ended for {call_id}: {str(e)}")
                     await broadcast_to_call(
@@ -53,6 +53,14 @@ class CallHistoryResponse(BaseModel):
         from_attributes = True
 
 
+class UserCallStatsResponse(BaseModel):
+    user_id: str
+    total_calls: int
+    total_seconds: int
+    total_minutes: float
+    average_duration_seconds: float
+
+
 class UserOnlineStatusResponse(BaseModel):
     user_id: str
     is_online: bool
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+from app.schemas.call import CallResponse, AvailableUserResponse
+from app.schemas.user import UserResponse
+
+
+class DashboardResponse(BaseModel):
+    user: UserResponse
+    pending_call: Optional[CallResponse]
+    active_call: Optional[CallResponse]
+    available_users: list[AvailableUserResponse]
+    # Cursor for the next page of /calls/available; None when there is no next page
+    available_users_cursor: Optional[str]
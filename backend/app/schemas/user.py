@@ -35,6 +35,17 @@ class UserProfileResponse(UserResponse):
     pass
 
 
+class UserSearchResponse(BaseModel):
+    id: str
+    username: str
+    full_name: str
+    profile_picture: Optional[str]
+    is_online: bool
+
+    class Config:
+        from_attributes = True
+
+
 class EmailVerificationRequest(BaseModel):
     email: EmailStr
 
@@ -60,10 +71,16 @@ class LoginOTPVerifyRequest(BaseModel):
 
 class TokenResponse(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
+    expires_in: int
     user: UserResponse
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
 class BlockUserRequest(BaseModel):
     user_id: str
 
@@ -74,6 +91,22 @@ class ReportUserRequest(BaseModel):
     description: Optional[str] = None
 
 
+class ReportReviewResponse(BaseModel):
+    id: str
+    reporter_id: str
+    reported_id: str
+    reporter_username: Optional[str]
+    reported_username: Optional[str]
+    reason: str
+    description: Optional[str]
+    created_at: datetime
+    reported_open_reports: int
+    reported_suppressed: bool
+
+    class Config:
+        from_attributes = True
+
+
 class CallResponse(BaseModel):
     id: str
     initiator_id: str
@@ -0,0 +1,119 @@
+"""Shared snapshot of callable users, rebuilt at most once per interval"""
+import asyncio
+import hashlib
+import time
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.utils.moderation import suppressed_users
+
+
+class AvailableUser(NamedTuple):
+    id: str
+    username: str
+    full_name: str
+    profile_picture: str | None
+    bio: str | None
+    is_online: bool
+    random_key: float
+
+
+AVAILABLE_USER_COLUMNS = (
+    User.id, User.username, User.full_name, User.profile_picture, User.bio, User.is_online, User.random_key
+)
+
+
+class AvailableUsersSnapshot:
+    """Every online, verified, active user, sorted by random_key.
+
+    One query rebuilds the whole list when it is older than max_age_seconds; every
+    viewer's page is then cut from it in memory (self, the viewer's blocks and
+    suppressed users skipped), so database load does not grow with the number of pollers. Pages
+    follow the same random-start, wraparound order as get_available_users.
+    """
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self._users: list[AvailableUser] = []
+        self._keys: list[float] = []
+        self._built_at: float | None = None
+        # Changes only when the snapshot's contents do
+        self.version = 0
+        self._refresh_lock: asyncio.Lock | None = None
+        self._refresh_lock_loop = None
+
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at >= self.max_age_seconds
+
+    def refresh(self, db: Session) -> None:
+        rows = db.execute(
+            select(*AVAILABLE_USER_COLUMNS)
+            .where(User.is_online == True, User.is_verified == True, User.is_active == True)
+            .order_by(User.random_key)
+        ).all()
+        users = [AvailableUser(*row) for row in rows]
+        # Swap both lists at once; readers keep whichever pair they already hold
+        self._users, self._keys = users, [user.random_key for user in users]
+        self.version = hash(tuple(users))
+        self._built_at = time.monotonic()
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._refresh_lock_loop is not loop:
+            self._refresh_lock, self._refresh_lock_loop = asyncio.Lock(), loop
+        return self._refresh_lock
+
+    async def refresh_if_stale_async(self, db: AsyncSession) -> None:
+        """Rebuild if stale; concurrent callers wait for a single rebuild"""
+        if not self.is_stale():
+            return
+        async with self._lock():
+            if self.is_stale():
+                await db.run_sync(self.refresh)
+
+    def start_for(self, viewer_id: str) -> float:
+        """The viewer's random start for the current snapshot.
+
+        It only moves when the snapshot's contents change, so repeated polls get the
+        same page (and ETag) while nothing changed.
+        """
+        digest = hashlib.blake2b(f"{viewer_id}:{self.version}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") / 2 ** 64
+
+    def page(self, viewer_id: str, excluded: frozenset[str], limit: int,
+             start: float, after: float | None = None) -> list[AvailableUser]:
+        users, keys = self._users, self._keys
+        wrap_end = bisect_left(keys, start)
+        if after is None:
+            walk = chain(islice(users, wrap_end, None), islice(users, 0, wrap_end))
+        elif after >= start:
+            walk = chain(islice(users, bisect_right(keys, after), None), islice(users, 0, wrap_end))
+        else:
+            walk = islice(users, bisect_right(keys, after), wrap_end)
+
+        page: list[AvailableUser] = []
+        for user in walk:
+            if user.id == viewer_id or user.id in excluded or user.id in suppressed_users:
+                continue
+            page.append(user)
+            if len(page) == limit:
+                break
+        return page
+
+    def clear(self) -> None:
+        self._users, self._keys = [], []
+        self.version = 0
+        self._built_at = None
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+available_users_snapshot = AvailableUsersSnapshot(settings.AVAILABLE_USERS_SNAPSHOT_SECONDS)
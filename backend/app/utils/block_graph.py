@@ -0,0 +1,100 @@
+"""In-memory block graph: per-user blocked and blocked-by sets"""
+import threading
+from typing import NamedTuple
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import BlockedUser
+
+
+class BlockEdges(NamedTuple):
+    blocked: frozenset[str]      # users this user blocked
+    blocked_by: frozenset[str]   # users who blocked this user
+
+
+class BlockGraph:
+    """Lazily loaded view of blocked_users, keyed by user id.
+
+    A user's edges are read with one query on first use and then kept for
+    ttl_seconds. block_user/unblock_user update loaded entries after they commit,
+    so checks in this worker see their own changes immediately; changes made by
+    other workers show up once the entry expires.
+    """
+
+    def __init__(self, max_users: int, ttl_seconds: float):
+        self._entries = TTLCache(max_users, ttl_seconds)
+        self._lock = threading.Lock()
+        # Bumped by every change; a load that raced a change is not cached
+        self._version = 0
+
+    def edges(self, db: Session, user_id: str) -> BlockEdges:
+        cached = self._entries.get(user_id)
+        if cached is not None:
+            return cached
+        with self._lock:
+            version = self._version
+        rows = db.execute(union_all(
+            select(BlockedUser.blocked_id, literal(True)).where(BlockedUser.blocker_id == user_id),
+            select(BlockedUser.blocker_id, literal(False)).where(BlockedUser.blocked_id == user_id),
+        )).all()
+        edges = BlockEdges(
+            blocked=frozenset(other for other, outgoing in rows if outgoing),
+            blocked_by=frozenset(other for other, outgoing in rows if not outgoing),
+        )
+        with self._lock:
+            if self._version == version:
+                self._entries.set(user_id, edges)
+        return edges
+
+    def peek(self, blocker_id: str, blocked_id: str) -> bool | None:
+        """Answer "did blocker_id block blocked_id?" from loaded entries only; None if neither is loaded"""
+        edges = self._entries.get(blocked_id)
+        if edges is not None:
+            return blocker_id in edges.blocked_by
+        edges = self._entries.get(blocker_id)
+        if edges is not None:
+            return blocked_id in edges.blocked
+        return None
+
+    def has_blocked(self, db: Session, blocker_id: str, blocked_id: str) -> bool:
+        cached = self.peek(blocker_id, blocked_id)
+        if cached is not None:
+            return cached
+        return blocked_id in self.edges(db, blocker_id).blocked
+
+    def excluded_for(self, db: Session, user_id: str) -> frozenset[str]:
+        """Users hidden from user_id in either direction"""
+        edges = self.edges(db, user_id)
+        return edges.blocked | edges.blocked_by
+
+    def _update(self, blocker_id: str, blocked_id: str, added: bool) -> None:
+        with self._lock:
+            self._version += 1
+            blocker = self._entries.get(blocker_id)
+            if blocker is not None:
+                blocked = blocker.blocked | {blocked_id} if added else blocker.blocked - {blocked_id}
+                self._entries.set(blocker_id, blocker._replace(blocked=blocked))
+            target = self._entries.get(blocked_id)
+            if target is not None:
+                blocked_by = target.blocked_by | {blocker_id} if added else target.blocked_by - {blocker_id}
+                self._entries.set(blocked_id, target._replace(blocked_by=blocked_by))
+
+    def add(self, blocker_id: str, blocked_id: str) -> None:
+        self._update(blocker_id, blocked_id, added=True)
+
+    def remove(self, blocker_id: str, blocked_id: str) -> None:
+        self._update(blocker_id, blocked_id, added=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+block_graph = BlockGraph(settings.BLOCK_GRAPH_MAX_USERS, settings.BLOCK_GRAPH_TTL_SECONDS)
@@ -0,0 +1,55 @@
+"""Bulk row loading: COPY on Postgres, multi-row INSERT elsewhere"""
+import enum
+import io
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Table
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+
+def _copy_text(value: Any) -> str:
+    """A value in COPY's text format (\\N is NULL; backslash, tab and newlines escaped)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, enum.Enum):
+        # SQLAlchemy Enum columns store member names
+        return value.name
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def bulk_insert(db: Session, table: Table, rows: list[dict]) -> None:
+    """Insert rows in the session's transaction; every row has the same keys.
+
+    Rows must carry every value to write (column defaults are not applied by COPY).
+    Nothing is checked for conflicts: callers filter duplicates first, and a unique
+    violation fails the whole statement with IntegrityError.
+    """
+    if not rows:
+        return
+    cursor = None
+    if db.get_bind().dialect.name == "postgresql":
+        cursor = db.connection().connection.cursor()
+    if cursor is None or not hasattr(cursor, "copy_expert"):
+        # executemany; SQLAlchemy sends it as multi-row INSERT ... VALUES batches
+        db.execute(table.insert(), rows)
+        return
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text(row[name]) for name in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+    except db.get_bind().dialect.dbapi.Error as e:
+        # Raised as SQLAlchemy's exceptions (IntegrityError, ...) like the INSERT path
+        raise DBAPIError.instance(f"COPY {table.name}", None, e, db.get_bind().dialect.dbapi.Error)
+    finally:
+        cursor.close()
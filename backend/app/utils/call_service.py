@@ -1,14 +1,101 @@
 """Call management service for initiating, accepting, and ending calls"""
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models.user import Call, User, CallStatus
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, insert, delete, update, union_all, or_, and_, cast, literal, text, Integer, DateTime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.core.config import settings
+from app.core.etag import change_counters
+from app.models.user import Call, CallArchive, User, UserCallStats, CallStatus
+from app.utils.call_timeouts import pending_call_timeouts
 from datetime import datetime
+from typing import Callable, Dict, Iterable, NamedTuple
+import base64
 import secrets
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class ActiveCallEntry(NamedTuple):
+    call_id: str
+    initiator_id: str
+    receiver_id: str
+    status: CallStatus
+
+
+class ActiveCallIndex:
+    """In-process map from user id to that user's pending/ongoing calls.
+
+    Maintained by the call service on every transition and rebuilt from the database
+    on startup, so "is this user busy / ringing?" is a dictionary lookup. Readers still
+    load the call row by primary key and drop entries that turn out to be stale.
+    """
+
+    def __init__(self):
+        self._by_user: Dict[str, Dict[str, ActiveCallEntry]] = {}
+        self._lock = threading.Lock()
+
+    def track(self, call: Call) -> None:
+        """Record (or update) a pending/ongoing call for both participants"""
+        entry = ActiveCallEntry(call.id, call.initiator_id, call.receiver_id, CallStatus(call.status))
+        with self._lock:
+            for user_id in (entry.initiator_id, entry.receiver_id):
+                self._by_user.setdefault(user_id, {})[entry.call_id] = entry
+
+    def discard(self, call_id: str, *user_ids: str) -> None:
+        """Forget a call that is no longer pending/ongoing"""
+        with self._lock:
+            if not user_ids:
+                user_ids = tuple(user_id for user_id, calls in self._by_user.items() if call_id in calls)
+            for user_id in user_ids:
+                calls = self._by_user.get(user_id)
+                if calls is not None:
+                    calls.pop(call_id, None)
+                    if not calls:
+                        del self._by_user[user_id]
+
+    def get_ongoing(self, user_id: str) -> ActiveCallEntry | None:
+        with self._lock:
+            for entry in self._by_user.get(user_id, {}).values():
+                if entry.status == CallStatus.ONGOING:
+                    return entry
+        return None
+
+    def get_incoming(self, user_id: str) -> ActiveCallEntry | None:
+        with self._lock:
+            for entry in self._by_user.get(user_id, {}).values():
+                if entry.status == CallStatus.PENDING and entry.receiver_id == user_id:
+                    return entry
+        return None
+
+    def rebuild(self, db: Session) -> int:
+        """Reload the index from all pending/ongoing calls in the database"""
+        # One branch per status so each reads its partial index instead of scanning calls
+        rows = db.execute(union_all(*(
+            select(Call.id, Call.initiator_id, Call.receiver_id, Call.status).where(Call.status == status)
+            for status in (CallStatus.PENDING, CallStatus.ONGOING)
+        ))).all()
+        by_user: Dict[str, Dict[str, ActiveCallEntry]] = {}
+        for row in rows:
+            entry = ActiveCallEntry(row.id, row.initiator_id, row.receiver_id, row.status)
+            for user_id in (entry.initiator_id, entry.receiver_id):
+                by_user.setdefault(user_id, {})[entry.call_id] = entry
+        with self._lock:
+            self._by_user = by_user
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_user = {}
+
+
+# Global active call index instance
+active_call_index = ActiveCallIndex()
+
+
 def create_call(db: Session, initiator_id: str, receiver_id: str) -> Call:
     """Create a new call record"""
     call_token = secrets.token_urlsafe(32)
@@ -23,6 +110,9 @@ def create_call(db: Session, initiator_id: str, receiver_id: str) -> Call:
     db.add(call)
     db.commit()
     db.refresh(call)
+    active_call_index.track(call)
+    change_counters.bump(("calls", initiator_id), ("calls", receiver_id))
+    pending_call_timeouts.schedule(call.id, settings.CALL_RING_TIMEOUT_SECONDS)
     
     logger.info(f"Call created: {initiator_id} -> {receiver_id} (token: {call_token})")
     return call
@@ -38,76 +128,207 @@ def get_call_by_id(db: Session, call_id: str) -> Call | None:
     return db.query(Call).filter(Call.id == call_id).first()
 
 
-def accept_call(db: Session, call_id: str) -> Call:
-    """Accept a pending call"""
-    call = get_call_by_id(db, call_id)
-    if not call:
-        raise ValueError("Call not found")
-    
-    if call.status != "pending":
-        raise ValueError(f"Cannot accept call with status: {call.status}")
-    
-    call.status = "ongoing"
-    call.started_at = datetime.utcnow()
+class CallTransitionError(ValueError):
+    """Base error for a call status transition that could not be applied"""
+
+
+class CallNotFoundError(CallTransitionError):
+    """The call does not exist"""
+
+
+class CallPermissionError(CallTransitionError):
+    """The acting user is not allowed to perform the transition"""
+
+
+class CallStateConflictError(CallTransitionError):
+    """The call is not in the expected status (e.g. a concurrent request won the race)"""
+
+    def __init__(self, message: str, current_status: CallStatus):
+        super().__init__(message)
+        self.current_status = current_status
+
+
+def _elapsed_seconds(db: Session, ended_at: datetime):
+    """SQL expression for whole seconds between Call.started_at and ended_at"""
+    ended = literal(ended_at, DateTime())
+    if db.get_bind().dialect.name == "sqlite":
+        # julianday() works in fractional days; round away float noise before truncating
+        return cast(func.round((func.julianday(ended) - func.julianday(Call.started_at)) * 86400, 3), Integer)
+    return cast(func.floor(func.extract("epoch", ended - Call.started_at)), Integer)
+
+
+def _transition_call(
+    db: Session,
+    call_id: str,
+    expected: CallStatus,
+    values: dict,
+    action: str,
+    actor_id: str | None = None,
+    actor_roles: tuple[str, ...] = ("initiator_id", "receiver_id"),
+    on_applied: Callable[[Call], None] | None = None,
+) -> Call:
+    """Apply a status transition as a single conditional UPDATE ... RETURNING.
+
+    The row only changes if it is still in the expected status (and, when actor_id is
+    given, the actor fills one of actor_roles), so concurrent transitions cannot both
+    succeed. Only the failure path re-reads the row to report why. on_applied runs
+    after a successful UPDATE, inside the same transaction.
+    """
+    conditions = [Call.id == call_id, Call.status == expected]
+    if actor_id is not None:
+        conditions.append(or_(*[getattr(Call, role) == actor_id for role in actor_roles]))
+
+    call = db.execute(
+        update(Call).where(*conditions).values(**values).returning(Call)
+    ).scalars().first()
+
+    if call is None:
+        db.rollback()
+        current = db.execute(
+            select(Call.status, *[getattr(Call, role) for role in actor_roles]).where(Call.id == call_id)
+        ).first()
+        if current is None:
+            raise CallNotFoundError("Call not found")
+        if actor_id is not None and actor_id not in current[1:]:
+            raise CallPermissionError(f"Not allowed to {action} this call")
+        if current.status not in (CallStatus.PENDING, CallStatus.ONGOING):
+            active_call_index.discard(call_id)
+        status_value = current.status.value if hasattr(current.status, "value") else current.status
+        raise CallStateConflictError(f"Cannot {action} call with status: {status_value}", current.status)
+
+    if on_applied is not None:
+        on_applied(call)
+
+    # Detach before committing so the RETURNING snapshot is not expired (and re-fetched)
+    db.expunge(call)
     db.commit()
-    db.refresh(call)
-    
-    logger.info(f"Call accepted: {call.id}")
+
+    if call.status in (CallStatus.PENDING, CallStatus.ONGOING):
+        active_call_index.track(call)
+    else:
+        active_call_index.discard(call.id, call.initiator_id, call.receiver_id)
+    change_counters.bump(("calls", call.initiator_id), ("calls", call.receiver_id))
     return call
 
 
-def reject_call(db: Session, call_id: str) -> Call:
-    """Reject a pending call"""
-    call = get_call_by_id(db, call_id)
-    if not call:
-        raise ValueError("Call not found")
-    
-    if call.status != "pending":
-        raise ValueError(f"Cannot reject call with status: {call.status}")
+def accept_call(db: Session, call_id: str, receiver_id: str | None = None) -> Call:
+    """Accept a pending call (optionally only if receiver_id is the receiver)"""
+    call = _transition_call(
+        db,
+        call_id,
+        CallStatus.PENDING,
+        {"status": CallStatus.ONGOING, "started_at": datetime.utcnow()},
+        "accept",
+        actor_id=receiver_id,
+        actor_roles=("receiver_id",),
+    )
     
-    call.status = "rejected"
-    call.ended_at = datetime.utcnow()
-    db.commit()
-    db.refresh(call)
+    logger.info(f"Call accepted: {call.id}")
+    return call
 
-    try:
-        cleanup_call_history(db, keep_per_user=10)
-    except Exception as e:
-        logger.warning(f"Failed to cleanup call history after reject: {str(e)}")
+
+def reject_call(db: Session, call_id: str, receiver_id: str | None = None) -> Call:
+    """Reject a pending call (optionally only if receiver_id is the receiver)"""
+    call = _transition_call(
+        db,
+        call_id,
+        CallStatus.PENDING,
+        {"status": CallStatus.REJECTED, "ended_at": datetime.utcnow()},
+        "reject",
+        actor_id=receiver_id,
+        actor_roles=("receiver_id",),
+    )
     
     logger.info(f"Call rejected: {call.id}")
     return call
 
 
-def end_call(db: Session, call_id: str) -> Call:
-    """End an ongoing call"""
-    call = get_call_by_id(db, call_id)
-    if not call:
-        raise ValueError("Call not found")
-    
-    if call.status != "ongoing":
-        raise ValueError(f"Cannot end call with status: {call.status}")
-    
-    call.status = "completed"
-    call.ended_at = datetime.utcnow()
-    
-    # Calculate duration
-    if call.started_at:
-        duration = (call.ended_at - call.started_at).total_seconds()
-        call.duration_seconds = int(duration)
-    
-    db.commit()
-    db.refresh(call)
+def _upsert_call_stats(db: Session, rows: list[dict], increment: bool) -> None:
+    """INSERT ... ON CONFLICT (user_id) DO UPDATE, adding to or replacing the stored totals"""
+    insert_stmt = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert_stmt(UserCallStats).values(rows)
+    if increment:
+        totals = {
+            "total_calls": UserCallStats.total_calls + stmt.excluded.total_calls,
+            "total_seconds": UserCallStats.total_seconds + stmt.excluded.total_seconds,
+        }
+    else:
+        totals = {"total_calls": stmt.excluded.total_calls, "total_seconds": stmt.excluded.total_seconds}
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserCallStats.user_id],
+        set_={**totals, "updated_at": stmt.excluded.updated_at},
+    ))
 
-    try:
-        cleanup_call_history(db, keep_per_user=10)
-    except Exception as e:
-        logger.warning(f"Failed to cleanup call history after end: {str(e)}")
+
+def _add_call_stats(db: Session, user_ids: Iterable[str], duration_seconds: int) -> None:
+    """Count one more completed call of duration_seconds for each user"""
+    now = datetime.utcnow()
+    _upsert_call_stats(db, [
+        {"user_id": user_id, "total_calls": 1, "total_seconds": duration_seconds, "updated_at": now}
+        for user_id in user_ids
+    ], increment=True)
+
+
+def end_call(db: Session, call_id: str, participant_id: str | None = None) -> Call:
+    """End an ongoing call (optionally only if participant_id is part of it)"""
+    ended_at = datetime.utcnow()
+    call = _transition_call(
+        db,
+        call_id,
+        CallStatus.ONGOING,
+        {
+            "status": CallStatus.COMPLETED,
+            "ended_at": ended_at,
+            "duration_seconds": func.coalesce(_elapsed_seconds(db, ended_at), 0),
+        },
+        "end",
+        actor_id=participant_id,
+        on_applied=lambda ended: _add_call_stats(
+            db, (ended.initiator_id, ended.receiver_id), ended.duration_seconds or 0
+        ),
+    )
     
     logger.info(f"Call ended: {call.id} (Duration: {call.duration_seconds}s)")
     return call
 
 
+def expire_pending_calls(db: Session, call_ids: list[str]) -> list:
+    """Mark calls that are still pending as missed in one UPDATE.
+
+    Calls that were accepted or rejected in the meantime are left alone. Returns
+    (id, initiator_id, receiver_id) rows for the calls that were actually expired.
+    """
+    if not call_ids:
+        return []
+    rows = db.execute(
+        update(Call)
+        .where(Call.id.in_(call_ids), Call.status == CallStatus.PENDING)
+        .values(status=CallStatus.MISSED, ended_at=datetime.utcnow())
+        .returning(Call.id, Call.initiator_id, Call.receiver_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+
+    for row in rows:
+        active_call_index.discard(row.id, row.initiator_id, row.receiver_id)
+        change_counters.bump(("calls", row.initiator_id), ("calls", row.receiver_id))
+    if rows:
+        logger.info(f"Marked {len(rows)} unanswered calls as missed")
+    return rows
+
+
+def schedule_pending_call_timeouts(db: Session) -> int:
+    """Schedule ring timeouts for calls left pending by a previous process"""
+    now = datetime.utcnow()
+    rows = db.execute(
+        select(Call.id, Call.started_at).where(Call.status == CallStatus.PENDING)
+    ).all()
+    for row in rows:
+        rung_for = (now - row.started_at).total_seconds() if row.started_at else 0
+        pending_call_timeouts.schedule(row.id, settings.CALL_RING_TIMEOUT_SECONDS - rung_for)
+    return len(rows)
+
+
 def get_user_call_history(db: Session, user_id: str, limit: int = 20) -> list[Call]:
     """Get user's recent call history"""
     calls = db.query(Call).filter(
@@ -121,46 +342,293 @@ def get_user_call_history(db: Session, user_id: str, limit: int = 20) -> list[Ca
     return calls
 
 
-def cleanup_call_history(db: Session, keep_per_user: int = 10) -> int:
-    """Keep only the most recent calls per user, delete older completed/rejected calls."""
-    user_ids = [row[0] for row in db.query(User.id).all()]
-    if not user_ids:
-        return 0
+def encode_history_cursor(sort_key: datetime, call_id: str) -> str:
+    """Encode a call history keyset position as an opaque cursor"""
+    raw = f"{sort_key.isoformat()}|{call_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decode a cursor from encode_history_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_key, call_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(sort_key), call_id
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+
+def _history_rows_stmt(table, sort_key, user_id: str, limit: int, before: tuple[datetime, str] | None):
+    """Projected history page over the hot calls table or the archive (same column names)"""
+    initiator = aliased(User)
+    receiver = aliased(User)
+
+    stmt = select(
+        table.id,
+        table.initiator_id,
+        table.receiver_id,
+        initiator.username.label("initiator_username"),
+        receiver.username.label("receiver_username"),
+        table.status,
+        table.started_at,
+        table.ended_at,
+        table.duration_seconds,
+        sort_key.label("sort_key"),
+    ).outerjoin(
+        initiator, initiator.id == table.initiator_id
+    ).outerjoin(
+        receiver, receiver.id == table.receiver_id
+    ).where(
+        or_(table.initiator_id == user_id, table.receiver_id == user_id)
+    )
+
+    if before is not None:
+        before_key, before_id = before
+        stmt = stmt.where(or_(
+            sort_key < before_key,
+            and_(sort_key == before_key, table.id < before_id)
+        ))
+
+    return stmt.order_by(sort_key.desc(), table.id.desc()).limit(limit)
 
-    keep_ids: set[str] = set()
-    for user_id in user_ids:
-        recent_ids = db.query(Call.id).filter(
-            (Call.initiator_id == user_id) | (Call.receiver_id == user_id)
-        ).order_by(func.coalesce(Call.ended_at, Call.started_at).desc()).limit(keep_per_user).all()
-        keep_ids.update([row[0] for row in recent_ids])
 
-    if not keep_ids:
-        return 0
+def get_user_call_history_rows(
+    db: Session,
+    user_id: str,
+    limit: int = 20,
+    before: tuple[datetime, str] | None = None,
+) -> list:
+    """Get a page of call history as CallHistoryResponse-shaped rows.
 
-    deleted = db.query(Call).filter(
-        ~Call.id.in_(keep_ids),
-        Call.status.in_([CallStatus.COMPLETED, CallStatus.REJECTED])
-    ).delete(synchronize_session=False)
-    if deleted:
+    Both participants' usernames come from joined User aliases instead of lazy loads.
+    Rows are ordered by (coalesce(ended_at, started_at), id) descending; pass the
+    (sort_key, id) of the last row as `before` to fetch the next page. The hot calls
+    table is read first; the archive is only queried when the page is not filled.
+    """
+    rows = db.execute(_history_rows_stmt(
+        Call, func.coalesce(Call.ended_at, Call.started_at), user_id, limit, before
+    )).all()
+    if len(rows) == limit:
+        return rows
+
+    archived = db.execute(_history_rows_stmt(
+        CallArchive, CallArchive.finished_at, user_id, limit - len(rows), before
+    )).all()
+    if not archived:
+        return rows
+    # Archived calls are normally older than every hot row; merge anyway in case
+    # the archive job is behind and old finished calls are still hot
+    merged = sorted(rows + archived, key=lambda row: (row.sort_key, row.id), reverse=True)
+    return merged[:limit]
+
+
+def _ensure_archive_partitions(db: Session, finished_at: list[datetime]) -> None:
+    """Create the monthly calls_archive partitions covering finished_at (Postgres only)"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for year, month in sorted({(ts.year, ts.month) for ts in finished_at}):
+        lower = datetime(year, month, 1)
+        upper = datetime(year + month // 12, month % 12 + 1, 1)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS calls_archive_y{year}m{month:02d} "
+            f"PARTITION OF calls_archive FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+
+
+def archive_call_history(
+    db: Session,
+    older_than: datetime,
+    batch_size: int = 1000,
+    max_batches: int = 10,
+    pause_seconds: float = 0.0,
+) -> int:
+    """Move finished calls that ended before older_than from calls to calls_archive.
+
+    Calls are taken oldest first through ix_calls_finished_at, batch_size at a time,
+    and each batch is copied and deleted in one transaction with an optional pause
+    between batches. Pending and ongoing calls are never moved. Returns the number of
+    archived calls; callers drain a larger backlog by calling again while the full
+    batch_size * max_batches was archived.
+    """
+    sort_key = func.coalesce(Call.ended_at, Call.started_at)
+    archived = 0
+    for batch in range(max_batches):
+        if batch and pause_seconds:
+            time.sleep(pause_seconds)
+        due = db.execute(
+            select(Call.id, sort_key.label("finished_at")).where(
+                sort_key < older_than,
+                Call.status.in_([CallStatus.COMPLETED, CallStatus.REJECTED, CallStatus.MISSED]),
+            ).order_by(sort_key).limit(batch_size)
+        ).all()
+        if not due:
+            break
+
+        ids = [row.id for row in due]
+        _ensure_archive_partitions(db, [row.finished_at for row in due])
+        # status is cast: migration 001 made calls.status a varchar, calls_archive.status is the enum
+        db.execute(insert(CallArchive).from_select(
+            ["id", "finished_at", "initiator_id", "receiver_id", "started_at", "ended_at",
+             "duration_seconds", "status", "call_token", "archived_at"],
+            select(Call.id, sort_key, Call.initiator_id, Call.receiver_id, Call.started_at,
+                   Call.ended_at, Call.duration_seconds, cast(Call.status, CallArchive.status.type), Call.call_token,
+                   literal(datetime.utcnow(), DateTime())).where(Call.id.in_(ids))
+        ))
+        db.execute(delete(Call).where(Call.id.in_(ids)).execution_options(synchronize_session=False))
         db.commit()
-    return deleted
+        archived += len(ids)
+        if len(due) < batch_size:
+            break
+    return archived
+
+
+def get_user_call_stats(db: Session, user_id: str) -> UserCallStats | None:
+    """Get a user's call stats rollup (None if they have never completed a call)"""
+    return db.get(UserCallStats, user_id)
+
+
+def _completed_call_totals(user_ids: list[str]):
+    """Count and total duration of completed calls per user, across calls and calls_archive"""
+    branches = []
+    for table in (Call, CallArchive):
+        for role in (table.initiator_id, table.receiver_id):
+            branches.append(
+                select(role.label("user_id"), table.duration_seconds.label("duration_seconds"))
+                .where(role.in_(user_ids), table.status == CallStatus.COMPLETED)
+            )
+    participants = union_all(*branches).subquery()
+    return select(
+        participants.c.user_id,
+        func.count().label("total_calls"),
+        func.coalesce(func.sum(participants.c.duration_seconds), 0).label("total_seconds"),
+    ).group_by(participants.c.user_id)
+
+
+def reconcile_user_call_stats(db: Session, batch_size: int = 1000, pause_seconds: float = 0.0) -> int:
+    """Recount user_call_stats from the call tables and repair rows that drifted.
+
+    Walks users in id order, batch_size at a time, committing each batch and pausing
+    pause_seconds between batches. Returns the number of stats rows that were created
+    or corrected.
+
+    The batch's stats rows are locked (FOR UPDATE on Postgres) before the recount, so
+    a call ending meanwhile waits to add its increment until the corrected totals are
+    committed instead of being overwritten. Missing rows are only inserted, never
+    overwritten: a concurrent end_call may create one first, and its value stands.
+    """
+    repaired = 0
+    after = ""
+    while True:
+        user_ids = db.execute(
+            select(User.id).where(User.id > after).order_by(User.id).limit(batch_size)
+        ).scalars().all()
+        if not user_ids:
+            break
+
+        stored = {
+            row.user_id: (row.total_calls, row.total_seconds)
+            for row in db.execute(
+                select(UserCallStats.user_id, UserCallStats.total_calls, UserCallStats.total_seconds)
+                .where(UserCallStats.user_id.in_(user_ids))
+                .order_by(UserCallStats.user_id)
+                .with_for_update()
+            )
+        }
+        actual = {
+            row.user_id: (row.total_calls, row.total_seconds)
+            for row in db.execute(_completed_call_totals(user_ids))
+        }
+        now = datetime.utcnow()
+        corrected, missing = [], []
+        for user_id in user_ids:
+            total_calls, total_seconds = actual.get(user_id, (0, 0))
+            if stored.get(user_id, (0, 0)) == (total_calls, total_seconds):
+                continue
+            row = {"user_id": user_id, "total_calls": total_calls, "total_seconds": total_seconds, "updated_at": now}
+            (corrected if user_id in stored else missing).append(row)
+        fixed = len(corrected)
+        if corrected:
+            _upsert_call_stats(db, corrected, increment=False)
+        if missing:
+            insert_stmt = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+            fixed += db.execute(
+                insert_stmt(UserCallStats).values(missing).on_conflict_do_nothing(index_elements=[UserCallStats.user_id])
+            ).rowcount
+        db.commit()
+        if fixed:
+            logger.warning(f"Repaired call stats for {fixed} users")
+        repaired += fixed
+
+        if len(user_ids) < batch_size:
+            break
+        after = user_ids[-1]
+        if pause_seconds:
+            time.sleep(pause_seconds)
+    return repaired
+
+
+def _load_indexed_call(db: Session, lookup) -> Call | None:
+    """Load the call returned by an index lookup by primary key, resyncing stale entries"""
+    entry = lookup()
+    if entry is None:
+        return None
+    call = get_call_by_id(db, entry.call_id)
+    if call is not None and call.status == entry.status:
+        return call
+
+    # The index disagrees with the database (e.g. a row changed outside the service)
+    active_call_index.discard(entry.call_id)
+    if call is not None and call.status in (CallStatus.PENDING, CallStatus.ONGOING):
+        active_call_index.track(call)
+    return _load_indexed_call(db, lookup)
 
 
 def get_active_call(db: Session, user_id: str) -> Call | None:
-    """Get user's active call if any"""
-    call = db.query(Call).filter(
-        ((Call.initiator_id == user_id) | (Call.receiver_id == user_id)),
-        Call.status == "ongoing"
-    ).first()
-    
-    return call
+    """Get user's active call if any (no query unless the index has one)"""
+    return _load_indexed_call(db, lambda: active_call_index.get_ongoing(user_id))
 
 
 def get_pending_call_for_user(db: Session, user_id: str) -> Call | None:
-    """Get pending incoming call for user"""
-    call = db.query(Call).filter(
-        Call.receiver_id == user_id,
-        Call.status == "pending"
-    ).first()
-    
-    return call
+    """Get pending incoming call for user (no query unless the index has one)"""
+    return _load_indexed_call(db, lambda: active_call_index.get_incoming(user_id))
+
+
+# Async variants for async def routes and WebSocket handlers: the functions above run
+# through AsyncSession.run_sync, so the database I/O is awaited instead of blocking
+# the event loop.
+
+async def create_call_async(db: AsyncSession, initiator_id: str, receiver_id: str) -> Call:
+    return await db.run_sync(create_call, initiator_id, receiver_id)
+
+
+async def get_call_by_id_async(db: AsyncSession, call_id: str) -> Call | None:
+    return await db.run_sync(get_call_by_id, call_id)
+
+
+async def accept_call_async(db: AsyncSession, call_id: str, receiver_id: str | None = None) -> Call:
+    return await db.run_sync(accept_call, call_id, receiver_id)
+
+
+async def reject_call_async(db: AsyncSession, call_id: str, receiver_id: str | None = None) -> Call:
+    return await db.run_sync(reject_call, call_id, receiver_id)
+
+
+async def end_call_async(db: AsyncSession, call_id: str, participant_id: str | None = None) -> Call:
+    return await db.run_sync(end_call, call_id, participant_id)
+
+
+async def get_user_call_history_rows_async(
+    db: AsyncSession,
+    user_id: str,
+    limit: int = 20,
+    before: tuple[datetime, str] | None = None,
+) -> list:
+    return await db.run_sync(get_user_call_history_rows, user_id, limit, before)
+
+
+async def get_active_call_async(db: AsyncSession, user_id: str) -> Call | None:
+    return await db.run_sync(get_active_call, user_id)
+
+
+async def get_pending_call_for_user_async(db: AsyncSession, user_id: str) -> Call | None:
+    return await db.run_sync(get_pending_call_for_user, user_id)
@@ -0,0 +1,90 @@
+"""Ring timeout scheduling for pending calls"""
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PendingCallTimeouts:
+    """Min-heap of ring deadlines for pending calls.
+
+    schedule() may be called from any thread; run() sleeps until the earliest
+    deadline and hands every call that is due to the expire callback in batches.
+    Accepted/rejected calls are not removed from the heap: the expire callback only
+    touches calls that are still pending, so a stale deadline is a cheap no-op.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def schedule(self, call_id: str, timeout_seconds: float) -> None:
+        """Expire call_id after timeout_seconds unless it has left 'pending' by then"""
+        deadline = time.monotonic() + timeout_seconds
+        with self._lock:
+            heapq.heappush(self._heap, (deadline, call_id))
+            is_earliest = self._heap[0][1] == call_id
+        if is_earliest and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def seconds_until_next(self) -> Optional[float]:
+        """Seconds until the earliest deadline (<= 0 if overdue), or None if idle"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return self._heap[0][0] - time.monotonic()
+
+    def pop_due(self, limit: int) -> List[str]:
+        """Remove and return up to limit call ids whose deadline has passed"""
+        now = time.monotonic()
+        due: List[str] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < limit:
+                due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def clear(self) -> None:
+        """Drop every scheduled deadline"""
+        with self._lock:
+            self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def run(
+        self, expire: Callable[[List[str]], Awaitable[None]], batch_size: int = 500, retry_seconds: float = 1.0
+    ) -> None:
+        """Expire due calls forever; meant to run as a lifespan task.
+
+        A batch whose expire call raises goes back on the heap retry_seconds from
+        now, so a database hiccup does not leave its calls ringing forever.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            delay = self.seconds_until_next()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self.pop_due(batch_size)
+            try:
+                await expire(due)
+            except Exception as e:
+                logger.error(f"Failed to expire {len(due)} pending calls, retrying in {retry_seconds}s: {e}")
+                for call_id in due:
+                    self.schedule(call_id, retry_seconds)
+
+
+# Global pending call timeout scheduler instance
+pending_call_timeouts = PendingCallTimeouts()
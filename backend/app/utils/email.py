@@ -1,26 +1,52 @@
 import logging
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+import uuid
+from datetime import datetime
+from sqlalchemy.orm import Session
 from app.core.config import settings
-from typing import Optional
+from app.models.user import EmailOutbox
+from app.utils.bulk import bulk_insert
 
 logger = logging.getLogger(__name__)
 
 
-async def send_verification_email(email: str, token: str, username: str) -> bool:
-    """Send email verification link using SendGrid"""
-    try:
-        if not settings.SENDGRID_API_KEY:
-            if settings.ENVIRONMENT == "production":
-                logger.error("SendGrid API key missing; cannot send verification email in production")
-                return False
-            logger.warning("SendGrid API key missing; logging token for development only")
-            logger.info(f"🔐 VERIFICATION TOKEN FOR {email}: {token}")
-            return True
-
-        verification_link = f"{settings.FRONTEND_URL}/verify?token={token}"
-        
-        html_content = f"""
+def queue_email(db: Session, to_email: str, subject: str, html_content: str, text_content: str | None = None) -> EmailOutbox:
+    """Add an email to the outbox in the caller's transaction; the outbox worker delivers it after commit"""
+    message = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        text_content=text_content,
+    )
+    db.add(message)
+    return message
+
+
+def queue_emails(db: Session, messages: list[dict]) -> None:
+    """queue_email for many messages (dicts of its keyword arguments) in one bulk insert"""
+    now = datetime.utcnow()
+    bulk_insert(db, EmailOutbox.__table__, [
+        {
+            "id": str(uuid.uuid4()),
+            "to_email": message["to_email"],
+            "subject": message["subject"],
+            "html_content": message["html_content"],
+            "text_content": message.get("text_content"),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "last_error": None,
+            "created_at": now,
+            "sent_at": None,
+        }
+        for message in messages
+    ])
+
+
+def verification_email(email: str, token: str, username: str) -> dict:
+    """The email verification message, as queue_email keyword arguments"""
+    verification_link = f"{settings.FRONTEND_URL}/verify?token={token}"
+    
+    html_content = f"""
         <html>
             <body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 20px;">
                 <div style="max-width: 600px; background-color: white; margin: 0 auto; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
@@ -50,40 +76,26 @@ async def send_verification_email(email: str, token: str, username: str) -> bool
                 </div>
             </body>
         </html>
-        """
-        
-        message = Mail(
-            from_email=Email(settings.EMAIL_FROM),
-            to_emails=To(email),
-            subject="Verify Your UniLink Account",
-            html_content=html_content
-        )
-        
-        sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-        response = sg.send(message)
-        
-        logger.info(f"✅ Verification email sent to {email} (Status: {response.status_code})")
-        return response.status_code == 202  # 202 = Accepted
-
-    except Exception as e:
-        logger.error(f"❌ Error sending verification email to {email}: {str(e)}")
-        return False
-
-
-async def send_password_reset_email(email: str, token: str, username: str) -> bool:
-    """Send password reset email using SendGrid"""
-    try:
-        if not settings.SENDGRID_API_KEY:
-            if settings.ENVIRONMENT == "production":
-                logger.error("SendGrid API key missing; cannot send password reset email in production")
-                return False
-            logger.warning("SendGrid API key missing; logging reset token for development only")
-            logger.info(f"🔐 PASSWORD RESET TOKEN FOR {email}: {token}")
-            return True
-
-        reset_link = f"{settings.FRONTEND_URL}/reset-password?token={token}"
-        
-        html_content = f"""
+    """
+    
+    return {
+        "to_email": email,
+        "subject": "Verify Your UniLink Account",
+        "html_content": html_content,
+        "text_content": f"Welcome to UniLink, {username}! Verify your email address: {verification_link}",
+    }
+
+
+def queue_verification_email(db: Session, email: str, token: str, username: str) -> EmailOutbox:
+    """Queue the email verification link"""
+    return queue_email(db, **verification_email(email, token, username))
+
+
+def queue_password_reset_email(db: Session, email: str, token: str, username: str) -> EmailOutbox:
+    """Queue a password reset link"""
+    reset_link = f"{settings.FRONTEND_URL}/reset-password?token={token}"
+    
+    html_content = f"""
         <html>
             <body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 20px;">
                 <div style="max-width: 600px; background-color: white; margin: 0 auto; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
@@ -104,38 +116,20 @@ async def send_password_reset_email(email: str, token: str, username: str) -> bo
                 </div>
             </body>
         </html>
-        """
-        
-        message = Mail(
-            from_email=Email(settings.EMAIL_FROM),
-            to_emails=To(email),
-            subject="Reset Your UniLink Password",
-            html_content=html_content
-        )
-        
-        sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-        response = sg.send(message)
-        
-        logger.info(f"✅ Password reset email sent to {email}")
-        return response.status_code == 202
-
-    except Exception as e:
-        logger.error(f"❌ Error sending password reset email: {str(e)}")
-        return False
-
-
-async def send_login_otp_email(email: str, otp: str, username: str) -> bool:
-    """Send login OTP email using SendGrid"""
-    try:
-        if not settings.SENDGRID_API_KEY:
-            if settings.ENVIRONMENT == "production":
-                logger.error("SendGrid API key missing; cannot send login OTP email in production")
-                return False
-            logger.warning("SendGrid API key missing; logging OTP for development only")
-            logger.info(f"🔐 LOGIN OTP FOR {email}: {otp}")
-            return True
-
-        html_content = f"""
+    """
+    
+    return queue_email(
+        db,
+        email,
+        "Reset Your UniLink Password",
+        html_content,
+        f"Hi {username}, reset your UniLink password: {reset_link}",
+    )
+
+
+def queue_login_otp_email(db: Session, email: str, otp: str, username: str) -> EmailOutbox:
+    """Queue a login OTP"""
+    html_content = f"""
         <html>
             <body style="font-family: Arial, sans-serif; background-color: #f9f9f9; padding: 20px;">
                 <div style="max-width: 600px; background-color: white; margin: 0 auto; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
@@ -156,24 +150,15 @@ async def send_login_otp_email(email: str, otp: str, username: str) -> bool:
                 </div>
             </body>
         </html>
-        """
-
-        message = Mail(
-            from_email=Email(settings.EMAIL_FROM),
-            to_emails=To(email),
-            subject="Your UniLink Login Code",
-            html_content=html_content
-        )
-
-        sg = SendGridAPIClient(settings.SENDGRID_API_KEY)
-        response = sg.send(message)
-
-        logger.info(f"✅ Login OTP email sent to {email} (Status: {response.status_code})")
-        return response.status_code == 202
-
-    except Exception as e:
-        logger.error(f"❌ Error sending login OTP email to {email}: {str(e)}")
-        return False
+    """
+
+    return queue_email(
+        db,
+        email,
+        "Your UniLink Login Code",
+        html_content,
+        f"Hi {username}, your UniLink login code is {otp}",
+    )
 
 
 def generate_verification_token() -> str:
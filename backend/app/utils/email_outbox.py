@@ -0,0 +1,257 @@
+"""Email outbox delivery: pluggable transports and the background worker"""
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxMessage(NamedTuple):
+    id: str
+    to_email: str
+    subject: str
+    html_content: str
+    text_content: str | None
+    attempts: int
+
+
+class PermanentEmailError(Exception):
+    """Delivery failed in a way retrying will not fix (e.g. the provider rejected the message)"""
+
+
+class EmailTransport(ABC):
+    """Delivers one message; raises on failure (PermanentEmailError to skip retries)"""
+
+    @abstractmethod
+    async def send(self, message: OutboxMessage) -> None:
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+
+class SendGridTransport(EmailTransport):
+    """SendGrid v3 mail/send over one pooled, keep-alive HTTP client"""
+
+    API_URL = "https://api.sendgrid.com/v3/mail/send"
+
+    def __init__(self, api_key: str, from_email: str, max_connections: int = 10, timeout: float = 10.0):
+        self.from_email = from_email
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+
+    async def send(self, message: OutboxMessage) -> None:
+        content = [{"type": "text/html", "value": message.html_content}]
+        if message.text_content:
+            content.insert(0, {"type": "text/plain", "value": message.text_content})
+        response = await self.client.post(self.API_URL, json={
+            "personalizations": [{"to": [{"email": message.to_email}]}],
+            "from": {"email": self.from_email},
+            "subject": message.subject,
+            "content": content,
+        })
+        if response.status_code == 202:
+            return
+        error = f"SendGrid returned {response.status_code}: {response.text[:200]}"
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RuntimeError(error)
+        raise PermanentEmailError(error)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class LogTransport(EmailTransport):
+    """Development stand-in: logs each message; the body (tokens, OTPs) only at DEBUG.
+
+    Never used in production (create_email_transport refuses it there).
+    """
+
+    async def send(self, message: OutboxMessage) -> None:
+        logger.info(f"📧 EMAIL TO {message.to_email} | {message.subject}")
+        logger.debug(f"📧 EMAIL BODY {message.id}: {message.text_content}")
+
+
+class FileTransport(EmailTransport):
+    """Test/staging stand-in: appends each message as a JSON line to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def send(self, message: OutboxMessage) -> None:
+        line = json.dumps({
+            "id": message.id,
+            "to": message.to_email,
+            "subject": message.subject,
+            "text": message.text_content,
+            "html": message.html_content,
+        })
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def create_email_transport() -> EmailTransport:
+    """Build the transport selected by EMAIL_TRANSPORT (sendgrid / log / file; empty = sendgrid if configured).
+
+    Raises ValueError in production when that would be the log transport: tokens
+    and OTPs must not end up in production logs, so startup fails instead.
+    """
+    transport = settings.EMAIL_TRANSPORT or ("sendgrid" if settings.SENDGRID_API_KEY else "log")
+    if transport == "sendgrid":
+        return SendGridTransport(settings.SENDGRID_API_KEY, settings.EMAIL_FROM)
+    if transport == "file":
+        return FileTransport(settings.EMAIL_FILE_PATH)
+    if transport == "log":
+        if settings.ENVIRONMENT == "production":
+            raise ValueError("No email transport configured for production (set SENDGRID_API_KEY)")
+        logger.warning("SendGrid API key missing; emails are only logged (development only)")
+        return LogTransport()
+    raise ValueError(f"Unknown EMAIL_TRANSPORT: {transport}")
+
+
+def claim_due_emails(db: Session, limit: int, lease_seconds: float) -> list[OutboxMessage]:
+    """Lease up to limit due messages: bump attempts and push next_attempt_at past the lease.
+
+    A worker that dies mid-delivery leaves its messages to be retried once the lease
+    expires; other workers skip leased (and, on Postgres, row-locked) messages.
+    """
+    now = datetime.utcnow()
+    ids = db.execute(
+        select(EmailOutbox.id).where(
+            EmailOutbox.status == "pending",
+            EmailOutbox.next_attempt_at <= now,
+        ).order_by(EmailOutbox.next_attempt_at).limit(limit).with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not ids:
+        db.rollback()
+        return []
+
+    rows = db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids))
+        .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=now + timedelta(seconds=lease_seconds))
+        .returning(EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject, EmailOutbox.html_content,
+                   EmailOutbox.text_content, EmailOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return [OutboxMessage(*row) for row in rows]
+
+
+def record_delivery_results(db: Session, results: dict[str, Exception | None], attempts: dict[str, int]) -> None:
+    """Mark delivered messages sent; schedule retries with exponential backoff or give up"""
+    now = datetime.utcnow()
+    sent_ids = [message_id for message_id, error in results.items() if error is None]
+    if sent_ids:
+        db.execute(
+            update(EmailOutbox).where(EmailOutbox.id.in_(sent_ids))
+            .values(status="sent", sent_at=now, last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+    for message_id, error in results.items():
+        if error is None:
+            continue
+        attempt = attempts[message_id]
+        if isinstance(error, PermanentEmailError) or attempt >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            values = {"status": "failed"}
+        else:
+            backoff = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            values = {"next_attempt_at": now + timedelta(seconds=backoff)}
+        db.execute(
+            update(EmailOutbox).where(EmailOutbox.id == message_id)
+            .values(last_error=str(error)[:500], **values)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
+class EmailOutboxWorker:
+    """Delivers outbox messages in batches, in parallel, off the request path.
+
+    Sleeps for EMAIL_OUTBOX_POLL_SECONDS between empty polls; wake() makes it look
+    again immediately (called after a request commits a new message).
+    """
+
+    def __init__(self):
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def deliver_batch(self, transport: EmailTransport, session_factory=SessionLocal) -> int:
+        """Claim one batch, deliver it concurrently and record the outcome; returns the batch size"""
+        def claim() -> list[OutboxMessage]:
+            db = session_factory()
+            try:
+                return claim_due_emails(db, settings.EMAIL_OUTBOX_BATCH_SIZE, settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            finally:
+                db.close()
+
+        messages = await asyncio.to_thread(claim)
+        if not messages:
+            return 0
+
+        limit = asyncio.Semaphore(settings.EMAIL_OUTBOX_CONCURRENCY)
+
+        async def deliver(message: OutboxMessage) -> Exception | None:
+            async with limit:
+                try:
+                    await transport.send(message)
+                    return None
+                except Exception as e:
+                    logger.warning(f"Email {message.id} to {message.to_email} failed (attempt {message.attempts}): {e}")
+                    return e
+
+        errors = await asyncio.gather(*(deliver(message) for message in messages))
+        results = {message.id: error for message, error in zip(messages, errors)}
+        attempts = {message.id: message.attempts for message in messages}
+
+        def record() -> None:
+            db = session_factory()
+            try:
+                record_delivery_results(db, results, attempts)
+            finally:
+                db.close()
+
+        await asyncio.to_thread(record)
+        return len(messages)
+
+    async def run(self, transport: EmailTransport) -> None:
+        """Deliver forever; meant to run as a lifespan task"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                delivered = await self.deliver_batch(transport)
+            except Exception as e:
+                logger.error(f"Email outbox delivery failed: {e}")
+                delivered = 0
+            if delivered < settings.EMAIL_OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.EMAIL_OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+
+# Global email outbox worker instance
+email_outbox_worker = EmailOutboxWorker()
@@ -0,0 +1,214 @@
+"""Streaming bulk exports of users, calls and reports as CSV or NDJSON"""
+import base64
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from typing import Any, Callable, Iterator, NamedTuple
+
+from sqlalchemy import Row, String, and_, cast, literal, or_, select, type_coerce, union_all
+from sqlalchemy.orm import Session
+
+from app.models.user import Call, CallArchive, Report, User
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+class ExportDataset(NamedTuple):
+    columns: tuple[str, ...]
+    # Rows are ordered by (time_column, "id"); it is also the date-range filter
+    time_column: str
+    # stmt(since, until, after) -> SELECT of `columns`, filtered, in keyset order
+    stmt: Callable[..., Any]
+
+
+def _keyset_filters(time_col, id_col, since: datetime | None, until: datetime | None,
+                    after: tuple[datetime, str] | None) -> list:
+    """Date range [since, until) on time_col plus the keyset position after (time, id)"""
+    filters = []
+    if since is not None:
+        filters.append(time_col >= since)
+    if until is not None:
+        filters.append(time_col < until)
+    if after is not None:
+        after_time, after_id = after
+        filters.append(or_(time_col > after_time, and_(time_col == after_time, id_col > after_id)))
+    return filters
+
+
+USER_EXPORT_COLUMNS = (
+    "id", "username", "email", "full_name", "role", "is_verified", "is_active", "is_online", "created_at",
+)
+
+
+def _users_stmt(since, until, after):
+    columns = [getattr(User, name) for name in USER_EXPORT_COLUMNS]
+    return (
+        select(*columns)
+        .where(*_keyset_filters(User.created_at, User.id, since, until, after))
+        .order_by(User.created_at, User.id)
+    )
+
+
+CALL_EXPORT_COLUMNS = (
+    "id", "initiator_id", "receiver_id", "status", "started_at", "ended_at", "duration_seconds", "archived",
+)
+
+
+def _calls_stmt(since, until, after):
+    """Calls from the hot table and the archive, merged in (started_at, id) order.
+
+    status is cast to text in both branches: migration 001 made calls.status a
+    varchar while calls_archive.status is the callstatus enum, and Postgres will
+    not UNION the two.
+    """
+    branches = [
+        select(
+            table.id, table.initiator_id, table.receiver_id, cast(table.status, String).label("status"), table.started_at,
+            table.ended_at, table.duration_seconds, literal(archived).label("archived"),
+        ).where(*_keyset_filters(table.started_at, table.id, since, until, after))
+        for table, archived in ((Call, False), (CallArchive, True))
+    ]
+    merged = union_all(*branches).subquery()
+    # Read the text back as CallStatus (type_coerce only changes result processing)
+    columns = [
+        type_coerce(merged.c.status, Call.status.type).label("status") if name == "status" else merged.c[name]
+        for name in CALL_EXPORT_COLUMNS
+    ]
+    return select(*columns).order_by(merged.c.started_at, merged.c.id)
+
+
+REPORT_EXPORT_COLUMNS = ("id", "reporter_id", "reported_id", "reason", "description", "is_resolved", "created_at")
+
+
+def _reports_stmt(since, until, after):
+    columns = [getattr(Report, name) for name in REPORT_EXPORT_COLUMNS]
+    return (
+        select(*columns)
+        .where(*_keyset_filters(Report.created_at, Report.id, since, until, after))
+        .order_by(Report.created_at, Report.id)
+    )
+
+
+EXPORT_DATASETS = {
+    "users": ExportDataset(USER_EXPORT_COLUMNS, "created_at", _users_stmt),
+    "calls": ExportDataset(CALL_EXPORT_COLUMNS, "started_at", _calls_stmt),
+    "reports": ExportDataset(REPORT_EXPORT_COLUMNS, "created_at", _reports_stmt),
+}
+
+
+def encode_export_cursor(time_value: datetime, row_id: str) -> str:
+    """Encode the keyset position of an exported row as an opaque cursor"""
+    raw = f"{time_value.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_export_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decode a cursor from encode_export_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        time_value, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(time_value), row_id
+    except Exception:
+        raise ValueError("Invalid export cursor")
+
+
+def export_cursor_for(dataset: str, record: dict) -> str:
+    """The cursor that resumes an export after `record` (a row as exported, values as strings)"""
+    time_column = EXPORT_DATASETS[dataset].time_column
+    return encode_export_cursor(datetime.fromisoformat(record[time_column]), record["id"])
+
+
+def iter_export_rows(
+    db: Session,
+    dataset: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    after: tuple[datetime, str] | None = None,
+    batch_size: int = 1000,
+) -> Iterator[list[Row]]:
+    """Yield the export's rows in batches of up to batch_size.
+
+    The query runs once with yield_per, so rows are fetched from a server-side
+    cursor (a plain cursor on SQLite) batch by batch and memory stays flat however
+    large the table is.
+    """
+    stmt = EXPORT_DATASETS[dataset].stmt(since, until, after)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+# Leading characters a spreadsheet reads as the start of a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@")
+
+
+def _csv_cell(value: Any) -> Any:
+    """A value as a CSV cell; text that would be read as a formula is prefixed with '"""
+    if value is None:
+        return ""
+    value = _plain(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def format_csv(batches: Iterator[list[Row]], columns: tuple[str, ...], header: bool = True) -> Iterator[str]:
+    """CSV text, one chunk per batch, the header (if wanted) in the first.
+
+    Exports are opened in spreadsheets, so user-controlled text starting with a
+    formula character is neutralized (CSV injection); NDJSON is written as-is.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only: nothing matched
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def format_ndjson(batches: Iterator[list[Row]], columns: tuple[str, ...], header: bool = True) -> Iterator[str]:
+    """One JSON object per line, one chunk per batch (header is ignored)"""
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, (_plain(value) for value in row))), separators=(",", ":")) + "\n"
+            for row in batch
+        )
+
+
+def stream_export(
+    db: Session,
+    dataset: str,
+    export_format: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    after: tuple[datetime, str] | None = None,
+    batch_size: int = 1000,
+) -> Iterator[str]:
+    """The export as text chunks in export_format ("csv" or "ndjson").
+
+    A resumed export (after given) has no CSV header, so it can be appended to
+    what was already received.
+    """
+    columns = EXPORT_DATASETS[dataset].columns
+    batches = iter_export_rows(db, dataset, since, until, after, batch_size)
+    formatter = format_csv if export_format == "csv" else format_ndjson
+    return formatter(batches, columns, header=after is None)
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from app.models.user import User, Call
+from app.utils.moderation import suppressed_users
 from datetime import datetime
 import uuid
 import random
@@ -20,13 +21,14 @@ class MatchmakingQueue:
         self.waiting_users = [u for u in self.waiting_users if u["user_id"] != user_id]
     
     def find_match(self, user_id: str, blocked_users: list = None) -> dict | None:
-        """Find a match for the user, excluding blocked users"""
+        """Find a match for the user, excluding blocked and suppressed users"""
         if blocked_users is None:
             blocked_users = []
         
         available_users = [
             u for u in self.waiting_users 
             if u["user_id"] != user_id and u["user_id"] not in blocked_users
+            and u["user_id"] not in suppressed_users
         ]
         
         if available_users:
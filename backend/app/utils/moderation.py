@@ -0,0 +1,228 @@
+"""Report moderation: sliding-window report counters, suppression and the admin review queue"""
+import base64
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Row, and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.user import Report, ReportCountBucket, User, UserReportStats
+
+
+class SuppressedUsers:
+    """Ids of suppressed users, checked by the availability and matching paths.
+
+    Membership is a frozenset lookup. Suppressions and lifts made by this worker
+    apply at once; the set is reloaded from user_report_stats when older than
+    max_age_seconds, so other workers' changes show up within that time.
+    """
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self.ids: frozenset[str] = frozenset()
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+        # Bumped by every local change; a load that raced a change is discarded
+        self._version = 0
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.max_age_seconds
+
+    def load(self, db: Session) -> int:
+        with self._lock:
+            version = self._version
+        ids = frozenset(db.execute(
+            select(UserReportStats.user_id).where(UserReportStats.suppressed_at.isnot(None))
+        ).scalars())
+        with self._lock:
+            if version == self._version:
+                self.ids, self._loaded_at = ids, time.monotonic()
+        return len(ids)
+
+    def refresh_if_stale(self, db: Session) -> None:
+        if self.is_stale():
+            self.load(db)
+
+    def add(self, user_id: str) -> None:
+        with self._lock:
+            self._version += 1
+            self.ids = self.ids | {user_id}
+
+    def discard(self, user_id: str) -> None:
+        with self._lock:
+            self._version += 1
+            self.ids = self.ids - {user_id}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version += 1
+            self.ids, self._loaded_at = frozenset(), None
+
+
+suppressed_users = SuppressedUsers(settings.SUPPRESSED_USERS_REFRESH_SECONDS)
+
+
+def _insert_stmt(db: Session):
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+
+def count_report(db: Session, reporter_id: str, reported_id: str, now: datetime | None = None) -> bool:
+    """Add a new report against reported_id to its counters; True if it newly suppresses them.
+
+    Call before adding the Report and commit both together. Every report counts
+    towards open_reports, but a reporter who already has an open report on the user
+    does not add to the windows again, so no single reporter can reach a threshold.
+    """
+    now = now or datetime.utcnow()
+    insert_stmt = _insert_stmt(db)
+    repeat = db.execute(
+        select(Report.id).where(
+            Report.reported_id == reported_id, Report.reporter_id == reporter_id, Report.is_resolved == False
+        ).limit(1)
+    ).first() is not None
+
+    stmt = insert_stmt(UserReportStats).values(user_id=reported_id, total_reports=1, open_reports=1, updated_at=now)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserReportStats.user_id],
+        set_={
+            "total_reports": UserReportStats.total_reports + 1,
+            "open_reports": UserReportStats.open_reports + 1,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+    thresholds = settings.REPORT_SUPPRESSION_THRESHOLDS
+    if repeat or not thresholds:
+        return False
+
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    stmt = insert_stmt(ReportCountBucket).values(user_id=reported_id, bucket_start=hour, reports=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[ReportCountBucket.user_id, ReportCountBucket.bucket_start],
+        set_={"reports": ReportCountBucket.reports + 1},
+    ))
+    # A window of N hours is the current hour's bucket and the N - 1 before it;
+    # older buckets can no longer count towards any window
+    oldest = hour - timedelta(hours=max(thresholds) - 1)
+    db.execute(delete(ReportCountBucket).where(
+        ReportCountBucket.user_id == reported_id, ReportCountBucket.bucket_start < oldest
+    ))
+    buckets = db.execute(
+        select(ReportCountBucket.bucket_start, ReportCountBucket.reports).where(ReportCountBucket.user_id == reported_id)
+    ).all()
+    if not any(
+        sum(reports for start, reports in buckets if start > hour - timedelta(hours=window)) >= threshold
+        for window, threshold in thresholds.items()
+    ):
+        return False
+
+    return db.execute(
+        update(UserReportStats)
+        .where(UserReportStats.user_id == reported_id, UserReportStats.suppressed_at.is_(None))
+        .values(suppressed_at=now)
+    ).rowcount == 1
+
+
+def resolve_report(db: Session, report_id: str) -> bool:
+    """Mark an open report resolved; False if there is no such open report"""
+    reported_id = db.execute(
+        select(Report.reported_id).where(Report.id == report_id, Report.is_resolved == False)
+    ).scalar()
+    if reported_id is None:
+        return False
+    resolved = db.execute(
+        update(Report).where(Report.id == report_id, Report.is_resolved == False).values(is_resolved=True)
+    ).rowcount
+    if resolved:
+        db.execute(
+            update(UserReportStats)
+            .where(UserReportStats.user_id == reported_id)
+            .values(open_reports=UserReportStats.open_reports - 1, updated_at=datetime.utcnow())
+        )
+    db.commit()
+    return bool(resolved)
+
+
+def unsuppress_user(db: Session, user_id: str) -> bool:
+    """Lift a suppression; False if the user was not suppressed.
+
+    The user's windows are reset as well, so reports already counted cannot
+    suppress them again on the next report.
+    """
+    lifted = db.execute(
+        update(UserReportStats)
+        .where(UserReportStats.user_id == user_id, UserReportStats.suppressed_at.isnot(None))
+        .values(suppressed_at=None, updated_at=datetime.utcnow())
+    ).rowcount
+    if lifted:
+        db.execute(delete(ReportCountBucket).where(ReportCountBucket.user_id == user_id))
+    db.commit()
+    if lifted:
+        suppressed_users.discard(user_id)
+    return bool(lifted)
+
+
+def encode_report_cursor(created_at: datetime, report_id: str) -> str:
+    """Encode a review queue keyset position as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{report_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_report_cursor(cursor: str) -> tuple[datetime, str]:
+    """Decode a cursor from encode_report_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, report_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), report_id
+    except Exception:
+        raise ValueError("Invalid report cursor")
+
+
+def get_open_reports(db: Session, limit: int = 50, after: tuple[datetime, str] | None = None) -> list[Row]:
+    """Get a page of the review queue as ReportReviewResponse-shaped rows.
+
+    Unresolved reports oldest first, keyset-paginated on (created_at, id); pass the
+    last row's (created_at, id) as `after` for the next page. Each row carries both
+    usernames and the reported user's open report count and suppression.
+    """
+    reporter = aliased(User)
+    reported = aliased(User)
+
+    stmt = select(
+        Report.id,
+        Report.reporter_id,
+        Report.reported_id,
+        reporter.username.label("reporter_username"),
+        reported.username.label("reported_username"),
+        Report.reason,
+        Report.description,
+        Report.created_at,
+        func.coalesce(UserReportStats.open_reports, 0).label("reported_open_reports"),
+        UserReportStats.suppressed_at.isnot(None).label("reported_suppressed"),
+    ).outerjoin(
+        reporter, reporter.id == Report.reporter_id
+    ).outerjoin(
+        reported, reported.id == Report.reported_id
+    ).outerjoin(
+        UserReportStats, UserReportStats.user_id == Report.reported_id
+    ).where(
+        Report.is_resolved == False
+    )
+
+    if after is not None:
+        after_created_at, after_id = after
+        stmt = stmt.where(or_(
+            Report.created_at > after_created_at,
+            and_(Report.created_at == after_created_at, Report.id > after_id)
+        ))
+
+    return db.execute(stmt.order_by(Report.created_at, Report.id).limit(limit)).all()
@@ -0,0 +1,152 @@
+"""Login OTP storage: one live code per user with a TTL and an attempt limit"""
+import hashlib
+import hmac
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import LoginOTP
+
+
+def _digest(user_id: str, code: str) -> str:
+    """Keyed hash of a code, so stored OTPs are useless if the store leaks"""
+    return hmac.new(settings.SECRET_KEY.encode(), f"{user_id}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+class OTPStore(ABC):
+    """Issue and verify login OTPs.
+
+    issue() replaces any live code for the user. verify() compares in constant time,
+    consumes the code on success and drops it after max_attempts wrong guesses.
+    Methods take the request's db session and work in its transaction: the caller
+    commits (with the OTP email, in issue's case). Stores that do not need it ignore it.
+    """
+
+    def __init__(self, ttl_seconds: int, max_attempts: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def issue(self, db: Session, user_id: str, code: str) -> None:
+        ...
+
+    @abstractmethod
+    def verify(self, db: Session, user_id: str, code: str) -> bool:
+        ...
+
+    @abstractmethod
+    def purge(self, db: Session) -> int:
+        """Remove expired codes; returns how many were removed"""
+
+
+class _MemoryOTP(NamedTuple):
+    digest: str
+    expires_at: float
+    attempts: int
+
+
+class MemoryOTPStore(OTPStore):
+    """Process-local store; no database work on login. Bounded to max_entries users."""
+
+    def __init__(self, ttl_seconds: int, max_attempts: int, max_entries: int = 100000):
+        super().__init__(ttl_seconds, max_attempts)
+        self.max_entries = max_entries
+        self._codes: "OrderedDict[str, _MemoryOTP]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def issue(self, db: Session, user_id: str, code: str) -> None:
+        entry = _MemoryOTP(_digest(user_id, code), time.monotonic() + self.ttl_seconds, 0)
+        with self._lock:
+            self._codes.pop(user_id, None)
+            self._codes[user_id] = entry
+            while len(self._codes) > self.max_entries:
+                self._codes.popitem(last=False)
+
+    def verify(self, db: Session, user_id: str, code: str) -> bool:
+        candidate = _digest(user_id, code)
+        with self._lock:
+            entry = self._codes.get(user_id)
+            if entry is None:
+                return False
+            if entry.expires_at <= time.monotonic():
+                del self._codes[user_id]
+                return False
+            if hmac.compare_digest(entry.digest, candidate):
+                del self._codes[user_id]
+                return True
+            if entry.attempts + 1 >= self.max_attempts:
+                del self._codes[user_id]
+            else:
+                self._codes[user_id] = entry._replace(attempts=entry.attempts + 1)
+            return False
+
+    def purge(self, db: Session) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [user_id for user_id, entry in self._codes.items() if entry.expires_at <= now]
+            for user_id in expired:
+                del self._codes[user_id]
+        return len(expired)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._codes.clear()
+
+
+class SQLOTPStore(OTPStore):
+    """login_otps-backed store for multi-process deployments; keeps one row per user"""
+
+    def issue(self, db: Session, user_id: str, code: str) -> None:
+        db.execute(delete(LoginOTP).where(LoginOTP.user_id == user_id))
+        # A statement, not db.add: visible to the caller's later queries without a flush
+        db.execute(insert(LoginOTP).values(
+            user_id=user_id,
+            code=_digest(user_id, code),
+            expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+        ))
+
+    def verify(self, db: Session, user_id: str, code: str) -> bool:
+        row = db.execute(
+            select(LoginOTP.id, LoginOTP.code, LoginOTP.expires_at, LoginOTP.attempts)
+            .where(LoginOTP.user_id == user_id)
+            .order_by(LoginOTP.created_at.desc())
+            .limit(1)
+        ).first()
+        if row is None:
+            return False
+        if row.expires_at <= datetime.utcnow():
+            db.execute(delete(LoginOTP).where(LoginOTP.id == row.id))
+            return False
+        if hmac.compare_digest(row.code, _digest(user_id, code)):
+            # Conditional delete: of two concurrent correct guesses only one consumes the code
+            consumed = db.execute(delete(LoginOTP).where(LoginOTP.id == row.id)).rowcount
+            return consumed == 1
+        if (row.attempts or 0) + 1 >= self.max_attempts:
+            db.execute(delete(LoginOTP).where(LoginOTP.id == row.id))
+        else:
+            db.execute(update(LoginOTP).where(LoginOTP.id == row.id).values(attempts=LoginOTP.attempts + 1))
+        return False
+
+    def purge(self, db: Session) -> int:
+        deleted = db.execute(delete(LoginOTP).where(LoginOTP.expires_at <= datetime.utcnow())).rowcount
+        return deleted or 0
+
+
+def create_otp_store() -> OTPStore:
+    """Build the store selected by OTP_STORE (memory / sql)"""
+    if settings.OTP_STORE == "memory":
+        return MemoryOTPStore(settings.LOGIN_OTP_TTL_SECONDS, settings.LOGIN_OTP_MAX_ATTEMPTS)
+    if settings.OTP_STORE == "sql":
+        return SQLOTPStore(settings.LOGIN_OTP_TTL_SECONDS, settings.LOGIN_OTP_MAX_ATTEMPTS)
+    raise ValueError(f"Unknown OTP_STORE: {settings.OTP_STORE}")
+
+
+# Global login OTP store instance
+otp_store = create_otp_store()
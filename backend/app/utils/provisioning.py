@@ -0,0 +1,190 @@
+"""Bulk student provisioning from a CSV roster (email, username, full_name, password)"""
+import csv
+import random
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, NamedTuple
+
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.models.user import User, UserRole, VerificationToken
+from app.schemas.user import UserCreate
+from app.utils.bulk import bulk_insert
+from app.utils.email import generate_verification_token, queue_emails, verification_email
+from app.utils.email_outbox import email_outbox_worker
+from app.utils.user_search import user_search_index
+
+ROSTER_COLUMNS = ("email", "username", "full_name", "password")
+# Skipped rows beyond this many are counted but their reasons are not kept
+MAX_REPORTED_ERRORS = 100
+
+
+class ProvisionResult(NamedTuple):
+    created: int
+    skipped: int
+    # "line N: reason" for the first MAX_REPORTED_ERRORS skipped rows
+    errors: list[str]
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """Roster rows processed (created or skipped) per second"""
+        return (self.created + self.skipped) / self.seconds if self.seconds else 0.0
+
+
+class _Skips:
+    def __init__(self):
+        self.count = 0
+        self.errors: list[str] = []
+
+    def add(self, line: int, reason: str) -> None:
+        self.count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line}: {reason}")
+
+
+def _taken(db: Session, users: list[UserCreate]) -> tuple[set[str], set[str]]:
+    """The emails and usernames among users that are already registered"""
+    emails = [user.email for user in users]
+    usernames = [user.username for user in users]
+    rows = db.execute(
+        select(User.email, User.username).where(or_(User.email.in_(emails), User.username.in_(usernames)))
+    ).all()
+    return {row.email for row in rows}, {row.username for row in rows}
+
+
+def _drop_taken(db: Session, batch: list[tuple[int, UserCreate]], skips: _Skips) -> list[tuple[int, UserCreate]]:
+    if not batch:
+        return batch
+    emails, usernames = _taken(db, [user for _, user in batch])
+    kept = []
+    for line, user in batch:
+        if user.email in emails:
+            skips.add(line, "email already registered")
+        elif user.username in usernames:
+            skips.add(line, "username already taken")
+        else:
+            kept.append((line, user))
+    return kept
+
+
+def _roster_batches(
+    db: Session, lines: Iterable[str], batch_size: int, skips: _Skips
+) -> Iterator[list[tuple[int, UserCreate]]]:
+    """Valid, not yet registered roster rows as (line, UserCreate), batch_size at a time.
+
+    Rows are validated like /auth/register; a repeat of an earlier row's email or
+    username in the same roster is skipped. Raises ValueError if the header lacks
+    a roster column.
+    """
+    reader = csv.DictReader(lines)
+    missing = [name for name in ROSTER_COLUMNS if name not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"Roster is missing columns: {', '.join(missing)}")
+
+    seen_emails: set[str] = set()
+    seen_usernames: set[str] = set()
+    batch: list[tuple[int, UserCreate]] = []
+    for record in reader:
+        line = reader.line_num
+        try:
+            user = UserCreate(**{name: (record[name] or "").strip() for name in ROSTER_COLUMNS})
+        except ValidationError as e:
+            skips.add(line, f"invalid {e.errors()[0]['loc'][0]}")
+            continue
+        if not user.email.endswith("@kiit.ac.in"):
+            skips.add(line, "only @kiit.ac.in email addresses are allowed")
+            continue
+        if not user.username or not user.full_name or not user.password:
+            skips.add(line, "username, full_name and password are required")
+            continue
+        if user.email in seen_emails or user.username in seen_usernames:
+            skips.add(line, "duplicate of an earlier roster row")
+            continue
+        seen_emails.add(user.email)
+        seen_usernames.add(user.username)
+        batch.append((line, user))
+        if len(batch) >= batch_size:
+            yield _drop_taken(db, batch, skips)
+            batch = []
+    if batch:
+        yield _drop_taken(db, batch, skips)
+
+
+def _insert_batch(db: Session, batch: list[tuple[int, UserCreate]], hashes: list[Future], skips: _Skips) -> int:
+    """Insert a batch's users, verification tokens and emails in one transaction.
+
+    A concurrent registration can take an email or username after the batch was
+    checked; the batch is then re-checked once and the clashing rows skipped.
+    """
+    entries = [(line, user, hashed.result()) for (line, user), hashed in zip(batch, hashes)]
+    for attempt in range(2):
+        now = datetime.utcnow()
+        users, tokens, messages = [], [], []
+        for _, user, hashed_password in entries:
+            user_id, token = str(uuid.uuid4()), generate_verification_token()
+            users.append({
+                "id": user_id, "email": user.email, "username": user.username, "full_name": user.full_name,
+                "hashed_password": hashed_password, "profile_picture": None, "bio": None,
+                "is_verified": False, "is_active": True, "is_online": False, "role": UserRole.STUDENT,
+                "created_at": now, "updated_at": now, "random_key": random.random(),
+            })
+            tokens.append({
+                "id": str(uuid.uuid4()), "user_id": user_id, "token": token, "is_used": False,
+                "created_at": now, "expires_at": now + timedelta(hours=24),
+            })
+            messages.append(verification_email(user.email, token, user.username))
+        try:
+            bulk_insert(db, User.__table__, users)
+            bulk_insert(db, VerificationToken.__table__, tokens)
+            queue_emails(db, messages)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise
+            kept = {line for line, _ in _drop_taken(db, [(line, user) for line, user, _ in entries], skips)}
+            entries = [entry for entry in entries if entry[0] in kept]
+            continue
+        for row in users:
+            user_search_index.upsert(row["id"], row["username"], row["full_name"])
+        return len(users)
+    return 0
+
+
+def provision_users(
+    db: Session, lines: Iterable[str], batch_size: int | None = None, workers: int | None = None
+) -> ProvisionResult:
+    """Create unverified student accounts for every valid row of a CSV roster.
+
+    The roster is read as a stream, batch_size rows at a time. Passwords are hashed
+    on a thread pool of `workers` (bcrypt releases the GIL), and the next batch is
+    hashing while the current one is inserted. Each batch is one transaction:
+    users and verification tokens go in with COPY on Postgres (multi-row INSERT
+    elsewhere) and their verification emails are queued in the outbox together.
+    Invalid, duplicate and already registered rows are skipped and reported.
+    """
+    batch_size = batch_size or settings.PROVISION_BATCH_SIZE
+    workers = workers or settings.PROVISION_HASH_WORKERS
+    started = time.perf_counter()
+    skips = _Skips()
+    created = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provision-bcrypt") as pool:
+        pending = None
+        for batch in _roster_batches(db, lines, batch_size, skips):
+            hashing = (batch, [pool.submit(get_password_hash, user.password) for _, user in batch])
+            if pending is not None:
+                created += _insert_batch(db, *pending, skips)
+            pending = hashing
+        if pending is not None:
+            created += _insert_batch(db, *pending, skips)
+    if created:
+        email_outbox_worker.wake()
+    return ProvisionResult(created, skips.count, skips.errors, time.perf_counter() - started)
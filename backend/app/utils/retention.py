@@ -0,0 +1,105 @@
+"""Retention: bounded, batched deletion of rows that are no longer needed"""
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import VerificationToken, LoginOTP, RefreshToken, Report, EmailOutbox
+
+
+class RetentionPolicy:
+    """Delete rows of `model` whose `age_column` is older than `keep_for`.
+
+    `where` adds a fixed filter (e.g. only used tokens). Every policy should have an
+    index on age_column (partial on `where` when there is one) so each batch is an
+    index range read rather than a table scan.
+    """
+
+    def __init__(self, name: str, model: Any, age_column: Any, keep_for: timedelta,
+                 where: Callable[[], Any] | None = None):
+        self.name = name
+        self.model = model
+        self.age_column = age_column
+        self.keep_for = keep_for
+        self.where = where
+
+    def delete_batch(self, db: Session, now: datetime, batch_size: int) -> int:
+        """Delete up to batch_size expired rows, oldest first, in one transaction"""
+        conditions = [self.age_column < now - self.keep_for]
+        if self.where is not None:
+            conditions.append(self.where())
+        ids = db.execute(
+            select(self.model.id).where(*conditions).order_by(self.age_column).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return 0
+        db.execute(delete(self.model).where(self.model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        return len(ids)
+
+
+def default_retention_policies() -> list[RetentionPolicy]:
+    """Policies for the tables that only grow: tokens, OTPs, refresh tokens, resolved reports and delivered email"""
+    return [
+        RetentionPolicy(
+            "verification_tokens_expired", VerificationToken, VerificationToken.expires_at,
+            timedelta(days=settings.RETENTION_EXPIRED_TOKEN_DAYS),
+        ),
+        # Tokens have no used_at; a used token was necessarily used after it was created
+        RetentionPolicy(
+            "verification_tokens_used", VerificationToken, VerificationToken.created_at,
+            timedelta(days=settings.RETENTION_USED_TOKEN_DAYS),
+            where=lambda: VerificationToken.is_used == True,
+        ),
+        RetentionPolicy("login_otps_expired", LoginOTP, LoginOTP.expires_at, timedelta(0)),
+        RetentionPolicy(
+            "refresh_tokens_expired", RefreshToken, RefreshToken.expires_at,
+            timedelta(days=settings.RETENTION_EXPIRED_REFRESH_TOKEN_DAYS),
+        ),
+        RetentionPolicy(
+            "reports_resolved", Report, Report.created_at,
+            timedelta(days=settings.RETENTION_RESOLVED_REPORT_DAYS),
+            where=lambda: Report.is_resolved == True,
+        ),
+        RetentionPolicy(
+            "email_outbox_sent", EmailOutbox, EmailOutbox.sent_at,
+            timedelta(days=settings.RETENTION_SENT_EMAIL_DAYS),
+            where=lambda: EmailOutbox.status == "sent",
+        ),
+        RetentionPolicy(
+            "email_outbox_failed", EmailOutbox, EmailOutbox.created_at,
+            timedelta(days=settings.RETENTION_FAILED_EMAIL_DAYS),
+            where=lambda: EmailOutbox.status == "failed",
+        ),
+    ]
+
+
+def run_retention(
+    db: Session,
+    policies: list[RetentionPolicy],
+    batch_size: int = 1000,
+    max_batches: int = 10,
+    pause_seconds: float = 0.0,
+) -> dict[str, int]:
+    """Apply each policy in batches of batch_size, pausing between batches.
+
+    A policy stops after a short batch or after max_batches; the cutoff is fixed at the
+    start of the run. Returns rows deleted per policy name; a policy that deleted the
+    full batch_size * max_batches may have a backlog left for the next run.
+    """
+    now = datetime.utcnow()
+    reclaimed: dict[str, int] = {}
+    for policy in policies:
+        deleted = 0
+        for batch in range(max_batches):
+            if batch and pause_seconds:
+                time.sleep(pause_seconds)
+            count = policy.delete_batch(db, now, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
+        reclaimed[policy.name] = deleted
+    return reclaimed
@@ -0,0 +1,146 @@
+"""Login sessions: short-lived access tokens renewed through rotating refresh tokens"""
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import create_access_token, revoked_sessions
+from app.models.user import RefreshToken
+
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _issue_tokens(db: Session, user_id: str, session_id: str) -> dict:
+    """Add a refresh token to the session (not committed) and mint a matching access token"""
+    refresh_token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        session_id=session_id,
+        token_hash=_hash_refresh_token(refresh_token),
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    access_token = create_access_token(
+        data={"sub": user_id, "sid": session_id},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def start_session(db: Session, user_id: str) -> dict:
+    """Start a login session; returns the access/refresh token pair"""
+    tokens = _issue_tokens(db, user_id, str(uuid.uuid4()))
+    db.commit()
+    return tokens
+
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> tuple[str, dict] | None:
+    """Exchange a refresh token for a new pair in the same session.
+
+    Each refresh token works once. Presenting one that was already rotated means it
+    leaked (or the client retried), so the whole session is revoked. Returns
+    (user_id, tokens), or None if the token is unknown, expired or revoked.
+    """
+    now = datetime.utcnow()
+    row = db.execute(
+        select(RefreshToken.id, RefreshToken.user_id, RefreshToken.session_id,
+               RefreshToken.expires_at, RefreshToken.used_at, RefreshToken.revoked_at)
+        .where(RefreshToken.token_hash == _hash_refresh_token(refresh_token))
+    ).first()
+    if row is None or row.revoked_at is not None or row.expires_at <= now:
+        return None
+
+    # Conditional update: of two concurrent rotations only one wins
+    claimed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == row.id, RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+    ).rowcount
+    if claimed != 1:
+        db.rollback()
+        revoke_session(db, row.session_id)
+        return None
+
+    tokens = _issue_tokens(db, row.user_id, row.session_id)
+    db.commit()
+    return row.user_id, tokens
+
+
+def revoke_session(db: Session, session_id: str) -> None:
+    """Revoke every refresh token in the session and reject its access tokens from now on"""
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.session_id == session_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    db.commit()
+    revoked_sessions.add(session_id)
+
+
+def revoke_user_sessions(db: Session, user_id: str) -> int:
+    """Revoke all of a user's live sessions (e.g. on deactivation); returns how many"""
+    now = datetime.utcnow()
+    session_ids = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None),
+               RefreshToken.expires_at > now)
+        .values(revoked_at=now)
+        .returning(RefreshToken.session_id)
+    ).scalars().all()
+    db.commit()
+    for session_id in set(session_ids):
+        revoked_sessions.add(session_id)
+    return len(set(session_ids))
+
+
+def is_session_revoked(db: Session, session_id: str) -> bool:
+    """Exact check behind the revocation filter"""
+    return db.execute(
+        select(RefreshToken.id)
+        .where(RefreshToken.session_id == session_id, RefreshToken.revoked_at.is_not(None))
+        .limit(1)
+    ).first() is not None
+
+
+def load_recent_revocations(db: Session) -> int:
+    """Refill the revocation filter after a restart with sessions whose access tokens may still be live"""
+    since = datetime.utcnow() - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    session_ids = db.execute(
+        select(RefreshToken.session_id).where(RefreshToken.revoked_at > since).distinct()
+    ).scalars().all()
+    for session_id in session_ids:
+        revoked_sessions.add(session_id)
+    return len(session_ids)
+
+
+# Async variants for the async auth routes and dependencies (see user_service)
+
+async def start_session_async(db: AsyncSession, user_id: str) -> dict:
+    return await db.run_sync(start_session, user_id)
+
+
+async def rotate_refresh_token_async(db: AsyncSession, refresh_token: str) -> tuple[str, dict] | None:
+    return await db.run_sync(rotate_refresh_token, refresh_token)
+
+
+async def revoke_session_async(db: AsyncSession, session_id: str) -> None:
+    await db.run_sync(revoke_session, session_id)
+
+
+async def revoke_user_sessions_async(db: AsyncSession, user_id: str) -> int:
+    return await db.run_sync(revoke_user_sessions, user_id)
+
+
+async def is_session_revoked_async(db: AsyncSession, session_id: str) -> bool:
+    return await db.run_sync(is_session_revoked, session_id)
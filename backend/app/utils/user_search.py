@@ -0,0 +1,309 @@
+"""User search: prefix and fuzzy matching on username and full_name.
+
+On Postgres the query runs in the database against pg_trgm GIN indexes (fuzzy and
+word-prefix LIKE) and lower(...) text_pattern_ops indexes (short prefixes). Other
+databases (SQLite in tests and local development) use UserSearchIndex, an
+in-process trigram and prefix index over the same columns that scores matches the
+same way pg_trgm does.
+
+A user matches when the query is a prefix of their username, of their full name or
+of any later word of their full name, or (for queries of MIN_FUZZY_LENGTH or more)
+when either field is at least SIMILARITY_THRESHOLD similar to it. Results are ranked
+by similarity, plus 1 for prefix matches, then by id; pages are keyset-paginated on
+(score, id).
+"""
+import base64
+import heapq
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import NamedTuple
+
+from sqlalchemy import Float, and_, case, cast, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+from app.utils.block_graph import block_graph
+
+# pg_trgm's default pg_trgm.similarity_threshold, used by its % operator
+SIMILARITY_THRESHOLD = 0.3
+# Shorter queries have too few trigrams to fuzzy-match usefully
+MIN_FUZZY_LENGTH = 3
+# pg_trgm words: runs of letters and digits
+_WORD = re.compile(r"[^\W_]+")
+
+
+class UserSearchResult(NamedTuple):
+    id: str
+    username: str
+    full_name: str
+    profile_picture: str | None
+    is_online: bool
+    score: float
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """pg_trgm's trigram set: each lowercased alphanumeric word padded with two spaces before and one after"""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update([padded[i:i + 3] for i in range(len(padded) - 2)])
+    return frozenset(grams)
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    """pg_trgm's similarity(): shared trigrams over all distinct trigrams"""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def _name_tokens(username: str, full_name: str) -> set[str]:
+    """Strings a query must prefix to match: username, full name, and the full name from each later word"""
+    tokens = {username, full_name}
+    space = full_name.find(" ")
+    while space != -1:
+        tokens.add(full_name[space + 1:])
+        space = full_name.find(" ", space + 1)
+    return tokens
+
+
+def encode_search_cursor(score: float, user_id: str) -> str:
+    """Encode a search keyset position as an opaque cursor"""
+    raw = f"{score!r}|{user_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, str]:
+    """Decode a cursor from encode_search_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, user_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return float(score), user_id
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+class UserSearchIndex:
+    """In-process search index over users' lowercased usernames and full names.
+
+    Holds a sorted token list for prefix lookups and trigram postings for fuzzy
+    lookups. Built lazily from the users table and rebuilt when older than
+    max_age_seconds; create_user and update_user keep it current in between.
+    """
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self._names: dict[str, tuple[str, str]] = {}
+        self._grams: dict[str, tuple[frozenset[str], frozenset[str]]] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._tokens: list[tuple[str, str]] = []
+        self._built_at: float | None = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at >= self.max_age_seconds
+
+    def load(self, users) -> None:
+        """Replace the index with (id, username, full_name) rows"""
+        names, grams, postings, tokens = {}, {}, {}, []
+        # Full names repeat far more than usernames; share their trigram sets
+        full_name_grams: dict[str, frozenset[str]] = {}
+        for user_id, username, full_name in users:
+            username, full_name = username.lower(), full_name.lower()
+            names[user_id] = (username, full_name)
+            if full_name not in full_name_grams:
+                full_name_grams[full_name] = trigrams(full_name)
+            grams[user_id] = (trigrams(username), full_name_grams[full_name])
+            for gram in grams[user_id][0] | grams[user_id][1]:
+                postings.setdefault(gram, set()).add(user_id)
+            tokens.extend((token, user_id) for token in _name_tokens(username, full_name))
+        tokens.sort()
+        with self._lock:
+            self._names, self._grams, self._postings, self._tokens = names, grams, postings, tokens
+            self._built_at = time.monotonic()
+
+    def refresh(self, db: Session) -> None:
+        self.load(db.execute(select(User.id, User.username, User.full_name)).all())
+
+    def upsert(self, user_id: str, username: str, full_name: str) -> None:
+        """Index a new or renamed user; a no-op until the index has been built"""
+        username, full_name = username.lower(), full_name.lower()
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(user_id)
+            self._names[user_id] = (username, full_name)
+            self._grams[user_id] = (trigrams(username), trigrams(full_name))
+            for gram in self._grams[user_id][0] | self._grams[user_id][1]:
+                self._postings.setdefault(gram, set()).add(user_id)
+            for token in _name_tokens(username, full_name):
+                insort(self._tokens, (token, user_id))
+
+    def _remove(self, user_id: str) -> None:
+        if user_id not in self._names:
+            return
+        username, full_name = self._names.pop(user_id)
+        username_grams, full_name_grams = self._grams.pop(user_id)
+        for gram in username_grams | full_name_grams:
+            self._postings[gram].discard(user_id)
+        for token in _name_tokens(username, full_name):
+            position = bisect_left(self._tokens, (token, user_id))
+            if position < len(self._tokens) and self._tokens[position] == (token, user_id):
+                del self._tokens[position]
+
+    def _scores(self, query_grams: frozenset[str], user_ids, bonus: float = 0.0) -> list[tuple[float, str]]:
+        """(similarity + bonus, user_id) for each user; the inlined form of max(similarity(...)) per field"""
+        if not query_grams:
+            return [(bonus, user_id) for user_id in user_ids]
+        size = len(query_grams)
+        # Full-name trigram sets are shared between users with the same name
+        full_name_scores: dict[int, float] = {}
+        scored = []
+        for user_id in user_ids:
+            username_grams, full_name_grams = self._grams[user_id]
+            shared = len(query_grams & username_grams)
+            score = shared / (size + len(username_grams) - shared)
+            full_name_score = full_name_scores.get(id(full_name_grams))
+            if full_name_score is None:
+                shared = len(query_grams & full_name_grams)
+                full_name_score = full_name_scores[id(full_name_grams)] = shared / (size + len(full_name_grams) - shared)
+            scored.append((max(score, full_name_score) + bonus, user_id))
+        return scored
+
+    def _similar(self, query_grams: frozenset[str]) -> set[str]:
+        """Users that can reach SIMILARITY_THRESHOLD, from the postings of the query's rarest trigrams.
+
+        A user needs at least ceil(threshold * |query trigrams|) shared trigrams in one
+        field, so they appear in at least one of any |query| - needed + 1 postings.
+        """
+        postings = sorted((self._postings.get(gram, set()) for gram in query_grams), key=len)
+        needed = max(1, math.ceil(SIMILARITY_THRESHOLD * len(query_grams)))
+        return set().union(*postings[:len(postings) - needed + 1])
+
+    @staticmethod
+    def _best(matches: list[tuple[float, str]], count: int,
+              after: tuple[float, str] | None) -> list[tuple[float, str]]:
+        if after is not None:
+            matches = [(score, user_id) for score, user_id in matches
+                       if score < after[0] or (score == after[0] and user_id > after[1])]
+        return heapq.nsmallest(count, matches, key=lambda match: (-match[0], match[1]))
+
+    def search(self, query: str, count: int, after: tuple[float, str] | None = None,
+               skip: frozenset[str] = frozenset()) -> list[tuple[float, str]]:
+        """Up to `count` matches for a normalized query as (score, user_id), best first.
+
+        Starts after the `after` position and leaves out users in `skip`. Prefix
+        matches all score above 1 and fuzzy-only matches below it, so the fuzzy
+        lookup only runs when prefix matches cannot fill the page.
+        """
+        query_grams = trigrams(query)
+        with self._lock:
+            prefixed = set()
+            position = bisect_left(self._tokens, (query, ""))
+            while position < len(self._tokens) and self._tokens[position][0].startswith(query):
+                prefixed.add(self._tokens[position][1])
+                position += 1
+            prefixed -= skip
+            best = self._best(self._scores(query_grams, prefixed, bonus=1.0), count, after)
+            if len(best) == count or len(query) < MIN_FUZZY_LENGTH:
+                return best
+
+            fuzzy = [
+                match for match in self._scores(query_grams, self._similar(query_grams) - prefixed - skip)
+                if match[0] >= SIMILARITY_THRESHOLD
+            ]
+            return best + self._best(fuzzy, count - len(best), after)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._names, self._grams, self._postings, self._tokens = {}, {}, {}, []
+            self._built_at = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+user_search_index = UserSearchIndex(settings.USER_SEARCH_INDEX_SECONDS)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _search_postgres(db: Session, viewer_id: str, query: str, limit: int,
+                     after: tuple[float, str] | None, excluded: frozenset[str]) -> list[UserSearchResult]:
+    username = func.lower(User.username)
+    full_name = func.lower(User.full_name)
+    pattern = _escape_like(query) + "%"
+    prefix = or_(
+        username.like(pattern, escape="!"),
+        full_name.like(pattern, escape="!"),
+        full_name.like("% " + pattern, escape="!"),
+    )
+    match = prefix
+    if len(query) >= MIN_FUZZY_LENGTH:
+        match = or_(prefix, username.op("%")(query), full_name.op("%")(query))
+    score = (
+        cast(func.greatest(func.similarity(username, query), func.similarity(full_name, query)), Float)
+        + case((prefix, 1.0), else_=0.0)
+    )
+
+    stmt = select(
+        User.id, User.username, User.full_name, User.profile_picture, User.is_online, score.label("score")
+    ).where(
+        match,
+        User.is_active == True,
+        User.is_verified == True,
+        User.id != viewer_id,
+    )
+    if after is not None:
+        stmt = stmt.where(or_(score < after[0], and_(score == after[0], User.id > after[1])))
+    # Over-fetch by the number of blocked users; at most that many are filtered out
+    rows = db.execute(stmt.order_by(score.desc(), User.id).limit(limit + len(excluded))).all()
+    return [UserSearchResult(*row) for row in rows if row.id not in excluded][:limit]
+
+
+def _search_in_process(db: Session, viewer_id: str, query: str, limit: int,
+                       after: tuple[float, str] | None, excluded: frozenset[str]) -> list[UserSearchResult]:
+    if user_search_index.is_stale():
+        user_search_index.refresh(db)
+    skip = excluded | {viewer_id}
+
+    # The index knows names only; fetch rows in rank order, dropping inactive and unverified users
+    results: list[UserSearchResult] = []
+    while len(results) < limit:
+        ranked = user_search_index.search(query, 2 * (limit - len(results)), after, skip)
+        if not ranked:
+            break
+        rows = {
+            row.id: row for row in db.execute(
+                select(User.id, User.username, User.full_name, User.profile_picture, User.is_online)
+                .where(User.id.in_([user_id for _, user_id in ranked]),
+                       User.is_active == True, User.is_verified == True)
+            ).all()
+        }
+        results.extend(UserSearchResult(*rows[user_id], score) for score, user_id in ranked if user_id in rows)
+        after = ranked[-1]
+    return results[:limit]
+
+
+def search_users(db: Session, viewer_id: str, query: str, limit: int = 20,
+                 after: tuple[float, str] | None = None) -> list[UserSearchResult]:
+    """Search active, verified users by username or full name, hiding the viewer and blocks both ways.
+
+    `query` should already be normalized (normalize_query). Pass the last result's
+    (score, id) as `after` for the next page.
+    """
+    excluded = block_graph.excluded_for(db, viewer_id)
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, viewer_id, query, limit, after, excluded)
+    return _search_in_process(db, viewer_id, query, limit, after, excluded)
@@ -1,12 +1,24 @@
+import base64
+import random
+from sqlalchemy import Row, select
 from sqlalchemy.orm import Session
-from app.models.user import User, BlockedUser, Report, VerificationToken, LoginOTP
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User, BlockedUser, Report, VerificationToken
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_password, verify_password_async, invalidate_cached_user
+from app.utils.token_service import revoke_user_sessions
+from app.utils.block_graph import block_graph
+from app.utils.user_search import user_search_index
+from app.utils.available_users import AVAILABLE_USER_COLUMNS, AvailableUser, available_users_snapshot
+from app.utils.moderation import count_report, suppressed_users
 from datetime import datetime, timedelta
 
 
-def create_user(db: Session, user_create: UserCreate) -> User:
-    hashed_password = get_password_hash(user_create.password)
+def create_user(db: Session, user_create: UserCreate, hashed_password: str | None = None) -> User:
+    """Create an unverified user; pass hashed_password when it was hashed off the event loop"""
+    if hashed_password is None:
+        hashed_password = get_password_hash(user_create.password)
     db_user = User(
         email=user_create.email,
         username=user_create.username,
@@ -17,6 +29,7 @@ def create_user(db: Session, user_create: UserCreate) -> User:
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    user_search_index.upsert(db_user.id, db_user.username, db_user.full_name)
     return db_user
 
 
@@ -28,6 +41,14 @@ def get_user_by_id(db: Session, user_id: str) -> User | None:
     return db.query(User).filter(User.id == user_id).first()
 
 
+def get_users_by_ids(db: Session, user_ids: list[str]) -> list[User]:
+    """Users with the given ids, in the given order, from one IN query; unknown ids are skipped"""
+    if not user_ids:
+        return []
+    users = {user.id: user for user in db.query(User).filter(User.id.in_(user_ids))}
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
 def get_user_by_username(db: Session, username: str) -> User | None:
     return db.query(User).filter(User.username == username).first()
 
@@ -39,12 +60,26 @@ def authenticate_user(db: Session, email: str, password: str) -> User | None:
     return user
 
 
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> User | None:
+    """authenticate_user with an awaited lookup and the bcrypt check on the bounded hashing pool"""
+    user = await get_user_by_email_async(db, email)
+    if not user or not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+
 def update_user(db: Session, user: User, user_update: UserUpdate) -> User:
+    if user not in db:
+        # Cached auth snapshots are detached; write through a row owned by this session
+        user = get_user_by_id(db, user.id)
     update_data = user_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user, field, value)
     db.commit()
     db.refresh(user)
+    invalidate_cached_user(user.id)
+    if "full_name" in update_data:
+        user_search_index.upsert(user.id, user.username, user.full_name)
     return user
 
 
@@ -52,7 +87,10 @@ def set_user_online(db: Session, user_id: str) -> None:
     user = get_user_by_id(db, user_id)
     if user:
         user.is_online = True
+        # New place in the available-users order each session
+        user.random_key = random.random()
         db.commit()
+        invalidate_cached_user(user_id)
 
 
 def set_user_offline(db: Session, user_id: str) -> None:
@@ -60,26 +98,50 @@ def set_user_offline(db: Session, user_id: str) -> None:
     if user:
         user.is_online = False
         db.commit()
+        invalidate_cached_user(user_id)
+
+
+def deactivate_user(db: Session, user_id: str) -> bool:
+    """Deactivate an account; its sessions are revoked and its tokens stop authenticating immediately"""
+    user = get_user_by_id(db, user_id)
+    if not user:
+        return False
+    user.is_active = False
+    user.is_online = False
+    db.commit()
+    invalidate_cached_user(user_id)
+    revoke_user_sessions(db, user_id)
+    return True
 
 
 def verify_user_email(db: Session, user: User) -> None:
     user.is_verified = True
     db.commit()
+    invalidate_cached_user(user.id)
 
 
 def is_user_blocked(db: Session, user_id: str, other_user_id: str) -> bool:
     """Check if user_id is blocked by other_user_id"""
-    blocked = db.query(BlockedUser).filter(
-        BlockedUser.blocker_id == other_user_id,
-        BlockedUser.blocked_id == user_id
-    ).first()
-    return blocked is not None
+    return block_graph.has_blocked(db, other_user_id, user_id)
 
 
 def block_user(db: Session, blocker_id: str, blocked_id: str) -> BlockedUser:
     blocked_user = BlockedUser(blocker_id=blocker_id, blocked_id=blocked_id)
     db.add(blocked_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Block pairs are unique; blocking again is a no-op
+        db.rollback()
+        existing = db.query(BlockedUser).filter(
+            BlockedUser.blocker_id == blocker_id,
+            BlockedUser.blocked_id == blocked_id
+        ).first()
+        if existing is None:
+            raise
+        return existing
+    block_graph.add(blocker_id, blocked_id)
+    invalidate_cached_user(blocker_id, blocked_id)
     return blocked_user
 
 
@@ -91,11 +153,15 @@ def unblock_user(db: Session, blocker_id: str, blocked_id: str) -> bool:
     if blocked_user:
         db.delete(blocked_user)
         db.commit()
+        block_graph.remove(blocker_id, blocked_id)
+        invalidate_cached_user(blocker_id, blocked_id)
         return True
     return False
 
 
 def report_user(db: Session, reporter_id: str, reported_id: str, reason: str, description: str | None) -> Report:
+    """File a report, updating the reported user's counters (and suppressing them past a threshold)"""
+    suppressed = count_report(db, reporter_id, reported_id)
     report = Report(
         reporter_id=reporter_id,
         reported_id=reported_id,
@@ -104,6 +170,8 @@ def report_user(db: Session, reporter_id: str, reported_id: str, reason: str, de
     )
     db.add(report)
     db.commit()
+    if suppressed:
+        suppressed_users.add(reported_id)
     return report
 
 
@@ -133,57 +201,136 @@ def get_verification_token(db: Session, token: str) -> VerificationToken | None:
     return result
 
 
-def create_login_otp(db: Session, user_id: str, code: str) -> LoginOTP:
-    # Invalidate any existing unused OTPs for this user
-    db.query(LoginOTP).filter(
-        LoginOTP.user_id == user_id,
-        LoginOTP.is_used == False
-    ).update({LoginOTP.is_used: True})
-    db.commit()
-
-    expires_at = datetime.utcnow() + timedelta(minutes=10)
-    login_otp = LoginOTP(
-        user_id=user_id,
-        code=code,
-        expires_at=expires_at
-    )
-    db.add(login_otp)
-    db.commit()
-    db.refresh(login_otp)
-    return login_otp
-
-
-def get_valid_login_otp(db: Session, user_id: str, code: str) -> LoginOTP | None:
-    return db.query(LoginOTP).filter(
-        LoginOTP.user_id == user_id,
-        LoginOTP.code == code,
-        LoginOTP.is_used == False,
-        LoginOTP.expires_at > datetime.utcnow()
-    ).order_by(LoginOTP.created_at.desc()).first()
-
-
-def get_available_users(db: Session, current_user_id: str, limit: int = 10) -> list[User]:
-    """Get list of online, verified users available for matching (excluding self, blocked, and blockers)"""
-    # Get users that current_user has blocked
-    blocked_by_me = db.query(BlockedUser.blocked_id).filter(
-        BlockedUser.blocker_id == current_user_id
-    ).all()
-    blocked_ids = [b[0] for b in blocked_by_me]
-    
-    # Get users that have blocked current_user
-    blocked_me = db.query(BlockedUser.blocker_id).filter(
-        BlockedUser.blocked_id == current_user_id
-    ).all()
-    blocker_ids = [b[0] for b in blocked_me]
-    
-    exclude_ids = [current_user_id] + blocked_ids + blocker_ids
-    
-    # Get online, verified users excluding the above
-    available_users = db.query(User).filter(
+def encode_available_cursor(start: float, after: float) -> str:
+    """Encode an available-users position (random start, last key returned) as an opaque cursor"""
+    raw = f"{start!r}|{after!r}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_available_cursor(cursor: str) -> tuple[float, float]:
+    """Decode a cursor from encode_available_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start, after = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        start, after = float(start), float(after)
+    except Exception:
+        raise ValueError("Invalid available users cursor")
+    if not (0.0 <= start < 1.0 and 0.0 <= after < 1.0):
+        raise ValueError("Invalid available users cursor")
+    return start, after
+
+
+def get_available_users(
+    db: Session,
+    current_user_id: str,
+    limit: int = 10,
+    start: float | None = None,
+    after: float | None = None,
+) -> list[Row]:
+    """Get online, verified users available for matching (excluding self, blocked, blockers and suppressed).
+
+    Returns projected rows (the AvailableUserResponse columns plus random_key) in
+    random_key order, beginning at `start` (random when omitted) and wrapping around
+    past 1.0 back to 0. For the next page pass the same start and the last row's
+    random_key as `after`; paging ends once the walk is back at start.
+    """
+    if start is None:
+        start = random.random()
+    suppressed_users.refresh_if_stale(db)
+    excluded = block_graph.excluded_for(db, current_user_id)
+    available = [
         User.is_online == True,
         User.is_verified == True,
         User.is_active == True,
-        User.id.notin_(exclude_ids)
-    ).limit(limit).all()
-    
-    return available_users
+        User.id != current_user_id,
+    ]
+    suppressed = suppressed_users.ids
+    if suppressed:
+        # Filtered in SQL: the set is global and can be far larger than a page
+        available.append(User.id.notin_(suppressed))
+
+    # Segments of the key space left to walk: [start, 1) then [0, start)
+    if after is None:
+        segments = [User.random_key >= start, User.random_key < start]
+    elif after >= start:
+        segments = [User.random_key > after, User.random_key < start]
+    else:
+        segments = [(User.random_key > after) & (User.random_key < start)]
+
+    users: list[Row] = []
+    for segment in segments:
+        # Over-fetch by the number of blocked users; at most that many are filtered out
+        rows = db.execute(
+            select(*AVAILABLE_USER_COLUMNS).where(*available, segment)
+            .order_by(User.random_key).limit(limit - len(users) + len(excluded))
+        ).all()
+        users.extend(row for row in rows if row.id not in excluded)
+        if len(users) >= limit:
+            return users[:limit]
+    return users
+
+
+# Async variants for async def routes and WebSocket handlers. Each runs the sync
+# function above through AsyncSession.run_sync, so the queries are shared and the
+# database I/O is awaited instead of blocking the event loop.
+
+async def create_user_async(db: AsyncSession, user_create: UserCreate, hashed_password: str | None = None) -> User:
+    return await db.run_sync(create_user, user_create, hashed_password)
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> User | None:
+    return await db.run_sync(get_user_by_email, email)
+
+
+async def get_user_by_id_async(db: AsyncSession, user_id: str) -> User | None:
+    return await db.run_sync(get_user_by_id, user_id)
+
+
+async def set_user_online_async(db: AsyncSession, user_id: str) -> None:
+    await db.run_sync(set_user_online, user_id)
+
+
+async def set_user_offline_async(db: AsyncSession, user_id: str) -> None:
+    await db.run_sync(set_user_offline, user_id)
+
+
+async def verify_user_email_async(db: AsyncSession, user: User) -> None:
+    await db.run_sync(verify_user_email, user)
+
+
+async def is_user_blocked_async(db: AsyncSession, user_id: str, other_user_id: str) -> bool:
+    cached = block_graph.peek(other_user_id, user_id)
+    if cached is not None:
+        return cached
+    return await db.run_sync(is_user_blocked, user_id, other_user_id)
+
+
+async def create_verification_token_async(db: AsyncSession, user_id: str, token: str) -> VerificationToken:
+    return await db.run_sync(create_verification_token, user_id, token)
+
+
+async def get_verification_token_async(db: AsyncSession, token: str) -> VerificationToken | None:
+    return await db.run_sync(get_verification_token, token)
+
+
+async def get_available_users_async(
+    db: AsyncSession, current_user_id: str, limit: int = 10, start: float | None = None, after: float | None = None
+) -> list[Row]:
+    return await db.run_sync(get_available_users, current_user_id, limit, start, after)
+
+
+async def get_available_users_page_async(
+    db: AsyncSession, current_user_id: str, limit: int, start: float | None = None, after: float | None = None
+) -> tuple[float, list[AvailableUser]]:
+    """get_available_users served from the shared snapshot (up to AVAILABLE_USERS_SNAPSHOT_SECONDS old).
+
+    Without a start, the viewer's start for the current snapshot is used. Returns
+    (start, page) so the caller can build the next page's cursor.
+    """
+    await available_users_snapshot.refresh_if_stale_async(db)
+    if suppressed_users.is_stale():
+        await db.run_sync(suppressed_users.load)
+    if start is None:
+        start = available_users_snapshot.start_for(current_user_id)
+    excluded = await db.run_sync(block_graph.excluded_for, current_user_id)
+    return start, available_users_snapshot.page(current_user_id, excluded, limit, start, after)
@@ -0,0 +1,177 @@
+"""Benchmark for request throughput with sync vs async database sessions.
+
+Simulates many concurrent clients each loading a page of call history, the way
+the async /calls routes do. It runs once with a sync Session called directly on
+the event loop (the old behaviour) and once through AsyncSession and the
+*_async service variants. A ticker measures event-loop lag meanwhile. Reports
+requests/s, how long clients took to get all their responses (percentiles over
+clients, all starting together) and loop lag.
+
+The database is a temporary SQLite file. --latency-ms adds a delay to every
+statement in the thread that runs it, standing in for the round trip to a
+database server. For the sync session that thread is the event loop; for
+aiosqlite it is the connection's worker thread. SQLite still runs the query
+itself in-process under the GIL, unlike a database server, so with little or
+no added latency both modes are CPU-bound.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_db_throughput
+    python -m benchmarks.bench_async_db_throughput --clients 500 --requests 5 --latency-ms 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.database import Base
+from app.models.user import Call, CallStatus, User
+from app.utils.call_service import get_user_call_history_rows, get_user_call_history_rows_async
+
+
+def seed(session_factory, users: int, calls_per_user: int) -> list[str]:
+    db = session_factory()
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    db.add_all(
+        User(id=user_id, username=f"user{i}", email=f"user{i}@kiit.ac.in", full_name=f"User {i}",
+             hashed_password="not-a-real-hash", is_verified=True)
+        for i, user_id in enumerate(user_ids)
+    )
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    db.add_all(
+        Call(initiator_id=initiator, receiver_id=rng.choice(user_ids), call_token=uuid.uuid4().hex,
+             status=CallStatus.COMPLETED, started_at=now - timedelta(minutes=rng.randint(10, 40000)),
+             ended_at=now, duration_seconds=rng.randint(10, 600))
+        for initiator in user_ids
+        for _ in range(calls_per_user)
+    )
+    db.commit()
+    db.close()
+    return user_ids
+
+
+def add_statement_latency(sync_engine, latency: float) -> None:
+    """Sleep for `latency` in the sqlite thread before each statement runs"""
+    def delay(statement):
+        time.sleep(latency)
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        if hasattr(dbapi_connection, "run_async"):
+            dbapi_connection.run_async(lambda conn: conn.set_trace_callback(delay))
+        else:
+            dbapi_connection.set_trace_callback(delay)
+
+
+async def measure_lag(stop: asyncio.Event, tick: float, samples: list[float]) -> None:
+    """Record how much later than requested each short sleep returns"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        samples.append(time.perf_counter() - started - tick)
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def run_clients(fetch_history, user_ids: list[str], clients: int, requests: int, tick: float) -> dict:
+    stop = asyncio.Event()
+    lag: list[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, tick, lag))
+    await asyncio.sleep(tick * 5)
+
+    finished: list[float] = []
+    started = time.perf_counter()
+
+    async def client(user_id: str) -> None:
+        for _ in range(requests):
+            await fetch_history(user_id)
+        finished.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client(user_ids[i % len(user_ids)]) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    finished.sort()
+    lag.sort()
+    return {
+        "elapsed": elapsed,
+        "throughput": clients * requests / elapsed,
+        "p50": percentile(finished, 0.5),
+        "p99": percentile(finished, 0.99),
+        "lag_p99": percentile(lag, 0.99),
+        "lag_max": lag[-1],
+    }
+
+
+def report(name: str, result: dict) -> None:
+    print(
+        f"{name:<14} {result['throughput']:8.0f} req/s | client done p50 {result['p50'] * 1000:7.0f}ms  "
+        f"p99 {result['p99'] * 1000:7.0f}ms | loop lag p99 {result['lag_p99'] * 1000:7.1f}ms  "
+        f"max {result['lag_max'] * 1000:7.1f}ms | {result['elapsed']:.1f}s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5, help="requests per client")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--calls-per-user", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated per-statement round trip")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--max-overflow", type=int, default=20)
+    parser.add_argument("--tick-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_async_db.db")
+    # Same pool shape as app.core.database (SQLite would default to other pools)
+    engine = create_engine(
+        f"sqlite:///{path}", poolclass=QueuePool, pool_size=args.pool_size, max_overflow=args.max_overflow
+    )
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool,
+        pool_size=args.pool_size, max_overflow=args.max_overflow
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    user_ids = seed(SessionLocal, args.users, args.calls_per_user)
+    engine.dispose()
+    add_statement_latency(engine, args.latency_ms / 1000)
+    add_statement_latency(async_engine.sync_engine, args.latency_ms / 1000)
+
+    async def sync_history(user_id: str):
+        db = SessionLocal()
+        try:
+            return get_user_call_history_rows(db, user_id, limit=10)
+        finally:
+            db.close()
+
+    async def async_history(user_id: str):
+        async with AsyncSessionLocal() as db:
+            return await get_user_call_history_rows_async(db, user_id, limit=10)
+
+    tick = args.tick_ms / 1000
+    print(
+        f"{args.clients} concurrent clients x {args.requests} history requests; "
+        f"{args.latency_ms}ms per statement; pool {args.pool_size}+{args.max_overflow}"
+    )
+    report("sync session", await run_clients(sync_history, user_ids, args.clients, args.requests, tick))
+    report("async session", await run_clients(async_history, user_ids, args.clients, args.requests, tick))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
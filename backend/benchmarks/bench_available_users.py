@@ -0,0 +1,152 @@
+"""Benchmark for the available-users query at a large online population.
+
+Compares four ways of picking a page of callable users:
+  first-rows    full User ORM rows, first `limit` by physical order (the old query)
+  order-random  projected columns with ORDER BY random()
+  random-key    projected columns walking the partial random_key index from a
+                random start (get_available_users)
+  snapshot      pages cut in memory from the shared snapshot, rebuilt when older
+                than --snapshot-seconds (what /calls/available serves)
+
+Reports per-query latency percentiles, SQL statements issued on the users table
+and how many distinct users the sampled pages reached, which shows whether the
+same people keep being offered.
+
+Usage (from backend/):
+    python -m benchmarks.bench_available_users
+    python -m benchmarks.bench_available_users --online 50000 --queries 500 --limit 20
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User
+from app.utils.available_users import AvailableUsersSnapshot
+from app.utils.block_graph import block_graph
+from app.utils.user_service import get_available_users
+
+
+def seed(session_factory, online: int, offline: int) -> list[str]:
+    db = session_factory()
+    rng = random.Random(0)
+    users = [
+        {
+            "id": str(uuid.uuid4()), "username": f"user{i}", "email": f"user{i}@kiit.ac.in",
+            "full_name": f"User {i}", "hashed_password": "$2b$12$" + "x" * 53,
+            "bio": "bio " * 50, "is_verified": True, "is_active": True,
+            "is_online": i < online, "random_key": rng.random(),
+        }
+        for i in range(online + offline)
+    ]
+    db.execute(User.__table__.insert(), users)
+    db.commit()
+    db.close()
+    return [user["id"] for user in users[:online]]
+
+
+def first_rows(db, user_id: str, limit: int):
+    return db.query(User).filter(
+        User.is_online == True, User.is_verified == True, User.is_active == True,
+        User.id.notin_([user_id])
+    ).limit(limit).all()
+
+
+def order_random(db, user_id: str, limit: int):
+    return db.execute(
+        select(User.id, User.username, User.full_name, User.profile_picture, User.bio, User.is_online)
+        .where(User.is_online == True, User.is_verified == True, User.is_active == True, User.id != user_id)
+        .order_by(func.random()).limit(limit)
+    ).all()
+
+
+def random_key(db, user_id: str, limit: int):
+    return get_available_users(db, user_id, limit=limit)
+
+
+def snapshot_pages(max_age_seconds: float):
+    snapshot = AvailableUsersSnapshot(max_age_seconds)
+
+    def query(db, user_id: str, limit: int):
+        if snapshot.is_stale():
+            snapshot.refresh(db)
+        return snapshot.page(user_id, block_graph.excluded_for(db, user_id), limit, random.random())
+    return query
+
+
+def run(engine, session_factory, query, user_ids: list[str], queries: int, limit: int) -> dict:
+    rng = random.Random(1)
+    latencies = []
+    reached = set()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    db = session_factory()
+    try:
+        for _ in range(queries):
+            user_id = rng.choice(user_ids)
+            started = time.perf_counter()
+            rows = query(db, user_id, limit)
+            latencies.append(time.perf_counter() - started)
+            reached.update(row.id for row in rows)
+            db.expunge_all()
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "reached": len(reached),
+        "statements": len(statements),
+    }
+
+
+def report(name: str, result: dict, queries: int, limit: int) -> None:
+    print(
+        f"{name:<13} p50 {result['p50'] * 1000:8.2f}ms  p99 {result['p99'] * 1000:8.2f}ms | "
+        f"users queries {result['statements']:4d} | "
+        f"distinct users reached {result['reached']:6d} / {queries * limit}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--online", type=int, default=50000)
+    parser.add_argument("--offline", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--snapshot-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_available_users.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    user_ids = seed(SessionLocal, args.online, args.offline)
+
+    print(f"{args.online} online / {args.offline} offline users; {args.queries} queries of {args.limit}")
+    modes = (
+        ("first-rows", first_rows),
+        ("order-random", order_random),
+        ("random-key", random_key),
+        ("snapshot", snapshot_pages(args.snapshot_seconds)),
+    )
+    for name, query in modes:
+        block_graph.clear()
+        report(name, run(engine, SessionLocal, query, user_ids, args.queries, args.limit), args.queries, args.limit)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
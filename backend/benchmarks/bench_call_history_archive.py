@@ -0,0 +1,141 @@
+"""Benchmark for the batched call-history archive job.
+
+Seeds a database with synthetic users and finished calls spread over 90 days,
+then drains the archive backlog with archive_call_history and reports per-pass
+timings.
+
+Usage (from backend/):
+    python -m benchmarks.bench_call_history_archive
+    python -m benchmarks.bench_call_history_archive --users 10000 --calls 100000
+    python -m benchmarks.bench_call_history_archive --database-url postgresql://...
+
+Without --database-url a throwaway SQLite file is used.
+"""
+import argparse
+import os
+import random
+import secrets
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User, Call, CallStatus
+from app.utils.call_service import archive_call_history
+
+SEED_CHUNK = 20000
+
+
+def seed(engine, users: int, calls: int) -> None:
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+
+    with engine.begin() as conn:
+        for offset in range(0, users, SEED_CHUNK):
+            conn.execute(insert(User), [
+                {
+                    "id": user_id,
+                    "email": f"user{offset + i}@kiit.ac.in",
+                    "username": f"user{offset + i}",
+                    "full_name": f"User {offset + i}",
+                    "hashed_password": "x",
+                    "is_verified": True,
+                }
+                for i, user_id in enumerate(user_ids[offset:offset + SEED_CHUNK])
+            ])
+
+    with engine.begin() as conn:
+        for offset in range(0, calls, SEED_CHUNK):
+            rows = []
+            for _ in range(min(SEED_CHUNK, calls - offset)):
+                initiator_id, receiver_id = rng.sample(user_ids, 2)
+                started_at = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+                duration = rng.randint(0, 1800)
+                rows.append({
+                    "id": str(uuid.uuid4()),
+                    "initiator_id": initiator_id,
+                    "receiver_id": receiver_id,
+                    "started_at": started_at,
+                    "ended_at": started_at + timedelta(seconds=duration),
+                    "duration_seconds": duration,
+                    "status": CallStatus.COMPLETED if rng.random() < 0.8 else CallStatus.REJECTED,
+                    "call_token": secrets.token_urlsafe(16),
+                })
+            conn.execute(insert(Call), rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--hot-days", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--max-batches", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp_path = None
+    database_url = args.database_url
+    if database_url is None:
+        fd, tmp_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{tmp_path}"
+
+    engine = create_engine(database_url)
+    try:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+        started = time.perf_counter()
+        seed(engine, args.users, args.calls)
+        print(f"Seeded {args.users} users / {args.calls} calls in {time.perf_counter() - started:.1f}s")
+
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        older_than = datetime.utcnow() - timedelta(days=args.hot_days)
+        pass_limit = args.batch_size * args.max_batches
+        pass_times = []
+        total = 0
+        drain_started = time.perf_counter()
+        try:
+            while True:
+                pass_started = time.perf_counter()
+                archived = archive_call_history(
+                    db,
+                    older_than=older_than,
+                    batch_size=args.batch_size,
+                    max_batches=args.max_batches,
+                )
+                pass_times.append(time.perf_counter() - pass_started)
+                total += archived
+                if archived < pass_limit:
+                    break
+            elapsed = time.perf_counter() - drain_started
+
+            steady_started = time.perf_counter()
+            archive_call_history(db, older_than=older_than, batch_size=args.batch_size)
+            steady = time.perf_counter() - steady_started
+        finally:
+            db.close()
+
+        pass_times.sort()
+        print(f"Archived {total} calls in {len(pass_times)} passes of up to {pass_limit} ({elapsed:.1f}s total)")
+        print(
+            f"Pass latency: min {pass_times[0] * 1000:.0f}ms  "
+            f"p50 {pass_times[len(pass_times) // 2] * 1000:.0f}ms  "
+            f"max {pass_times[-1] * 1000:.0f}ms"
+        )
+        print(f"Steady-state pass (nothing to archive): {steady * 1000:.0f}ms")
+    finally:
+        engine.dispose()
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark for streaming exports at a large table size.
+
+Seeds a temporary SQLite database with calls and compares two ways of producing
+an NDJSON export of the whole table:
+  load-all   SELECT everything with .all(), then serialize (the naive export)
+  stream     stream_export: yield_per batches serialized chunk by chunk
+
+Reports wall time, rows per second and peak Python memory (tracemalloc) for each;
+the stream's peak should stay flat as --calls grows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_exports
+    python -m benchmarks.bench_exports --calls 500000 --batch-size 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import Call, CallStatus, User
+from app.utils.exports import EXPORT_DATASETS, stream_export
+
+
+def seed(session_factory, calls: int) -> None:
+    db = session_factory()
+    users = [
+        {"id": str(uuid.uuid4()), "username": f"user{i}", "email": f"user{i}@kiit.ac.in", "full_name": f"User {i}",
+         "hashed_password": "not-a-real-hash", "is_verified": True, "is_active": True}
+        for i in range(2)
+    ]
+    db.execute(User.__table__.insert(), users)
+    start = datetime(2026, 1, 1)
+    for offset in range(0, calls, 10000):
+        db.execute(Call.__table__.insert(), [
+            {"id": str(uuid.uuid4()), "initiator_id": users[0]["id"], "receiver_id": users[1]["id"],
+             "started_at": start + timedelta(seconds=i), "ended_at": start + timedelta(seconds=i + 60),
+             "duration_seconds": 60, "status": CallStatus.COMPLETED, "call_token": str(uuid.uuid4())}
+            for i in range(offset, min(offset + 10000, calls))
+        ])
+    db.commit()
+    db.close()
+
+
+def load_all(db, batch_size: int) -> int:
+    columns = EXPORT_DATASETS["calls"].columns
+    rows = db.execute(EXPORT_DATASETS["calls"].stmt(None, None, None)).all()
+    body = "".join(
+        json.dumps({name: value.isoformat() if isinstance(value, datetime) else getattr(value, "value", value)
+                    for name, value in zip(columns, row)}, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+    return len(body)
+
+
+def stream(db, batch_size: int) -> int:
+    return sum(len(chunk) for chunk in stream_export(db, "calls", "ndjson", batch_size=batch_size))
+
+
+def run(session_factory, export, calls: int, batch_size: int) -> dict:
+    db = session_factory()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        size = export(db, batch_size)
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.close()
+    return {"seconds": elapsed, "rows_per_second": calls / elapsed, "peak_mb": peak / 2 ** 20, "bytes": size}
+
+
+def report(name: str, result: dict) -> None:
+    print(
+        f"{name:<9} {result['seconds']:7.2f}s  {result['rows_per_second']:9.0f} rows/s  "
+        f"peak {result['peak_mb']:8.1f} MiB  output {result['bytes'] / 2 ** 20:7.1f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_exports.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(SessionLocal, args.calls)
+
+    print(f"{args.calls} calls; NDJSON export, batch size {args.batch_size}")
+    report("load-all", run(SessionLocal, load_all, args.calls, args.batch_size))
+    report("stream", run(SessionLocal, stream, args.calls, args.batch_size))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark for event-loop lag during a burst of logins.
+
+Runs a burst of concurrent bcrypt verifications the way /auth/login does, once
+inline on the event loop (the old behaviour) and once through the bounded
+hashing pool. Meanwhile a ticker measures how late the loop wakes from a short
+sleep. Reports the lag percentiles, how many logins completed and how many were
+shed with 503.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login_event_loop_lag
+    python -m benchmarks.bench_login_event_loop_lag --concurrency 200 --tick-ms 10
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password, verify_password_async
+
+
+async def measure_lag(stop: asyncio.Event, tick: float, samples: list[float]) -> None:
+    """Record how much later than requested each short sleep returns"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        samples.append(time.perf_counter() - started - tick)
+
+
+async def inline_login(password: str, hashed: str) -> bool:
+    return verify_password(password, hashed)
+
+
+async def run_burst(login, concurrency: int, tick: float, password: str, hashed: str) -> dict:
+    stop = asyncio.Event()
+    samples: list[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, tick, samples))
+    await asyncio.sleep(tick * 5)
+
+    shed = 0
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login(password, hashed) for _ in range(concurrency)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    for result in results:
+        if isinstance(result, HTTPException) and result.status_code == 503:
+            shed += 1
+        elif isinstance(result, BaseException):
+            raise result
+
+    stop.set()
+    await ticker
+    samples.sort()
+    return {
+        "elapsed": elapsed,
+        "completed": concurrency - shed,
+        "shed": shed,
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max": samples[-1],
+    }
+
+
+def report(name: str, result: dict) -> None:
+    print(
+        f"{name:<14} lag p50 {result['p50'] * 1000:7.1f}ms  p99 {result['p99'] * 1000:7.1f}ms  "
+        f"max {result['max'] * 1000:7.1f}ms | {result['completed']} verified, {result['shed']} shed (503) "
+        f"in {result['elapsed']:.1f}s"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--tick-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+    tick = args.tick_ms / 1000
+    print(
+        f"{args.concurrency} concurrent logins; pool of {settings.PASSWORD_HASH_WORKERS} workers, "
+        f"at most {settings.PASSWORD_HASH_MAX_PENDING} in flight"
+    )
+
+    report("inline", await run_burst(inline_login, args.concurrency, tick, password, hashed))
+    report("hashing pool", await run_burst(verify_password_async, args.concurrency, tick, password, hashed))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
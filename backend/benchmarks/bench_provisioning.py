@@ -0,0 +1,93 @@
+"""Benchmark for bulk provisioning against one-by-one registration.
+
+Creates --rows students in a temporary SQLite database two ways:
+  per-row    what N /auth/register calls do: hash, then insert the user, the
+             verification token and the outbox email with a commit each
+  bulk       provision_users: hashing on a thread pool overlapped with batched
+             multi-row inserts, one commit per batch
+
+Reports wall time and rows per second for each. bcrypt dominates both; pass
+--fast-hash to replace it with a trivial hash and compare the database side alone.
+Hashing only scales with --workers on a machine with that many cores.
+
+Usage (from backend/):
+    python -m benchmarks.bench_provisioning
+    python -m benchmarks.bench_provisioning --rows 20000 --fast-hash
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.schemas.user import UserCreate
+from app.utils import provisioning
+from app.utils.email import generate_verification_token, queue_verification_email
+from app.utils.user_service import create_user, create_verification_token
+
+
+def roster(rows: int, prefix: str) -> str:
+    return "email,username,full_name,password\n" + "".join(
+        f"{prefix}{i}@kiit.ac.in,{prefix}{i},Student {i},password{i}\n" for i in range(rows)
+    )
+
+
+def per_row(db, rows: int, args) -> None:
+    for i in range(rows):
+        user_create = UserCreate(email=f"row{i}@kiit.ac.in", username=f"row{i}", full_name=f"Student {i}",
+                                 password=f"password{i}")
+        user = create_user(db, user_create, provisioning.get_password_hash(user_create.password))
+        token = generate_verification_token()
+        create_verification_token(db, user.id, token)
+        queue_verification_email(db, user.email, token, user.username)
+        db.commit()
+
+
+def bulk(db, rows: int, args) -> None:
+    provisioning.provision_users(db, io.StringIO(roster(rows, "bulk")), args.batch_size, args.workers)
+
+
+def run(session_factory, load, rows: int, args) -> dict:
+    db = session_factory()
+    started = time.perf_counter()
+    try:
+        load(db, rows, args)
+    finally:
+        elapsed = time.perf_counter() - started
+        db.close()
+    return {"seconds": elapsed, "rows_per_second": rows / elapsed}
+
+
+def report(name: str, result: dict) -> None:
+    print(f"{name:<8} {result['seconds']:7.2f}s  {result['rows_per_second']:9.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--fast-hash", action="store_true", help="skip bcrypt to time the database side alone")
+    args = parser.parse_args()
+
+    if args.fast_hash:
+        provisioning.get_password_hash = lambda password: f"not-a-real-hash:{password}"
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_provisioning.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    hashing = "no bcrypt" if args.fast_hash else f"bcrypt, {args.workers} hashing threads"
+    print(f"{args.rows} students; {hashing}, batch size {args.batch_size}")
+    report("per-row", run(SessionLocal, per_row, args.rows, args))
+    report("bulk", run(SessionLocal, bulk, args.rows, args))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
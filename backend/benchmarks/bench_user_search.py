@@ -0,0 +1,143 @@
+"""Benchmark for /users/search at a large user population.
+
+Seeds a temporary SQLite database with synthetic students (first name + surname,
+usernames derived from them) and times three kinds of query:
+  short-prefix  two-letter prefixes
+  prefix        longer username / surname prefixes
+  fuzzy         names with one letter dropped (typos)
+
+Each kind runs through an unindexed LIKE '%q%' scan over username and full_name
+(the only option without a search index) and through search_users, which on SQLite
+uses the in-process trigram/prefix index. Reports the index build time and
+per-query latency percentiles.
+
+Usage (from backend/):
+    python -m benchmarks.bench_user_search
+    python -m benchmarks.bench_user_search --users 200000 --queries 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, func, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.user import User
+from app.utils.block_graph import block_graph
+from app.utils.user_search import normalize_query, search_users, user_search_index
+
+FIRST_NAMES = [
+    "aarav", "aditi", "akash", "ananya", "arjun", "asha", "deepak", "divya", "gaurav", "isha",
+    "karan", "kavya", "meera", "mohit", "neha", "nikhil", "pooja", "priya", "rahul", "riya",
+    "rohan", "sakshi", "sanjay", "shreya", "sneha", "suresh", "tanvi", "varun", "vikram", "zoya",
+]
+SURNAMES = [
+    "agarwal", "banerjee", "bose", "chatterjee", "das", "desai", "ghosh", "gupta", "iyer", "jain",
+    "kapoor", "khan", "kumar", "mehta", "mishra", "mohanty", "nair", "patel", "pillai", "rao",
+    "reddy", "sahoo", "sharma", "singh", "sinha", "swain", "tripathi", "verma", "yadav", "pradhan",
+]
+
+
+def seed(session_factory, users: int) -> tuple[str, list[tuple[str, str]]]:
+    rng = random.Random(0)
+    rows, names = [], []
+    for i in range(users):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+        username = f"{first}{last[:3]}{i}"
+        rows.append({
+            "id": str(uuid.uuid4()), "username": username, "email": f"{username}@kiit.ac.in",
+            "full_name": f"{first.title()} {last.title()}", "hashed_password": "not-a-real-hash",
+            "is_verified": True, "is_active": True, "random_key": rng.random(),
+        })
+        names.append((username, last))
+    db = session_factory()
+    for start in range(0, len(rows), 10000):
+        db.execute(User.__table__.insert(), rows[start:start + 10000])
+    db.commit()
+    db.close()
+    return rows[0]["id"], names
+
+
+def build_queries(names: list[tuple[str, str]], count: int) -> dict[str, list[str]]:
+    rng = random.Random(1)
+    sample = [rng.choice(names) for _ in range(count)]
+
+    def typo(word: str) -> str:
+        position = rng.randrange(1, len(word) - 1)
+        return word[:position] + word[position + 1:]
+
+    return {
+        "short-prefix": [username[:2] for username, _ in sample],
+        "prefix": [rng.choice([username[:6], surname[:5]]) for username, surname in sample],
+        "fuzzy": [typo(surname) if len(surname) > 4 else typo(username[:8]) for username, surname in sample],
+    }
+
+
+def like_scan(db, viewer_id: str, query: str, limit: int):
+    pattern = f"%{query}%"
+    return db.execute(
+        select(User.id, User.username, User.full_name, User.profile_picture, User.is_online)
+        .where(or_(func.lower(User.username).like(pattern), func.lower(User.full_name).like(pattern)),
+               User.is_active == True, User.is_verified == True, User.id != viewer_id)
+        .order_by(User.username).limit(limit)
+    ).all()
+
+
+def indexed(db, viewer_id: str, query: str, limit: int):
+    return search_users(db, viewer_id, normalize_query(query), limit=limit)
+
+
+def run(session_factory, search, viewer_id: str, queries: list[str], limit: int) -> dict:
+    latencies = []
+    db = session_factory()
+    try:
+        for query in queries:
+            started = time.perf_counter()
+            search(db, viewer_id, query, limit)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        db.close()
+    latencies.sort()
+    return {
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def report(name: str, result: dict) -> None:
+    print(f"{name:<24} p50 {result['p50'] * 1000:8.2f}ms  p99 {result['p99'] * 1000:8.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200, help="queries per kind")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_user_search.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    viewer_id, names = seed(SessionLocal, args.users)
+    block_graph.clear()
+
+    db = SessionLocal()
+    started = time.perf_counter()
+    user_search_index.refresh(db)
+    db.close()
+    print(f"{args.users} users; in-process index built in {time.perf_counter() - started:.1f}s; "
+          f"{args.queries} queries per kind, limit {args.limit}")
+
+    for kind, queries in build_queries(names, args.queries).items():
+        report(f"{kind} / like-scan", run(SessionLocal, like_scan, viewer_id, queries, args.limit))
+        report(f"{kind} / search_users", run(SessionLocal, indexed, viewer_id, queries, args.limit))
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -27,14 +27,14 @@ def upgrade() -> None:
     # Index on verification_tokens.token for faster token lookups during email verification
     op.create_index('idx_verification_tokens_token', 'verification_tokens', ['token'], unique=True)
     
-    # Index on calls.caller_id for call history queries
-    op.create_index('idx_calls_caller_id', 'calls', ['caller_id'])
+    # Index on calls.initiator_id for call history queries
+    op.create_index('idx_calls_initiator_id', 'calls', ['initiator_id'])
     
     # Index on calls.receiver_id for call history queries
     op.create_index('idx_calls_receiver_id', 'calls', ['receiver_id'])
     
-    # Index on calls.created_at for chronological sorting
-    op.create_index('idx_calls_created_at', 'calls', ['created_at'])
+    # Index on calls.started_at for chronological sorting
+    op.create_index('idx_calls_started_at', 'calls', ['started_at'])
     
     # Index on blocked_users for permission checks
     op.create_index('idx_blocked_users_blocker_id', 'blocked_users', ['blocker_id'])
@@ -46,8 +46,8 @@ def downgrade() -> None:
     op.drop_index('idx_users_email', table_name='users')
     op.drop_index('idx_users_username', table_name='users')
     op.drop_index('idx_verification_tokens_token', table_name='verification_tokens')
-    op.drop_index('idx_calls_caller_id', table_name='calls')
+    op.drop_index('idx_calls_initiator_id', table_name='calls')
     op.drop_index('idx_calls_receiver_id', table_name='calls')
-    op.drop_index('idx_calls_created_at', table_name='calls')
+    op.drop_index('idx_calls_started_at', table_name='calls')
     op.drop_index('idx_blocked_users_blocker_id', table_name='blocked_users')
     op.drop_index('idx_blocked_users_blocked_id', table_name='blocked_users')
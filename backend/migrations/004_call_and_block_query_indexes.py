@@ -0,0 +1,71 @@
+"""Add indexes matching the call and block query shapes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Replace single-column call indexes with partial/expression indexes for the hot predicates"""
+    # Active call lookups: (initiator_id = :u OR receiver_id = :u) AND status = 'ONGOING'
+    op.create_index('ix_calls_initiator_ongoing', 'calls', ['initiator_id'],
+                    postgresql_where=sa.text("status = 'ONGOING'"),
+                    sqlite_where=sa.text("status = 'ONGOING'"))
+    op.create_index('ix_calls_receiver_ongoing', 'calls', ['receiver_id'],
+                    postgresql_where=sa.text("status = 'ONGOING'"),
+                    sqlite_where=sa.text("status = 'ONGOING'"))
+
+    # Incoming call polling: receiver_id = :u AND status = 'PENDING'
+    op.create_index('ix_calls_receiver_pending', 'calls', ['receiver_id'],
+                    postgresql_where=sa.text("status = 'PENDING'"),
+                    sqlite_where=sa.text("status = 'PENDING'"))
+
+    # History ordered by coalesce(ended_at, started_at), id per participant
+    op.create_index('ix_calls_initiator_recent', 'calls',
+                    ['initiator_id', sa.text('coalesce(ended_at, started_at)'), 'id'])
+    op.create_index('ix_calls_receiver_recent', 'calls',
+                    ['receiver_id', sa.text('coalesce(ended_at, started_at)'), 'id'])
+
+    # Superseded by the composite indexes above
+    op.drop_index('idx_calls_initiator_id', table_name='calls')
+    op.drop_index('idx_calls_receiver_id', table_name='calls')
+    op.drop_index('idx_calls_started_at', table_name='calls')
+
+    # One row per block pair; remove duplicates left by repeated blocks first
+    op.execute(
+        """
+        DELETE FROM blocked_users
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM blocked_users GROUP BY blocker_id, blocked_id
+        )
+        """
+    )
+    op.create_unique_constraint('uq_blocked_users_pair', 'blocked_users', ['blocker_id', 'blocked_id'])
+    # The unique constraint's leading column covers blocker_id lookups
+    op.drop_index('idx_blocked_users_blocker_id', table_name='blocked_users')
+
+
+def downgrade() -> None:
+    op.create_index('idx_blocked_users_blocker_id', 'blocked_users', ['blocker_id'])
+    op.drop_constraint('uq_blocked_users_pair', 'blocked_users', type_='unique')
+
+    op.create_index('idx_calls_started_at', 'calls', ['started_at'])
+    op.create_index('idx_calls_receiver_id', 'calls', ['receiver_id'])
+    op.create_index('idx_calls_initiator_id', 'calls', ['initiator_id'])
+
+    op.drop_index('ix_calls_receiver_recent', table_name='calls')
+    op.drop_index('ix_calls_initiator_recent', table_name='calls')
+    op.drop_index('ix_calls_receiver_pending', table_name='calls')
+    op.drop_index('ix_calls_receiver_ongoing', table_name='calls')
+    op.drop_index('ix_calls_initiator_ongoing', table_name='calls')
@@ -0,0 +1,58 @@
+"""Add month-partitioned calls archive
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.user import CallStatus
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create calls_archive (RANGE-partitioned on finished_at in Postgres) and the archiving index"""
+    # Same type as CallArchive.status / Call.status; reuse the enum if create_all already made it
+    call_status = postgresql.ENUM(CallStatus, name='callstatus', create_type=False)
+    call_status.create(op.get_bind(), checkfirst=True)
+    op.create_table(
+        'calls_archive',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=False),
+        sa.Column('initiator_id', sa.String(), nullable=False),
+        sa.Column('receiver_id', sa.String(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('ended_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Integer(), nullable=True),
+        sa.Column('status', call_status, nullable=False),
+        sa.Column('call_token', sa.String(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['initiator_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['receiver_id'], ['users.id']),
+        # The partition key has to be part of the primary key
+        sa.PrimaryKeyConstraint('id', 'finished_at'),
+        postgresql_partition_by='RANGE (finished_at)',
+    )
+    # Monthly partitions are created on demand by the archive job
+    op.create_index('ix_calls_archive_initiator_recent', 'calls_archive', ['initiator_id', 'finished_at', 'id'])
+    op.create_index('ix_calls_archive_receiver_recent', 'calls_archive', ['receiver_id', 'finished_at', 'id'])
+
+    # Archiving takes finished calls oldest first
+    op.create_index('ix_calls_finished_at', 'calls', [sa.text('coalesce(ended_at, started_at)')])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_calls_finished_at', table_name='calls')
+    op.drop_index('ix_calls_archive_receiver_recent', table_name='calls_archive')
+    op.drop_index('ix_calls_archive_initiator_recent', table_name='calls_archive')
+    op.drop_table('calls_archive')
+    # The callstatus type is left in place: the calls table may use it too
@@ -0,0 +1,50 @@
+"""Add per-user call stats rollup
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_call_stats',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('total_calls', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_seconds', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+    # Backfill from completed calls in both the hot table and the archive
+    op.execute(
+        """
+        INSERT INTO user_call_stats (user_id, total_calls, total_seconds, updated_at)
+        SELECT user_id, COUNT(*), COALESCE(SUM(duration_seconds), 0), CURRENT_TIMESTAMP
+        FROM (
+            SELECT initiator_id AS user_id, duration_seconds FROM calls WHERE status = 'COMPLETED'
+            UNION ALL
+            SELECT receiver_id, duration_seconds FROM calls WHERE status = 'COMPLETED'
+            UNION ALL
+            SELECT initiator_id, duration_seconds FROM calls_archive WHERE status = 'COMPLETED'
+            UNION ALL
+            SELECT receiver_id, duration_seconds FROM calls_archive WHERE status = 'COMPLETED'
+        ) AS participants
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_call_stats')
@@ -0,0 +1,31 @@
+"""Hash login OTPs, count attempts and index expiry
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Stored codes are now keyed hashes; outstanding plain-text codes cannot be verified
+    op.execute("DELETE FROM login_otps")
+    op.add_column('login_otps', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index('idx_login_otps_expires_at', 'login_otps', ['expires_at'])
+    # Codes are never looked up by value
+    op.drop_index('idx_login_otps_code', table_name='login_otps')
+
+
+def downgrade() -> None:
+    op.create_index('idx_login_otps_code', 'login_otps', ['code'])
+    op.drop_index('idx_login_otps_expires_at', table_name='login_otps')
+    op.drop_column('login_otps', 'attempts')
@@ -0,0 +1,41 @@
+"""Indexes for the retention job
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Each retention policy reads its candidates oldest first through one of these
+    op.create_index('ix_verification_tokens_expires_at', 'verification_tokens', ['expires_at'])
+    op.create_index('ix_verification_tokens_used_created_at', 'verification_tokens', ['created_at'],
+                    postgresql_where=sa.text("is_used"),
+                    sqlite_where=sa.text("is_used = 1"))
+    op.create_index('ix_reports_resolved_created_at', 'reports', ['created_at'],
+                    postgresql_where=sa.text("is_resolved"),
+                    sqlite_where=sa.text("is_resolved = 1"))
+    op.create_index('ix_email_outbox_sent_at', 'email_outbox', ['sent_at'],
+                    postgresql_where=sa.text("status = 'sent'"),
+                    sqlite_where=sa.text("status = 'sent'"))
+    op.create_index('ix_email_outbox_failed_created_at', 'email_outbox', ['created_at'],
+                    postgresql_where=sa.text("status = 'failed'"),
+                    sqlite_where=sa.text("status = 'failed'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_failed_created_at', table_name='email_outbox')
+    op.drop_index('ix_email_outbox_sent_at', table_name='email_outbox')
+    op.drop_index('ix_reports_resolved_created_at', table_name='reports')
+    op.drop_index('ix_verification_tokens_used_created_at', table_name='verification_tokens')
+    op.drop_index('ix_verification_tokens_expires_at', table_name='verification_tokens')
@@ -0,0 +1,45 @@
+"""Add refresh tokens
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('token_hash', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('used_at', sa.DateTime(), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token_hash'),
+    )
+    op.create_index('ix_refresh_tokens_session_id', 'refresh_tokens', ['session_id'])
+    op.create_index('ix_refresh_tokens_user_id', 'refresh_tokens', ['user_id'])
+    op.create_index('ix_refresh_tokens_revoked_at', 'refresh_tokens', ['revoked_at'])
+    op.create_index('ix_refresh_tokens_expires_at', 'refresh_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_refresh_tokens_expires_at', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_revoked_at', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_user_id', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_session_id', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
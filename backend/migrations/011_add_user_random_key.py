@@ -0,0 +1,34 @@
+"""Random sampling key and partial index for available users
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('random_key', sa.Float(), nullable=False, server_default='0'))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE users SET random_key = random()")
+        # New rows get their key from the application
+        op.alter_column('users', 'random_key', server_default=None)
+    else:
+        op.execute("UPDATE users SET random_key = (abs(random()) % 1000000000) / 1000000000.0")
+    op.create_index('ix_users_available_random_key', 'users', ['random_key'],
+                    postgresql_where=sa.text("is_online AND is_verified AND is_active"),
+                    sqlite_where=sa.text("is_online = 1 AND is_verified = 1 AND is_active = 1"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_available_random_key', table_name='users')
+    op.drop_column('users', 'random_key')
@@ -0,0 +1,36 @@
+"""Trigram and prefix indexes for user search (Postgres only)
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Other databases search through the application's in-process index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_users_full_name_trgm ON users USING gin (lower(full_name) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_users_username_prefix ON users (lower(username) text_pattern_ops)")
+    op.execute("CREATE INDEX ix_users_full_name_prefix ON users (lower(full_name) text_pattern_ops)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_users_full_name_prefix', table_name='users')
+    op.drop_index('ix_users_username_prefix', table_name='users')
+    op.drop_index('ix_users_full_name_trgm', table_name='users')
+    op.drop_index('ix_users_username_trgm', table_name='users')
@@ -0,0 +1,65 @@
+"""Add report counters, sliding-window buckets and review queue indexes
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_report_stats',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('total_reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('open_reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('suppressed_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('ix_user_report_stats_suppressed', 'user_report_stats', ['user_id'],
+                    postgresql_where=sa.text("suppressed_at IS NOT NULL"),
+                    sqlite_where=sa.text("suppressed_at IS NOT NULL"))
+    op.create_table(
+        'report_count_buckets',
+        sa.Column('user_id', sa.String(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'bucket_start'),
+    )
+
+    op.create_index('ix_reports_open_created_at', 'reports', ['created_at', 'id'],
+                    postgresql_where=sa.text("NOT is_resolved"),
+                    sqlite_where=sa.text("is_resolved = 0"))
+    op.create_index('ix_reports_open_pair', 'reports', ['reported_id', 'reporter_id'],
+                    postgresql_where=sa.text("NOT is_resolved"),
+                    sqlite_where=sa.text("is_resolved = 0"))
+
+    # Backfill totals; windows start counting from here, so nobody is suppressed retroactively
+    op.execute(
+        """
+        INSERT INTO user_report_stats (user_id, total_reports, open_reports, updated_at)
+        SELECT reported_id, COUNT(*), SUM(CASE WHEN is_resolved = FALSE THEN 1 ELSE 0 END), CURRENT_TIMESTAMP
+        FROM reports
+        GROUP BY reported_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reports_open_pair', table_name='reports')
+    op.drop_index('ix_reports_open_created_at', table_name='reports')
+    op.drop_table('report_count_buckets')
+    op.drop_index('ix_user_report_stats_suppressed', table_name='user_report_stats')
+    op.drop_table('user_report_stats')
@@ -0,0 +1,91 @@
+"""Shared test fixtures: an in-memory database, a user factory and reset process-local state.
+
+Test modules that need a different database (file-backed, shared with async
+sessions) define their own db fixture, which takes precedence over this one.
+"""
+import uuid
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.core.etag import change_counters
+from app.core.security import revoked_sessions, token_claims_cache, user_cache
+from app.models.user import User
+from app.utils.available_users import available_users_snapshot
+from app.utils.block_graph import block_graph
+from app.utils.call_service import active_call_index
+from app.utils.call_timeouts import pending_call_timeouts
+from app.utils.moderation import suppressed_users
+from app.utils.otp_store import MemoryOTPStore, otp_store
+from app.utils.user_search import user_search_index
+
+# Use in-memory SQLite for testing
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _clear_process_state():
+    """Empty the process-local caches and indexes that outlive a database"""
+    block_graph.clear()
+    suppressed_users.clear()
+    user_search_index.clear()
+    available_users_snapshot.clear()
+    change_counters.clear()
+    active_call_index.clear()
+    pending_call_timeouts.clear()
+    user_cache.clear()
+    token_claims_cache.clear()
+    revoked_sessions.clear()
+    # The SQL store keeps its codes in login_otps, which goes with the database
+    if isinstance(otp_store, MemoryOTPStore):
+        otp_store.clear()
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Create a fresh database and empty process-local state for each test"""
+    Base.metadata.create_all(bind=engine)
+    _clear_process_state()
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    _clear_process_state()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def session_factory():
+    """Sessions on the test database, for code that opens its own (workers, the CLI)"""
+    return TestingSessionLocal
+
+
+@pytest.fixture
+def create_test_user():
+    """Factory: create_test_user(username, db, **columns) -> user id.
+
+    Creates a verified, active, online user with username@test.com and a dummy
+    password hash (hashing is irrelevant here); any User column can be overridden.
+    """
+    def create(username: str, db, **columns) -> str:
+        user = User(**{
+            "id": str(uuid.uuid4()),
+            "username": username,
+            "email": f"{username}@test.com",
+            "full_name": f"Test {username}",
+            "hashed_password": "not-a-real-hash",
+            "is_verified": True,
+            "is_active": True,
+            "is_online": True,
+            **columns,
+        })
+        db.add(user)
+        db.commit()
+        return user.id
+
+    return create
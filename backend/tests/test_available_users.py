@@ -0,0 +1,60 @@
+"""Tests for the shared available-users snapshot"""
+import asyncio
+from sqlalchemy import event
+from app.utils.available_users import AvailableUsersSnapshot
+from app.utils.block_graph import block_graph
+from app.utils.user_service import get_available_users, block_user
+
+
+def test_snapshot_pages_match_query(db, create_test_user):
+    """Test pages cut from the snapshot match get_available_users for the same start"""
+    viewer = create_test_user("viewer", db)
+    online = [create_test_user(f"user{i}", db) for i in range(12)]
+    create_test_user("offline", db, is_online=False)
+    block_user(db, viewer, online[0])
+    block_user(db, online[1], viewer)
+    excluded = block_graph.excluded_for(db, viewer)
+    snapshot = AvailableUsersSnapshot(max_age_seconds=60)
+    snapshot.refresh(db)
+
+    assert excluded == {online[0], online[1]}
+    assert len(snapshot) == 13
+    for start in (0.0, 0.37, 0.99):
+        after = None
+        while True:
+            page = snapshot.page(viewer, excluded, 4, start, after)
+            expected = get_available_users(db, viewer, limit=4, start=start, after=after)
+            assert [user.id for user in page] == [row.id for row in expected]
+            if len(page) < 4:
+                break
+            after = page[-1].random_key
+
+
+def test_snapshot_rebuilds_once_per_interval(db, create_test_user):
+    """Test concurrent stale readers share one rebuild and fresh readers issue no query"""
+    create_test_user("alice", db)
+    snapshot = AvailableUsersSnapshot(max_age_seconds=60)
+    statements = []
+
+    class FakeAsyncSession:
+        async def run_sync(self, fn, *args):
+            await asyncio.sleep(0)
+            return fn(db, *args)
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def poll_many():
+        await asyncio.gather(*(snapshot.refresh_if_stale_async(FakeAsyncSession()) for _ in range(20)))
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        asyncio.run(poll_many())
+        assert len(statements) == 1
+        create_test_user("bob", db)
+        statements.clear()
+        asyncio.run(poll_many())
+        assert statements == []
+        assert len(snapshot) == 1
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
@@ -1,23 +1,32 @@
 """Test cases for call endpoints"""
+import os
+import tempfile
 import pytest
 from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import Base, get_db, get_async_db
 from app.models.user import User
 from app.core.security import create_access_token
+from app.core.etag import change_counters
+from app.utils.available_users import available_users_snapshot
+from app.utils.user_search import user_search_index
 from passlib.context import CryptContext
 import uuid
 
-# Use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# File-backed SQLite shared by the sync fixtures/routes and the async routes
+DB_PATH = os.path.join(tempfile.mkdtemp(), "test_calls.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool
+    connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# NullPool: the test client runs each request on its own event loop
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 def override_get_db():
     try:
@@ -26,7 +35,12 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -68,6 +82,9 @@ def create_test_user(username: str, email: str, db: Session = None):
 def db():
     """Create a fresh database for each test"""
     Base.metadata.create_all(bind=engine)
+    available_users_snapshot.clear()
+    user_search_index.clear()
+    change_counters.clear()
     db = TestingSessionLocal()
     yield db
     db.close()
@@ -96,6 +113,211 @@ def test_get_available_users(db, client):
     usernames = [u["username"] for u in available]
     assert "user1" not in usernames
 
+def test_available_users_paging(db, client):
+    """Test available users page through a shuffle with X-Next-Cursor"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    others = {create_test_user(f"user{i}", f"user{i}@test.com", db).username for i in range(2, 7)}
+    token = create_access_token({"sub": user1.id})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.get("/calls/available?limit=3", headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == 3
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get(f"/calls/available?limit=3&cursor={cursor}", headers=headers)
+    assert second.status_code == 200
+    assert "X-Next-Cursor" not in second.headers
+    assert {u["username"] for u in first.json() + second.json()} == others
+
+    bad = client.get("/calls/available?cursor=not-a-cursor", headers=headers)
+    assert bad.status_code == 400
+
+def test_search_users_endpoint(db, client):
+    """Test /users/search is routed before /users/{user_id} and pages with X-Next-Cursor"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    for name in ("asha", "ashok", "ashwin"):
+        create_test_user(name, f"{name}@test.com", db)
+    token = create_access_token({"sub": user1.id})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.get("/users/search?q=ash&limit=2", headers=headers)
+    assert first.status_code == 200
+    second = client.get(f"/users/search?q=ash&limit=2&cursor={first.headers['X-Next-Cursor']}", headers=headers)
+    assert second.status_code == 200
+    assert sorted(u["username"] for u in first.json() + second.json()) == ["asha", "ashok", "ashwin"]
+
+    assert client.get("/users/search?q=%20a%20", headers=headers).status_code == 400
+
+def test_profile_etags(db, client):
+    """Test /users/me and /users/{id} answer 304 until the profile changes"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user1.id})}"}
+
+    for path in ("/users/me", f"/users/{user2.id}"):
+        first = client.get(path, headers=headers)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        cached = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+        assert cached.content == b""
+
+    me = client.get("/users/me", headers=headers).headers["ETag"]
+    assert client.put("/users/me", json={"bio": "hello"}, headers=headers).status_code == 200
+    changed = client.get("/users/me", headers={**headers, "If-None-Match": me})
+    assert changed.status_code == 200
+    assert changed.json()["bio"] == "hello"
+    assert changed.headers["ETag"] != me
+
+def test_call_history_and_available_etags(db, client):
+    """Test /calls/history and /calls/available answer 304 until their data changes"""
+    user = create_test_user("user", "user@test.com", db)
+    other_user = create_test_user("other", "other@test.com", db)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+
+    history = client.get("/calls/history", headers=headers)
+    assert client.get("/calls/history", headers={**headers, "If-None-Match": history.headers["ETag"]}).status_code == 304
+
+    from app.utils.call_service import create_call
+    create_call(db, other_user.id, user.id)
+    changed = client.get("/calls/history", headers={**headers, "If-None-Match": history.headers["ETag"]})
+    assert changed.status_code == 200
+    assert len(changed.json()) == 1
+
+    available = client.get("/calls/available", headers=headers)
+    assert available.status_code == 200
+    etag = available.headers["ETag"]
+    assert client.get("/calls/available", headers={**headers, "If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+
+def test_get_users_batch(db, client):
+    """Test /users/batch returns the asked-for profiles in order, skipping unknown and blocked ids"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    user3 = create_test_user("user3", "user3@test.com", db)
+    user4 = create_test_user("user4", "user4@test.com", db)
+    from app.utils.user_service import block_user
+    block_user(db, user1.id, user4.id)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user1.id})}"}
+
+    response = client.get(f"/users/batch?ids={user3.id},{user2.id},missing,{user4.id},{user3.id}", headers=headers)
+    assert response.status_code == 200
+    assert [u["username"] for u in response.json()] == ["user3", "user2"]
+
+    assert client.get("/users/batch?ids=,", headers=headers).status_code == 400
+    too_many = ",".join(str(uuid.uuid4()) for _ in range(51))
+    assert client.get(f"/users/batch?ids={too_many}", headers=headers).status_code == 400
+
+def test_get_dashboard(db, client):
+    """Test /dashboard returns the profile, calls and available users together"""
+    user = create_test_user("user", "user@test.com", db)
+    other_user = create_test_user("other", "other@test.com", db)
+    create_test_user("third", "third@test.com", db)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+
+    from app.utils.call_service import create_call
+    call = create_call(db, other_user.id, user.id)
+
+    response = client.get("/dashboard?limit=1", headers=headers)
+    assert response.status_code == 200
+    dashboard = response.json()
+    assert dashboard["user"]["username"] == "user"
+    assert dashboard["pending_call"]["id"] == call.id
+    assert dashboard["active_call"] is None
+    assert len(dashboard["available_users"]) == 1
+    cursor = dashboard["available_users_cursor"]
+
+    rest = client.get(f"/calls/available?cursor={cursor}", headers=headers)
+    assert rest.status_code == 200
+    assert {u["username"] for u in dashboard["available_users"] + rest.json()} == {"other", "third"}
+
+def test_admin_report_queue(db, client):
+    """Test the review queue is admin-only, pages with X-Next-Cursor and drops resolved reports"""
+    from app.models.user import UserRole
+    from app.utils.user_service import report_user
+    user = create_test_user("user", "user@test.com", db)
+    target = create_test_user("target", "target@test.com", db)
+    admin = create_test_user("admin", "admin@test.com", db)
+    admin.role = UserRole.ADMIN
+    db.commit()
+    reports = [report_user(db, user.id, target.id, reason, None).id for reason in ("spam", "abuse")]
+
+    user_headers = {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+    assert client.get("/admin/reports", headers=user_headers).status_code == 403
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': admin.id})}"}
+    first = client.get("/admin/reports?limit=1", headers=headers)
+    assert first.status_code == 200
+    assert [r["id"] for r in first.json()] == reports[:1]
+    assert first.json()[0]["reported_open_reports"] == 2
+    second = client.get(f"/admin/reports?limit=1&cursor={first.headers['X-Next-Cursor']}", headers=headers)
+    assert [r["id"] for r in second.json()] == reports[1:]
+
+    assert client.post(f"/admin/reports/{reports[0]}/resolve", headers=headers).status_code == 200
+    assert client.post(f"/admin/reports/{reports[0]}/resolve", headers=headers).status_code == 404
+    assert [r["id"] for r in client.get("/admin/reports", headers=headers).json()] == reports[1:]
+    assert client.post(f"/admin/users/{target.id}/unsuppress", headers=headers).status_code == 404
+
+def test_admin_export_streams(db, client):
+    """Test exports are admin-only and stream CSV/NDJSON with resume cursors"""
+    import json
+    from app.models.user import UserRole
+    from app.utils.exports import export_cursor_for
+    user = create_test_user("user", "user@test.com", db)
+    admin = create_test_user("admin", "admin@test.com", db)
+    admin.role = UserRole.ADMIN
+    db.commit()
+
+    user_headers = {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+    assert client.get("/admin/exports/users", headers=user_headers).status_code == 403
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': admin.id})}"}
+    response = client.get("/admin/exports/users?format=ndjson", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["username"] for r in records] == ["user", "admin"]
+
+    cursor = export_cursor_for("users", records[0])
+    resumed = client.get(f"/admin/exports/users?format=csv&cursor={cursor}", headers=headers)
+    assert resumed.status_code == 200
+    assert resumed.text.startswith(admin.id)
+
+    assert client.get("/admin/exports/passwords", headers=headers).status_code == 404
+    assert client.get("/admin/exports/users?format=xml", headers=headers).status_code == 422
+    assert client.get("/admin/exports/users?cursor=not-a-cursor", headers=headers).status_code == 400
+
+def test_admin_provisions_roster(db, client):
+    """Test roster uploads are admin-only and create users, skipping taken rows"""
+    from app.models.user import UserRole, EmailOutbox
+    user = create_test_user("user", "user@test.com", db)
+    admin = create_test_user("admin", "admin@test.com", db)
+    admin.role = UserRole.ADMIN
+    db.commit()
+    roster = (
+        "email,username,full_name,password\n"
+        "new1@kiit.ac.in,new1,New One,secret1\n"
+        "new2@kiit.ac.in,user,New Two,secret2\n"
+    )
+    files = {"roster": ("roster.csv", roster, "text/csv")}
+
+    user_headers = {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+    assert client.post("/admin/users/provision", files=files, headers=user_headers).status_code == 403
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': admin.id})}"}
+    response = client.post("/admin/users/provision", files=files, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["skipped"]) == (1, 1)
+    assert body["errors"] == ["line 3: username already taken"]
+    assert body["rows_per_second"] > 0
+    assert db.query(User).filter(User.email == "new1@kiit.ac.in").one().is_verified is False
+    assert db.query(EmailOutbox).filter(EmailOutbox.to_email == "new1@kiit.ac.in").count() == 1
+
+    bad = {"roster": ("roster.csv", "email,username\n", "text/csv")}
+    assert client.post("/admin/users/provision", files=bad, headers=headers).status_code == 400
+
 def test_initiate_call(db, client):
     """Test initiating a call"""
     # Create test users
@@ -215,6 +437,42 @@ def test_end_call(db, client):
     assert call_data["status"] == "completed"
     assert call_data["ended_at"] is not None
 
+def test_accept_call_twice_conflicts(db, client):
+    """Test a second accept of the same call is reported as a conflict"""
+    initiator = create_test_user("initiator", "initiator@test.com", db)
+    receiver = create_test_user("receiver", "receiver@test.com", db)
+    
+    from app.utils.call_service import create_call
+    call = create_call(db, initiator.id, receiver.id)
+    
+    receiver_token = create_access_token({"sub": receiver.id})
+    initiator_token = create_access_token({"sub": initiator.id})
+    
+    # Only the receiver may accept
+    response = client.post(
+        f"/calls/accept/{call.id}",
+        headers={"Authorization": f"Bearer {initiator_token}"}
+    )
+    assert response.status_code == 403
+    
+    response = client.post(
+        f"/calls/accept/{call.id}",
+        headers={"Authorization": f"Bearer {receiver_token}"}
+    )
+    assert response.status_code == 200
+    
+    response = client.post(
+        f"/calls/accept/{call.id}",
+        headers={"Authorization": f"Bearer {receiver_token}"}
+    )
+    assert response.status_code == 409
+    
+    response = client.post(
+        "/calls/accept/missing-call",
+        headers={"Authorization": f"Bearer {receiver_token}"}
+    )
+    assert response.status_code == 404
+
 def test_get_active_call(db, client):
     """Test getting active call"""
     # Create test users
@@ -292,6 +550,57 @@ def test_get_call_history(db, client):
     call_ids = [c["id"] for c in history]
     assert call1.id in call_ids or call2.id in call_ids
 
+def test_get_call_history_cursor_pagination(db, client):
+    """Test call history pages are linked by the X-Next-Cursor header"""
+    user = create_test_user("user", "user@test.com", db)
+    other_user = create_test_user("other", "other@test.com", db)
+    
+    from app.utils.call_service import create_call
+    created = [create_call(db, user.id, other_user.id).id for _ in range(3)]
+    token = create_access_token({"sub": user.id})
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    response = client.get("/calls/history?limit=2", headers=headers)
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 2
+    assert first_page[0]["initiator_username"] == "user"
+    assert first_page[0]["receiver_username"] == "other"
+    cursor = response.headers["X-Next-Cursor"]
+    
+    response = client.get(f"/calls/history?limit=2&cursor={cursor}", headers=headers)
+    assert response.status_code == 200
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+    assert {c["id"] for c in first_page + second_page} == set(created)
+    
+    response = client.get("/calls/history?cursor=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+
+def test_get_user_call_stats(db, client):
+    """Test own and other users' call stats endpoints"""
+    user = create_test_user("user", "user@test.com", db)
+    other_user = create_test_user("other", "other@test.com", db)
+    
+    from app.utils.call_service import create_call, accept_call, end_call
+    end_call(db, accept_call(db, create_call(db, user.id, other_user.id).id).id)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.id})}"}
+    
+    response = client.get("/users/me/stats", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["user_id"] == user.id
+    assert stats["total_calls"] == 1
+    assert stats["average_duration_seconds"] == stats["total_seconds"]
+    
+    response = client.get(f"/users/{other_user.id}/stats", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["total_calls"] == 1
+    
+    response = client.get("/users/missing-user/stats", headers=headers)
+    assert response.status_code == 404
+
 def test_unauthorized_access(client):
     """Test that endpoints require authentication"""
     response = client.get("/calls/available")
@@ -6,7 +6,12 @@ from sqlalchemy.orm import sessionmaker, Session
 from app.core.database import Base, get_db
 from app.models.user import User
 from app.core.security import create_access_token
-from app.utils.call_service import create_call, accept_call, reject_call, end_call
+from app.utils.call_service import (
+    create_call, get_call_by_id, accept_call, reject_call, end_call,
+    get_active_call, get_pending_call_for_user, active_call_index, expire_pending_calls,
+    get_user_call_stats, reconcile_user_call_stats,
+    CallNotFoundError, CallPermissionError, CallStateConflictError
+)
 from passlib.context import CryptContext
 import uuid
 
@@ -120,5 +125,288 @@ def test_call_workflow(db):
     assert call.status.value == "completed"
 
 
+def test_second_accept_loses_race(db):
+    """Test only one of two competing accepts succeeds"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    call = create_call(db, user1.id, user2.id)
+    
+    # Each request has its own session; both loaded the call while it was pending
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        assert accept_call(first, call.id).status.value == "ongoing"
+        with pytest.raises(CallStateConflictError) as exc_info:
+            accept_call(second, call.id)
+        assert exc_info.value.current_status.value == "ongoing"
+        
+        with pytest.raises(CallStateConflictError):
+            reject_call(second, call.id)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_transition_errors(db):
+    """Test missing calls and non-participants are reported distinctly"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    outsider = create_test_user("user3", "user3@test.com", db)
+    call = create_call(db, user1.id, user2.id)
+    
+    with pytest.raises(CallNotFoundError):
+        accept_call(db, "missing-call")
+    with pytest.raises(CallPermissionError):
+        accept_call(db, call.id, receiver_id=user1.id)
+    
+    accept_call(db, call.id, receiver_id=user2.id)
+    with pytest.raises(CallPermissionError):
+        end_call(db, call.id, participant_id=outsider.id)
+    
+    ended_call = end_call(db, call.id, participant_id=user1.id)
+    assert ended_call.status.value == "completed"
+
+
+def test_end_call_duration_computed_in_update(db):
+    """Test duration is derived from started_at inside the UPDATE"""
+    from datetime import datetime, timedelta
+    from app.models.user import Call
+    
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    call = create_call(db, user1.id, user2.id)
+    accept_call(db, call.id)
+    db.query(Call).filter(Call.id == call.id).update(
+        {Call.started_at: datetime.utcnow() - timedelta(seconds=90)}
+    )
+    db.commit()
+    
+    ended_call = end_call(db, call.id)
+    assert 90 <= ended_call.duration_seconds <= 92
+
+
+def test_active_call_index_follows_transitions(db):
+    """Test the in-memory index tracks pending/ongoing calls without idle queries"""
+    from sqlalchemy import event
+    
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    user1_id, user2_id = user1.id, user2.id
+    
+    statements = []
+    
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        assert get_active_call(db, user1_id) is None
+        assert get_pending_call_for_user(db, user2_id) is None
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    assert statements == []
+    
+    call = create_call(db, user1_id, user2_id)
+    assert get_pending_call_for_user(db, user2_id).id == call.id
+    assert get_pending_call_for_user(db, user1_id) is None
+    assert get_active_call(db, user1_id) is None
+    
+    accept_call(db, call.id)
+    assert get_pending_call_for_user(db, user2_id) is None
+    assert get_active_call(db, user1_id).id == call.id
+    assert get_active_call(db, user2_id).id == call.id
+    
+    end_call(db, call.id)
+    assert get_active_call(db, user1_id) is None
+    assert get_active_call(db, user2_id) is None
+
+
+def test_active_call_index_rebuild_and_resync(db):
+    """Test the index can be rebuilt from the database and heals stale entries"""
+    from app.models.user import Call
+    
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    call = create_call(db, user1.id, user2.id)
+    accept_call(db, call.id)
+    
+    active_call_index.discard(call.id)
+    assert get_active_call(db, user1.id) is None
+    
+    assert active_call_index.rebuild(db) >= 1
+    assert get_active_call(db, user1.id).id == call.id
+    
+    # Changed behind the service's back: the stale entry is dropped on read
+    db.query(Call).filter(Call.id == call.id).update({Call.status: "completed"})
+    db.commit()
+    assert get_active_call(db, user1.id) is None
+    assert active_call_index.get_ongoing(user1.id) is None
+
+
+def test_pending_call_timeouts_pop_in_deadline_order():
+    """Test ring deadlines come out earliest first and only once due"""
+    from app.utils.call_timeouts import PendingCallTimeouts
+    
+    timeouts = PendingCallTimeouts()
+    timeouts.schedule("late", 60)
+    timeouts.schedule("second", -1)
+    timeouts.schedule("first", -5)
+    
+    assert timeouts.pop_due(1) == ["first"]
+    assert timeouts.pop_due(10) == ["second"]
+    assert timeouts.pop_due(10) == []
+    assert 0 < timeouts.seconds_until_next() <= 60
+
+
+def test_expire_pending_calls_marks_only_unanswered_calls_missed(db):
+    """Test expiry moves still-pending calls to missed and skips answered ones"""
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    user3 = create_test_user("user3", "user3@test.com", db)
+    unanswered = create_call(db, user1.id, user2.id)
+    answered = create_call(db, user3.id, user1.id)
+    accept_call(db, answered.id)
+    
+    missed = expire_pending_calls(db, [unanswered.id, answered.id, "missing-call"])
+    
+    assert [(row.id, row.initiator_id) for row in missed] == [(unanswered.id, user1.id)]
+    db.expire_all()
+    assert get_call_by_id(db, unanswered.id).status.value == "missed"
+    assert get_call_by_id(db, unanswered.id).ended_at is not None
+    assert get_call_by_id(db, answered.id).status.value == "ongoing"
+    assert get_pending_call_for_user(db, user2.id) is None
+    assert expire_pending_calls(db, [unanswered.id]) == []
+    
+    with pytest.raises(CallStateConflictError):
+        accept_call(db, unanswered.id)
+
+
+def test_end_call_updates_call_stats(db):
+    """Test end_call adds the call to both participants' stats rollup"""
+    from datetime import datetime, timedelta
+    from app.models.user import Call
+    
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    user3 = create_test_user("user3", "user3@test.com", db)
+    assert get_user_call_stats(db, user1.id) is None
+    
+    for receiver, seconds in ((user2, 60), (user3, 30)):
+        call = accept_call(db, create_call(db, user1.id, receiver.id).id)
+        db.query(Call).filter(Call.id == call.id).update(
+            {Call.started_at: datetime.utcnow() - timedelta(seconds=seconds)}
+        )
+        db.commit()
+        end_call(db, call.id)
+    reject_call(db, create_call(db, user2.id, user1.id).id)
+    
+    stats = get_user_call_stats(db, user1.id)
+    assert stats.total_calls == 2
+    assert 90 <= stats.total_seconds <= 92
+    assert get_user_call_stats(db, user2.id).total_calls == 1
+    assert get_user_call_stats(db, user3.id).total_calls == 1
+    
+    # A losing end_call does not count the call twice
+    with pytest.raises(CallStateConflictError):
+        end_call(db, call.id)
+    assert get_user_call_stats(db, user3.id).total_calls == 1
+
+
+def test_reconcile_user_call_stats_repairs_drift(db):
+    """Test the reconciler recounts from calls and the archive and fixes drifted rows"""
+    from datetime import datetime, timedelta
+    from app.models.user import UserCallStats
+    from app.utils.call_service import archive_call_history
+    
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    user3 = create_test_user("user3", "user3@test.com", db)
+    for receiver in (user2, user3):
+        end_call(db, accept_call(db, create_call(db, user1.id, receiver.id).id).id)
+    archive_call_history(db, older_than=datetime.utcnow() + timedelta(minutes=1), batch_size=1, max_batches=1)
+    assert reconcile_user_call_stats(db, batch_size=2) == 0
+    
+    db.query(UserCallStats).filter(UserCallStats.user_id == user1.id).update({UserCallStats.total_calls: 7})
+    db.query(UserCallStats).filter(UserCallStats.user_id == user3.id).delete()
+    db.commit()
+    
+    assert reconcile_user_call_stats(db, batch_size=2) == 2
+    db.expire_all()
+    assert get_user_call_stats(db, user1.id).total_calls == 2
+    assert get_user_call_stats(db, user2.id).total_calls == 1
+    assert get_user_call_stats(db, user3.id).total_calls == 1
+    assert reconcile_user_call_stats(db, batch_size=2) == 0
+
+
+
+def test_reconcile_does_not_overwrite_concurrent_stats_row(db, monkeypatch):
+    """Test a stats row created by a call ending during the recount is kept, not overwritten"""
+    from app.models.user import UserCallStats
+    from app.utils import call_service
+
+    user1 = create_test_user("user1", "user1@test.com", db)
+    user2 = create_test_user("user2", "user2@test.com", db)
+    end_call(db, accept_call(db, create_call(db, user1.id, user2.id).id).id)
+    db.query(UserCallStats).filter(UserCallStats.user_id == user2.id).delete()
+    db.commit()
+
+    real_totals = call_service._completed_call_totals
+
+    def totals_while_call_ends(user_ids):
+        # Another call ends between the stats read and the write, creating user2's row
+        db.add(UserCallStats(user_id=user2.id, total_calls=2, total_seconds=0))
+        db.flush()
+        return real_totals(user_ids)
+
+    monkeypatch.setattr(call_service, "_completed_call_totals", totals_while_call_ends)
+    assert reconcile_user_call_stats(db) == 0
+    db.expire_all()
+    assert get_user_call_stats(db, user2.id).total_calls == 2
+
+@pytest.mark.asyncio
+async def test_pending_call_timeouts_runner_expires_due_calls():
+    """Test the runner wakes for a newly scheduled deadline and expires it"""
+    import asyncio
+    from app.utils.call_timeouts import PendingCallTimeouts
+    
+    timeouts = PendingCallTimeouts()
+    expired = asyncio.Queue()
+    
+    async def expire(call_ids):
+        await expired.put(call_ids)
+    
+    runner = asyncio.create_task(timeouts.run(expire))
+    try:
+        await asyncio.sleep(0)
+        timeouts.schedule("call-1", 0.01)
+        assert await asyncio.wait_for(expired.get(), 2) == ["call-1"]
+    finally:
+        runner.cancel()
+
+
+@pytest.mark.asyncio
+async def test_pending_call_timeouts_runner_retries_failed_expiry():
+    """Test a batch whose expiry raises is rescheduled instead of dropped"""
+    import asyncio
+    from app.utils.call_timeouts import PendingCallTimeouts
+    
+    timeouts = PendingCallTimeouts()
+    attempts = asyncio.Queue()
+    failures = [RuntimeError("database unavailable")]
+    
+    async def expire(call_ids):
+        await attempts.put(call_ids)
+        if failures:
+            raise failures.pop()
+    
+    runner = asyncio.create_task(timeouts.run(expire, retry_seconds=0.01))
+    try:
+        await asyncio.sleep(0)
+        timeouts.schedule("call-1", 0)
+        assert await asyncio.wait_for(attempts.get(), 2) == ["call-1"]
+        assert await asyncio.wait_for(attempts.get(), 2) == ["call-1"]
+    finally:
+        runner.cancel()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
@@ -496,7 +496,121 @@ class TestCallHistory:
         
         # Duration should be at least 1 second
         assert call.duration_seconds >= 1
-
+    
+    def test_call_history_rows_keyset_pagination(self, db):
+        """Test projected history pages walk the full history in one query each"""
+        from sqlalchemy import event
+        from app.utils.call_service import get_user_call_history_rows
+        
+        alice = create_test_user("alice", "alice@example.com", db=db)
+        bob = create_test_user("bob", "bob@example.com", db=db)
+        call_ids = []
+        for _ in range(5):
+            call = create_call(db, alice.id, bob.id)
+            call_ids.append(reject_call(db, call.id).id)
+        alice_id = alice.id
+        
+        statements = []
+        
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            pages = []
+            before = None
+            while True:
+                rows = get_user_call_history_rows(db, alice_id, limit=2, before=before)
+                pages.append(rows)
+                if len(rows) < 2:
+                    break
+                before = (rows[-1].sort_key, rows[-1].id)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+        
+        assert [len(page) for page in pages] == [2, 2, 1]
+        # One query per full page; the short last page also checks the archive
+        assert len(statements) == len(pages) + 1
+        
+        seen = [row.id for page in pages for row in page]
+        assert seen == list(reversed(call_ids))
+        assert pages[0][0].initiator_username == "alice"
+        assert pages[0][0].receiver_username == "bob"
+    
+    def test_call_history_archive_moves_only_old_finished_calls(self, db):
+        """Test archiving moves finished calls past the cutoff and keeps them readable"""
+        from datetime import datetime, timedelta
+        from app.models.user import CallArchive
+        from app.utils.call_service import archive_call_history, get_user_call_history_rows
+        
+        alice = create_test_user("alice", "alice@example.com", db=db)
+        bob = create_test_user("bob", "bob@example.com", db=db)
+        now = datetime.utcnow()
+        
+        def finished_call(days_ago):
+            call = create_call(db, alice.id, bob.id)
+            call = end_call(db, accept_call(db, call.id).id)
+            db.query(Call).filter(Call.id == call.id).update(
+                {Call.ended_at: now - timedelta(days=days_ago)}
+            )
+            db.commit()
+            return call.id
+        
+        oldest = finished_call(60)
+        old = finished_call(40)
+        recent = finished_call(1)
+        pending = create_call(db, bob.id, alice.id)
+        db.query(Call).filter(Call.id == pending.id).update({Call.started_at: now - timedelta(days=2)})
+        db.commit()
+        
+        archived = archive_call_history(db, older_than=now - timedelta(days=30), batch_size=10)
+        
+        assert archived == 2
+        assert {row[0] for row in db.query(Call.id).all()} == {recent, pending.id}
+        archive_rows = {row.id: row for row in db.query(CallArchive).all()}
+        assert set(archive_rows) == {oldest, old}
+        assert archive_rows[old].finished_at == archive_rows[old].ended_at
+        assert archive_rows[old].status.value == "completed"
+        
+        # History reads the hot table first and continues into the archive
+        first_page = get_user_call_history_rows(db, alice.id, limit=2)
+        assert [row.id for row in first_page] == [recent, pending.id]
+        rest = get_user_call_history_rows(
+            db, alice.id, limit=3, before=(first_page[-1].sort_key, first_page[-1].id)
+        )
+        assert [row.id for row in rest] == [old, oldest]
+        assert rest[0].initiator_username == "alice"
+        
+        # Nothing left to move on a second pass
+        assert archive_call_history(db, older_than=now - timedelta(days=30), batch_size=10) == 0
+    
+    def test_call_history_archive_is_batched(self, db):
+        """Test archiving moves at most batch_size * max_batches calls per pass"""
+        from datetime import datetime, timedelta
+        from app.models.user import CallArchive
+        from app.utils.call_service import archive_call_history
+        
+        alice = create_test_user("alice", "alice@example.com", db=db)
+        bob = create_test_user("bob", "bob@example.com", db=db)
+        for _ in range(5):
+            call = create_call(db, alice.id, bob.id)
+            reject_call(db, call.id)
+        cutoff = datetime.utcnow() + timedelta(minutes=1)
+        
+        assert archive_call_history(db, older_than=cutoff, batch_size=3, max_batches=1) == 3
+        assert archive_call_history(db, older_than=cutoff, batch_size=3, max_batches=1) == 2
+        assert db.query(Call).count() == 0
+        
+        for _ in range(5):
+            call = create_call(db, alice.id, bob.id)
+            reject_call(db, call.id)
+        assert archive_call_history(db, older_than=cutoff, batch_size=2, max_batches=2) == 4
+        assert archive_call_history(db, older_than=cutoff, batch_size=2, max_batches=2) == 1
+        assert db.query(CallArchive).count() == 10
+        
+        # Pending calls stay hot however long they have been ringing
+        create_call(db, alice.id, bob.id)
+        assert archive_call_history(db, older_than=cutoff, batch_size=2) == 0
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,143 @@
+"""Tests for the email outbox and its delivery worker"""
+import json
+import pytest
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.models.user import EmailOutbox
+from app.utils.email import queue_email, queue_login_otp_email
+from app.utils.email_outbox import (
+    EmailOutboxWorker, EmailTransport, FileTransport, LogTransport, PermanentEmailError, claim_due_emails,
+    create_email_transport
+)
+
+
+class RecordingTransport(EmailTransport):
+    """Fails the first `failures` sends to each recipient, then records deliveries"""
+
+    def __init__(self, failures: int = 0, error: Exception | None = None):
+        self.failures = failures
+        self.error = error or RuntimeError("provider unavailable")
+        self.attempts: dict[str, int] = {}
+        self.sent = []
+
+    async def send(self, message):
+        self.attempts[message.to_email] = self.attempts.get(message.to_email, 0) + 1
+        if self.attempts[message.to_email] <= self.failures:
+            raise self.error
+        self.sent.append(message)
+
+
+def make_due(db):
+    """Skip retry backoff: make every pending message due now"""
+    db.query(EmailOutbox).update({EmailOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_queued_email_is_only_visible_after_commit(db):
+    """Test queueing writes in the caller's transaction"""
+    queue_login_otp_email(db, "alice@kiit.ac.in", "123456", "alice")
+    db.rollback()
+    assert db.query(EmailOutbox).count() == 0
+
+    queue_login_otp_email(db, "alice@kiit.ac.in", "123456", "alice")
+    db.commit()
+    message = db.query(EmailOutbox).one()
+    assert message.status == "pending"
+    assert "123456" in message.text_content and "123456" in message.html_content
+
+
+def test_claim_leases_messages(db):
+    """Test claimed messages are not handed out again until the lease expires"""
+    for i in range(3):
+        queue_email(db, f"user{i}@kiit.ac.in", "Subject", "<p>hi</p>")
+    db.commit()
+
+    claimed = claim_due_emails(db, limit=2, lease_seconds=60)
+    assert len(claimed) == 2
+    assert all(message.attempts == 1 for message in claimed)
+    assert len(claim_due_emails(db, limit=10, lease_seconds=60)) == 1
+    assert claim_due_emails(db, limit=10, lease_seconds=60) == []
+
+
+@pytest.mark.asyncio
+async def test_worker_delivers_batch(db, session_factory, tmp_path):
+    """Test the worker delivers every due message through the transport and marks it sent"""
+    for i in range(3):
+        queue_email(db, f"user{i}@kiit.ac.in", f"Subject {i}", "<p>hi</p>", "hi")
+    db.commit()
+    transport = FileTransport(str(tmp_path / "outbox.jsonl"))
+
+    assert await EmailOutboxWorker().deliver_batch(transport, session_factory) == 3
+
+    lines = [json.loads(line) for line in (tmp_path / "outbox.jsonl").read_text().splitlines()]
+    assert sorted(line["to"] for line in lines) == ["user0@kiit.ac.in", "user1@kiit.ac.in", "user2@kiit.ac.in"]
+    db.expire_all()
+    assert {message.status for message in db.query(EmailOutbox)} == {"sent"}
+    assert await EmailOutboxWorker().deliver_batch(transport, session_factory) == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_with_backoff_then_gives_up(db, session_factory, monkeypatch):
+    """Test transient failures are retried later and permanently failing messages stop"""
+    monkeypatch.setattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 3)
+    queue_email(db, "flaky@kiit.ac.in", "Subject", "<p>hi</p>")
+    db.commit()
+    worker = EmailOutboxWorker()
+    transport = RecordingTransport(failures=1)
+
+    await worker.deliver_batch(transport, session_factory)
+    db.expire_all()
+    message = db.query(EmailOutbox).one()
+    assert message.status == "pending"
+    assert message.next_attempt_at > datetime.utcnow()
+    assert "provider unavailable" in message.last_error
+    # Not due again until the backoff has passed
+    assert await worker.deliver_batch(transport, session_factory) == 0
+
+    make_due(db)
+    await worker.deliver_batch(transport, session_factory)
+    db.expire_all()
+    assert db.query(EmailOutbox).one().status == "sent"
+    assert len(transport.sent) == 1
+
+    queue_email(db, "down@kiit.ac.in", "Subject", "<p>hi</p>")
+    db.commit()
+    always_down = RecordingTransport(failures=10)
+    for _ in range(3):
+        make_due(db)
+        await worker.deliver_batch(always_down, session_factory)
+    db.expire_all()
+    failed = db.query(EmailOutbox).filter(EmailOutbox.to_email == "down@kiit.ac.in").one()
+    assert failed.status == "failed"
+    assert failed.attempts == 3
+
+    queue_email(db, "rejected@kiit.ac.in", "Subject", "<p>hi</p>")
+    db.commit()
+    await worker.deliver_batch(RecordingTransport(failures=1, error=PermanentEmailError("bad address")),
+                               session_factory)
+    db.expire_all()
+    assert db.query(EmailOutbox).filter(EmailOutbox.to_email == "rejected@kiit.ac.in").one().status == "failed"
+
+
+def test_log_transport_is_refused_in_production(monkeypatch):
+    """Test production never falls back to logging emails (they carry tokens and OTPs)"""
+    monkeypatch.setattr(settings, "SENDGRID_API_KEY", "")
+    monkeypatch.setattr(settings, "EMAIL_TRANSPORT", "")
+    monkeypatch.setattr(settings, "ENVIRONMENT", "development")
+    assert isinstance(create_email_transport(), LogTransport)
+
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    with pytest.raises(ValueError):
+        create_email_transport()
+    monkeypatch.setattr(settings, "EMAIL_TRANSPORT", "log")
+    with pytest.raises(ValueError):
+        create_email_transport()
+
+
+def test_transport_without_send_cannot_be_created():
+    """Test an incomplete transport fails when built, not on first delivery"""
+    class Incomplete(EmailTransport):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
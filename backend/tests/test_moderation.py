@@ -0,0 +1,143 @@
+"""Tests for report counters, suppression and the review queue"""
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.models.user import ReportCountBucket, UserReportStats
+from app.utils.available_users import AvailableUsersSnapshot
+from app.utils.matching_service import MatchmakingQueue
+from app.utils.moderation import (
+    suppressed_users, count_report, resolve_report, unsuppress_user, get_open_reports
+)
+from app.utils.user_service import get_available_users, report_user
+
+
+def test_distinct_reporters_suppress_at_threshold(db, create_test_user):
+    """Test the fifth reporter within 24 hours suppresses the reported user"""
+    target = create_test_user("target", db)
+    reporters = [create_test_user(f"reporter{i}", db) for i in range(5)]
+
+    for reporter in reporters[:4]:
+        report_user(db, reporter, target, "spam", None)
+    assert target not in suppressed_users
+
+    report_user(db, reporters[4], target, "spam", None)
+    assert target in suppressed_users
+    stats = db.get(UserReportStats, target)
+    assert (stats.total_reports, stats.open_reports) == (5, 5)
+    assert stats.suppressed_at is not None
+
+
+def test_repeat_reporter_counts_once_in_windows(db, create_test_user):
+    """Test one reporter's repeated open reports count towards open_reports but not the windows"""
+    target = create_test_user("target", db)
+    reporter = create_test_user("reporter", db)
+
+    for _ in range(6):
+        report_user(db, reporter, target, "spam", None)
+
+    assert target not in suppressed_users
+    assert db.get(UserReportStats, target).open_reports == 6
+    assert db.query(ReportCountBucket).one().reports == 1
+
+
+def test_window_slides_past_old_reports(db, create_test_user):
+    """Test reports older than a window no longer count towards it"""
+    target = create_test_user("target", db)
+    now = datetime.utcnow()
+    for i in range(4):
+        assert not count_report(db, f"old{i}", target, now=now - timedelta(hours=30))
+    assert not count_report(db, "new", target, now=now)
+    for i in range(3):
+        assert not count_report(db, f"recent{i}", target, now=now - timedelta(hours=2 + i))
+    # 9 reports within 168 hours (threshold 10), but the fifth within 24 hours suppresses
+    assert count_report(db, "last", target, now=now)
+    # Already suppressed: not newly suppressed again
+    assert not count_report(db, "another", target, now=now)
+
+
+def test_suppressed_users_are_not_offered(db, create_test_user):
+    """Test suppressed users are skipped by both availability paths and matchmaking"""
+    viewer = create_test_user("viewer", db)
+    target = create_test_user("target", db)
+    other = create_test_user("other", db)
+    suppressed_users.load(db)
+    suppressed_users.add(target)
+
+    assert {row.id for row in get_available_users(db, viewer, limit=10)} == {other}
+    snapshot = AvailableUsersSnapshot(max_age_seconds=60)
+    snapshot.refresh(db)
+    assert {user.id for user in snapshot.page(viewer, frozenset(), 10, 0.0)} == {other}
+
+    queue = MatchmakingQueue()
+    queue.add_user(target, {})
+    assert queue.find_match(viewer) is None
+
+
+def test_available_users_filters_suppressed_users_in_sql(db, create_test_user):
+    """Test suppressed users are left out by the query instead of inflating its LIMIT"""
+    viewer = create_test_user("viewer", db)
+    others = {create_test_user(f"user{i}", db) for i in range(3)}
+    suppressed_users.load(db)
+    for i in range(20):
+        suppressed_users.add(create_test_user(f"suppressed{i}", db))
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(parameters)
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        available = {row.id for row in get_available_users(db, viewer, limit=2, start=0.0)}
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+
+    assert len(available) == 2 and available <= others
+    # A single segment: LIMIT 2 (no blocks to over-fetch for), OFFSET 0
+    assert [parameters[-2:] for parameters in statements] == [(2, 0)]
+
+
+def test_suppressed_set_reloads_from_database(db, create_test_user):
+    """Test suppressions made elsewhere are picked up once the set is stale"""
+    target = create_test_user("target", db)
+    db.add(UserReportStats(user_id=target, suppressed_at=datetime.utcnow()))
+    db.commit()
+
+    suppressed_users.refresh_if_stale(db)
+    assert target in suppressed_users
+
+
+def test_unsuppress_resets_windows(db, create_test_user):
+    """Test lifting a suppression clears the windows so the next report does not re-suppress"""
+    target = create_test_user("target", db)
+    reporters = [create_test_user(f"reporter{i}", db) for i in range(6)]
+    for reporter in reporters[:5]:
+        report_user(db, reporter, target, "spam", None)
+    assert target in suppressed_users
+
+    assert unsuppress_user(db, target)
+    assert target not in suppressed_users
+    assert db.query(ReportCountBucket).count() == 0
+    assert not unsuppress_user(db, target)
+
+    report_user(db, reporters[5], target, "spam", None)
+    assert target not in suppressed_users
+
+
+def test_review_queue_pages_and_resolves(db, create_test_user):
+    """Test the queue pages oldest first by keyset and resolved reports leave it"""
+    target = create_test_user("target", db)
+    reporters = [create_test_user(f"reporter{i}", db) for i in range(3)]
+    reports = [report_user(db, reporter, target, "spam", f"report {i}") for i, reporter in enumerate(reporters)]
+
+    first = get_open_reports(db, limit=2)
+    assert [row.id for row in first] == [report.id for report in reports[:2]]
+    assert first[0].reported_username == "target"
+    assert first[0].reported_open_reports == 3
+    second = get_open_reports(db, limit=2, after=(first[-1].created_at, first[-1].id))
+    assert [row.id for row in second] == [reports[2].id]
+
+    assert resolve_report(db, reports[0].id)
+    assert not resolve_report(db, reports[0].id)
+    remaining = get_open_reports(db, limit=10)
+    assert [row.id for row in remaining] == [report.id for report in reports[1:]]
+    assert remaining[0].reported_open_reports == 2
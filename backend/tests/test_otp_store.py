@@ -0,0 +1,97 @@
+"""Tests for the login OTP stores"""
+import time
+import pytest
+from datetime import datetime, timedelta
+from app.models.user import LoginOTP
+from app.utils.otp_store import MemoryOTPStore, OTPStore, SQLOTPStore
+
+
+STORES = {
+    "memory": lambda: MemoryOTPStore(ttl_seconds=60, max_attempts=3),
+    "sql": lambda: SQLOTPStore(ttl_seconds=60, max_attempts=3),
+}
+
+
+@pytest.fixture
+def db(db, create_test_user):
+    """The shared database with one user, user-1"""
+    create_test_user("alice", db, id="user-1", email="alice@kiit.ac.in", full_name="Alice")
+    return db
+
+
+@pytest.mark.parametrize("name", sorted(STORES))
+def test_code_is_single_use_and_replaced_on_reissue(db, name):
+    """Test a code verifies once and a new code invalidates the previous one"""
+    store = STORES[name]()
+    store.issue(db, "user-1", "111111")
+    store.issue(db, "user-1", "222222")
+
+    assert not store.verify(db, "user-1", "111111")
+    assert store.verify(db, "user-1", "222222")
+    assert not store.verify(db, "user-1", "222222")
+    assert not store.verify(db, "other-user", "222222")
+
+
+@pytest.mark.parametrize("name", sorted(STORES))
+def test_code_is_dropped_after_max_attempts(db, name):
+    """Test wrong guesses are counted and the code is discarded at the limit"""
+    store = STORES[name]()
+    store.issue(db, "user-1", "123456")
+
+    assert not store.verify(db, "user-1", "000000")
+    assert not store.verify(db, "user-1", "000001")
+    assert store.verify(db, "user-1", "123456")
+
+    store.issue(db, "user-1", "123456")
+    for guess in ("000000", "000001", "000002"):
+        assert not store.verify(db, "user-1", guess)
+    assert not store.verify(db, "user-1", "123456")
+
+
+@pytest.mark.parametrize("name", sorted(STORES))
+def test_expired_codes_are_rejected_and_purged(db, name):
+    """Test expired codes fail verification and purge removes them"""
+    store = STORES[name]()
+    store.ttl_seconds = 0.05
+    store.issue(db, "user-1", "123456")
+    time.sleep(0.1)
+
+    assert store.purge(db) == 1
+    assert not store.verify(db, "user-1", "123456")
+    assert store.purge(db) == 0
+
+
+def test_sql_store_keeps_one_hashed_row_per_user(db):
+    """Test the SQL store never stores the code itself and does not accumulate rows"""
+    store = SQLOTPStore(ttl_seconds=60, max_attempts=3)
+    for code in ("111111", "222222", "333333"):
+        store.issue(db, "user-1", code)
+
+    rows = db.query(LoginOTP).all()
+    assert len(rows) == 1
+    assert rows[0].code != "333333"
+    assert rows[0].expires_at > datetime.utcnow() + timedelta(seconds=50)
+
+
+def test_sql_store_writes_in_callers_transaction(db):
+    """Test issuing is rolled back with the caller's transaction (e.g. if queueing the email fails)"""
+    store = SQLOTPStore(ttl_seconds=60, max_attempts=3)
+    store.issue(db, "user-1", "123456")
+    db.rollback()
+    assert db.query(LoginOTP).count() == 0
+
+    store.issue(db, "user-1", "123456")
+    db.commit()
+    assert not store.verify(db, "user-1", "000000")
+    db.commit()
+    assert db.query(LoginOTP).one().attempts == 1
+
+
+def test_incomplete_store_cannot_be_created():
+    """Test a store missing a method fails when built, not on first login"""
+    class Incomplete(OTPStore):
+        def issue(self, db, user_id, code):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(ttl_seconds=60, max_attempts=3)
@@ -0,0 +1,126 @@
+"""Tests for bulk student provisioning from a roster"""
+import io
+import pytest
+from app import cli
+from app.core.security import verify_password
+from app.models.user import User, UserRole, VerificationToken, EmailOutbox
+from app.utils import provisioning
+from app.utils.provisioning import provision_users
+
+
+HEADER = "email,username,full_name,password\n"
+
+
+@pytest.fixture
+def fast_hash(monkeypatch):
+    """Skip bcrypt where only the bulk insert path is under test"""
+    monkeypatch.setattr(provisioning, "get_password_hash", lambda password: f"hashed:{password}")
+
+
+def roster(*rows: str) -> io.StringIO:
+    return io.StringIO(HEADER + "".join(f"{row}\n" for row in rows))
+
+
+def test_provision_creates_users_tokens_and_emails(db):
+    """Test each row becomes an unverified student with a hashed password, a token and a queued email"""
+    result = provision_users(db, roster(
+        "ann@kiit.ac.in,ann,Ann Lee,secret-a",
+        "bob@kiit.ac.in,bob,Bob Roy,secret-b",
+        "cat@kiit.ac.in,cat,Cat Das,secret-c",
+    ), batch_size=2, workers=2)
+
+    assert (result.created, result.skipped, result.errors) == (3, 0, [])
+    assert result.rows_per_second > 0
+    users = {user.username: user for user in db.query(User).all()}
+    assert set(users) == {"ann", "bob", "cat"}
+    assert verify_password("secret-b", users["bob"].hashed_password)
+    assert users["ann"].role == UserRole.STUDENT and users["ann"].is_verified is False
+    tokens = db.query(VerificationToken).all()
+    assert {token.user_id for token in tokens} == {user.id for user in users.values()}
+    emails = db.query(EmailOutbox).all()
+    assert sorted(email.to_email for email in emails) == ["ann@kiit.ac.in", "bob@kiit.ac.in", "cat@kiit.ac.in"]
+    token_by_user = {token.user_id: token.token for token in tokens}
+    ann_email = next(email for email in emails if email.to_email == "ann@kiit.ac.in")
+    assert token_by_user[users["ann"].id] in ann_email.text_content
+    assert ann_email.status == "pending"
+
+
+def test_provision_skips_invalid_duplicate_and_taken_rows(db, create_test_user, fast_hash):
+    """Test bad rows are skipped with their line numbers and the rest are created"""
+    create_test_user("taken", db, email="taken@kiit.ac.in")
+    result = provision_users(db, roster(
+        "ok1@kiit.ac.in,ok1,Ok One,pw",
+        "someone@gmail.com,gmail,Gmail User,pw",
+        "not-an-email,bad,Bad Email,pw",
+        "ok1@kiit.ac.in,ok1again,Ok Again,pw",
+        "taken@kiit.ac.in,fresh,Taken Email,pw",
+        "other@kiit.ac.in,taken,Taken Name,pw",
+        "nopass@kiit.ac.in,nopass,No Password,",
+        "ok2@kiit.ac.in,ok2,Ok Two,pw",
+    ), batch_size=3)
+
+    assert (result.created, result.skipped) == (2, 6)
+    assert result.errors == [
+        "line 3: only @kiit.ac.in email addresses are allowed",
+        "line 4: invalid email",
+        "line 5: duplicate of an earlier roster row",
+        "line 6: email already registered",
+        "line 7: username already taken",
+        "line 8: username, full_name and password are required",
+    ]
+    assert {user.username for user in db.query(User).all()} == {"taken", "ok1", "ok2"}
+    assert db.query(User).filter(User.username == "ok2").one().hashed_password == "hashed:pw"
+
+
+def test_provision_retries_batch_after_concurrent_registration(db, create_test_user, fast_hash, monkeypatch):
+    """Test a row registered after the batch was checked is skipped and the rest still commit"""
+    checks = []
+    real_drop_taken = provisioning._drop_taken
+
+    def drop_taken(db, batch, skips):
+        checks.append(len(batch))
+        kept = real_drop_taken(db, batch, skips)
+        if len(checks) == 1:
+            # Someone registers "race" between the check and the insert
+            create_test_user("race", db, email="race@kiit.ac.in")
+        return kept
+
+    monkeypatch.setattr(provisioning, "_drop_taken", drop_taken)
+    result = provision_users(db, roster("race@kiit.ac.in,race,Race,pw", "calm@kiit.ac.in,calm,Calm,pw"))
+
+    assert (result.created, result.skipped) == (1, 1)
+    assert result.errors == ["line 2: email already registered"]
+    assert db.query(VerificationToken).count() == db.query(EmailOutbox).count() == 1
+
+
+def test_provision_rejects_roster_without_columns(db):
+    """Test a roster missing a required column is refused before anything is created"""
+    with pytest.raises(ValueError, match="password"):
+        provision_users(db, io.StringIO("email,username,full_name\nx@kiit.ac.in,x,X\n"))
+    assert db.query(User).count() == 0
+
+
+def test_cli_provision_reports_throughput(db, session_factory, fast_hash, tmp_path, monkeypatch, capsys):
+    """Test the provision command reads a roster file and prints rows per second"""
+    monkeypatch.setattr(cli, "SessionLocal", session_factory)
+    path = tmp_path / "roster.csv"
+    path.write_text(HEADER + "".join(f"s{i}@kiit.ac.in,s{i},Student {i},pw{i}\n" for i in range(25)))
+
+    assert cli.main(["provision", str(path), "--batch-size", "10"]) == 0
+
+    assert db.query(User).count() == 25
+    out = capsys.readouterr().out
+    assert out.startswith("created 25, skipped 0 in ")
+    assert "rows/s" in out
+
+
+def test_copy_rows_escape_text_format():
+    """Test values are written in COPY text format: \\N for NULL, escaped separators, enum names"""
+    from datetime import datetime
+    from app.utils.bulk import _copy_text
+
+    assert _copy_text(None) == "\\N"
+    assert _copy_text(True) == "t"
+    assert _copy_text(UserRole.STUDENT) == "STUDENT"
+    assert _copy_text(datetime(2026, 1, 2, 3, 4, 5)) == "2026-01-02T03:04:05"
+    assert _copy_text("a\tb\nc\\N") == "a\\tb\\nc\\\\N"
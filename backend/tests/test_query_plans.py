@@ -0,0 +1,199 @@
+"""Query plan checks: hot call and block queries must be served by indexes"""
+import pytest
+from sqlalchemy import event
+from app.utils.call_service import (
+    create_call, accept_call, active_call_index, schedule_pending_call_timeouts,
+    get_user_call_history, get_user_call_history_rows, archive_call_history
+)
+from app.utils.user_service import block_user, unblock_user, is_user_blocked, get_available_users, report_user
+from app.utils.moderation import get_open_reports
+from app.utils.retention import default_retention_policies, run_retention
+from app.utils.block_graph import block_graph
+from datetime import datetime, timedelta
+
+
+# Tables whose lookups must never fall back to a full scan
+INDEXED_TABLES = (
+    "calls", "calls_archive", "blocked_users",
+    "verification_tokens", "login_otps", "refresh_tokens", "reports", "email_outbox",
+    "user_report_stats", "report_count_buckets",
+)
+
+
+@pytest.fixture
+def db(db, create_test_user):
+    """The shared database with a few users, calls and blocks"""
+    alice, bob, carol = (create_test_user(name, db) for name in ("alice", "bob", "carol"))
+    accept_call(db, create_call(db, alice, bob).id)
+    create_call(db, carol, alice)
+    block_user(db, alice, carol)
+    db.info["users"] = (alice, bob, carol)
+    return db
+
+
+def capture_plans(db, fn):
+    """Run fn, then EXPLAIN QUERY PLAN every SELECT it issued with the same parameters"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+
+    connection = db.connection()
+    return [
+        [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        for statement, parameters in statements
+    ]
+
+
+def table_scans(plans):
+    """Plan steps that read one of INDEXED_TABLES without an index"""
+    return [
+        detail
+        for plan in plans
+        for detail in plan
+        if detail.startswith("SCAN")
+        and detail.split()[1] in INDEXED_TABLES
+        and "USING" not in detail
+    ]
+
+
+QUERIES = {
+    # Active/pending call lookups are served by active_call_index; these load it
+    "active_call_index_rebuild": lambda db, a, b, c: active_call_index.rebuild(db),
+    "pending_call_timeouts": lambda db, a, b, c: schedule_pending_call_timeouts(db),
+    "call_history": lambda db, a, b, c: get_user_call_history(db, a, limit=10),
+    "call_history_rows": lambda db, a, b, c: get_user_call_history_rows(db, a, limit=10),
+    "archive_call_history": lambda db, a, b, c: archive_call_history(
+        db, older_than=datetime.utcnow() - timedelta(days=30)
+    ),
+    "retention": lambda db, a, b, c: run_retention(db, default_retention_policies()),
+    "is_user_blocked": lambda db, a, b, c: is_user_blocked(db, c, a),
+    "available_users": lambda db, a, b, c: get_available_users(db, a, limit=10),
+    "unblock_user": lambda db, a, b, c: unblock_user(db, b, a),
+    "report_user": lambda db, a, b, c: report_user(db, a, b, "spam", None),
+    "open_reports": lambda db, a, b, c: get_open_reports(db, limit=10, after=(datetime.utcnow(), "")),
+}
+
+
+@pytest.mark.parametrize("name", sorted(QUERIES))
+def test_service_query_uses_index(db, name):
+    """Test each hot service query reads calls/blocked_users through an index"""
+    alice, bob, carol = db.info["users"]
+    plans = capture_plans(db, lambda: QUERIES[name](db, alice, bob, carol))
+
+    assert plans, f"{name} issued no SELECT"
+    assert table_scans(plans) == []
+    assert any("USING" in detail and "INDEX" in detail for plan in plans for detail in plan)
+
+
+def test_history_query_uses_recent_indexes(db):
+    """Test history lookups use the (participant, sort key, id) indexes on both tables"""
+    alice, _, _ = db.info["users"]
+    plans = capture_plans(db, lambda: get_user_call_history_rows(db, alice, limit=10))
+    details = " ".join(detail for plan in plans for detail in plan)
+
+    assert "ix_calls_initiator_recent" in details
+    assert "ix_calls_receiver_recent" in details
+    assert "ix_calls_archive_initiator_recent" in details
+    assert "ix_calls_archive_receiver_recent" in details
+
+
+def test_active_call_index_rebuild_uses_partial_indexes(db):
+    """Test rebuilding the active call index reads the pending and ongoing partial indexes"""
+    plans = capture_plans(db, lambda: active_call_index.rebuild(db))
+    details = " ".join(detail for plan in plans for detail in plan)
+
+    assert "ix_calls_receiver_pending" in details
+    assert "ix_calls_receiver_ongoing" in details or "ix_calls_initiator_ongoing" in details
+
+
+def test_block_pairs_are_unique(db):
+    """Test blocking the same user twice keeps a single block row"""
+    from app.models.user import BlockedUser
+    alice, _, carol = db.info["users"]
+
+    block_user(db, alice, carol)
+
+    assert db.query(BlockedUser).filter(
+        BlockedUser.blocker_id == alice,
+        BlockedUser.blocked_id == carol
+    ).count() == 1
+
+
+def test_block_checks_are_served_from_graph(db):
+    """Test block checks and availability reuse a loaded entry instead of querying blocked_users"""
+    alice, bob, carol = db.info["users"]
+    block_graph.clear()
+    assert is_user_blocked(db, carol, alice)
+
+    plans = capture_plans(db, lambda: (
+        is_user_blocked(db, carol, alice),
+        is_user_blocked(db, bob, alice),
+        get_available_users(db, alice, limit=10),
+    ))
+
+    assert not any("blocked_users" in detail for plan in plans for detail in plan)
+
+
+def test_block_and_unblock_update_loaded_entries(db):
+    """Test block_user/unblock_user keep both users' loaded entries current"""
+    alice, bob, carol = db.info["users"]
+    block_graph.clear()
+    assert not is_user_blocked(db, alice, bob)
+    assert not is_user_blocked(db, bob, alice)
+
+    block_user(db, bob, alice)
+    assert is_user_blocked(db, alice, bob)
+    assert bob in block_graph.excluded_for(db, alice)
+
+    unblock_user(db, bob, alice)
+    assert not is_user_blocked(db, alice, bob)
+    assert bob not in block_graph.excluded_for(db, alice)
+
+
+def test_available_users_excludes_blocks_in_both_directions(db, create_test_user):
+    """Test blocked users and blockers are excluded even when they fill the first page"""
+    alice, bob, carol = db.info["users"]
+    others = [create_test_user(f"user{i}", db) for i in range(4)]
+    for other in others[:2]:
+        block_user(db, alice, other)
+    for other in others[2:]:
+        block_user(db, other, alice)
+
+    available = {user.id for user in get_available_users(db, alice, limit=2)}
+
+    assert available == {bob}
+    assert len(get_available_users(db, bob, limit=10)) == 6
+
+
+def test_available_users_uses_random_key_index(db):
+    """Test the available-users page walks the partial random_key index"""
+    alice, _, _ = db.info["users"]
+    plans = capture_plans(db, lambda: get_available_users(db, alice, limit=10, start=0.5))
+    details = " ".join(detail for plan in plans for detail in plan)
+
+    assert "ix_users_available_random_key" in details
+
+
+def test_available_users_pages_cover_everyone_once(db, create_test_user):
+    """Test paging from a random start wraps around and returns each available user once"""
+    alice, bob, carol = db.info["users"]
+    others = {create_test_user(f"user{i}", db) for i in range(9)}
+
+    start, after, seen = 0.5, None, []
+    while True:
+        page = get_available_users(db, alice, limit=4, start=start, after=after)
+        seen.extend(row.id for row in page)
+        if len(page) < 4:
+            break
+        after = page[-1].random_key
+
+    # carol is blocked by alice
+    assert sorted(seen) == sorted(others | {bob})
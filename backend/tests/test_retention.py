@@ -0,0 +1,70 @@
+"""Tests for the retention job"""
+from datetime import datetime, timedelta
+from app.models.user import VerificationToken, LoginOTP, RefreshToken, Report, EmailOutbox
+from app.utils.retention import RetentionPolicy, default_retention_policies, run_retention
+
+
+def test_default_policies_keep_live_rows(db, create_test_user):
+    """Test each policy deletes only rows past its retention window"""
+    alice, bob = create_test_user("alice", db), create_test_user("bob", db)
+    now = datetime.utcnow()
+    db.add_all([
+        # verification_tokens: expired long ago, expired recently, used a while ago, live
+        VerificationToken(user_id=alice, token="old-expired", expires_at=now - timedelta(days=8)),
+        VerificationToken(user_id=alice, token="recent-expired", expires_at=now - timedelta(days=1)),
+        VerificationToken(user_id=alice, token="used", is_used=True,
+                          created_at=now - timedelta(days=2), expires_at=now + timedelta(days=1)),
+        VerificationToken(user_id=alice, token="live", expires_at=now + timedelta(days=1)),
+        LoginOTP(user_id=alice, code="expired", expires_at=now - timedelta(minutes=1)),
+        LoginOTP(user_id=bob, code="live", expires_at=now + timedelta(minutes=5)),
+        RefreshToken(user_id=alice, session_id="s1", token_hash="expired", expires_at=now - timedelta(days=2)),
+        RefreshToken(user_id=alice, session_id="s2", token_hash="live", expires_at=now + timedelta(days=1)),
+        Report(reporter_id=alice, reported_id=bob, reason="spam", is_resolved=True,
+               created_at=now - timedelta(days=91)),
+        Report(reporter_id=alice, reported_id=bob, reason="spam", is_resolved=False,
+               created_at=now - timedelta(days=91)),
+        Report(reporter_id=bob, reported_id=alice, reason="spam", is_resolved=True,
+               created_at=now - timedelta(days=1)),
+        EmailOutbox(to_email="old@test.com", subject="s", html_content="h", status="sent",
+                    sent_at=now - timedelta(days=8)),
+        EmailOutbox(to_email="new@test.com", subject="s", html_content="h", status="sent",
+                    sent_at=now - timedelta(days=1)),
+        EmailOutbox(to_email="pending@test.com", subject="s", html_content="h", status="pending",
+                    created_at=now - timedelta(days=60)),
+        EmailOutbox(to_email="failed@test.com", subject="s", html_content="h", status="failed",
+                    created_at=now - timedelta(days=31)),
+    ])
+    db.commit()
+
+    reclaimed = run_retention(db, default_retention_policies())
+
+    assert reclaimed == {
+        "verification_tokens_expired": 1,
+        "verification_tokens_used": 1,
+        "login_otps_expired": 1,
+        "refresh_tokens_expired": 1,
+        "reports_resolved": 1,
+        "email_outbox_sent": 1,
+        "email_outbox_failed": 1,
+    }
+    assert sorted(t.token for t in db.query(VerificationToken)) == ["live", "recent-expired"]
+    assert [otp.code for otp in db.query(LoginOTP)] == ["live"]
+    assert [token.token_hash for token in db.query(RefreshToken)] == ["live"]
+    assert db.query(Report).count() == 2
+    assert sorted(m.to_email for m in db.query(EmailOutbox)) == ["new@test.com", "pending@test.com"]
+    assert set(run_retention(db, default_retention_policies()).values()) == {0}
+
+
+def test_retention_is_bounded_per_run(db, create_test_user):
+    """Test a run deletes at most batch_size * max_batches rows, oldest first"""
+    alice = create_test_user("alice", db)
+    now = datetime.utcnow()
+    for days in range(1, 8):
+        db.add(LoginOTP(user_id=alice, code=str(days), expires_at=now - timedelta(days=days)))
+    db.commit()
+    policy = RetentionPolicy("otps", LoginOTP, LoginOTP.expires_at, timedelta(0))
+
+    assert run_retention(db, [policy], batch_size=2, max_batches=2) == {"otps": 4}
+    assert sorted(otp.code for otp in db.query(LoginOTP)) == ["1", "2", "3"]
+    assert run_retention(db, [policy], batch_size=2, max_batches=2) == {"otps": 3}
+    assert db.query(LoginOTP).count() == 0
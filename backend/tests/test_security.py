@@ -0,0 +1,281 @@
+"""Tests for the authenticated-user cache, sessions and revocation"""
+import os
+import tempfile
+import time
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core.database import Base
+from app.core.cache import TTLCache
+from app.core.security import (
+    create_access_token, decode_token, get_current_user, get_current_user_id,
+    user_cache, token_claims_cache, revoked_sessions
+)
+from app.core.revocation import RevocationFilter
+from app.models.user import User
+from app.schemas.user import UserUpdate
+from app.utils.user_service import update_user, deactivate_user, block_user
+from app.utils.token_service import start_session, rotate_refresh_token, revoke_session
+import uuid
+
+# File-backed SQLite: fixtures write through the sync engine, the auth dependencies
+# read through the async one
+DB_PATH = os.path.join(tempfile.mkdtemp(), "test_security.db")
+engine = create_engine(
+    f"sqlite:///{DB_PATH}",
+    connect_args={"check_same_thread": False}
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def create_test_user(username: str, db):
+    """Helper to create a test user (password hashing is irrelevant here)"""
+    user = User(
+        id=str(uuid.uuid4()),
+        username=username,
+        email=f"{username}@test.com",
+        full_name=f"Test {username}",
+        hashed_password="not-a-real-hash",
+        is_verified=True,
+        is_active=True,
+    )
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Create a fresh database and empty auth caches for each test"""
+    Base.metadata.create_all(bind=engine)
+    user_cache.clear()
+    token_claims_cache.clear()
+    revoked_sessions.clear()
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest_asyncio.fixture
+async def async_db(db):
+    """Async session on the same database, as get_async_db provides"""
+    async with AsyncTestingSessionLocal() as session:
+        yield session
+
+
+def bearer(user_id: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": user_id}))
+
+
+async def authenticate(credentials: HTTPAuthorizationCredentials, async_db):
+    """Resolve the full-user dependency chain the way FastAPI does"""
+    return await get_current_user(await get_current_user_id(credentials, async_db), async_db)
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    """Test entries expire after their TTL and the LRU entry is evicted at capacity"""
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.set("short", 4, ttl_seconds=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    cache.set("expired", 5, ttl_seconds=-1)
+    assert cache.get("expired") is None
+
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 3
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_is_served_from_cache(db, async_db):
+    """Test repeat authentication issues no queries until the user changes"""
+    user_id = create_test_user("alice", db)
+    credentials = bearer(user_id)
+
+    assert (await authenticate(credentials, async_db)).username == "alice"
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        cached = await authenticate(credentials, async_db)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    assert cached.username == "alice"
+    assert statements == []
+
+    update_user(db, cached, UserUpdate(full_name="Alice Updated"))
+    assert (await authenticate(credentials, async_db)).full_name == "Alice Updated"
+
+
+@pytest.mark.asyncio
+async def test_deactivation_and_blocks_invalidate_cached_user(db, async_db):
+    """Test deactivated users are rejected at once and blocks drop both snapshots"""
+    alice = create_test_user("alice", db)
+    bob = create_test_user("bob", db)
+    await authenticate(bearer(alice), async_db)
+    await authenticate(bearer(bob), async_db)
+
+    block_user(db, alice, bob)
+    assert user_cache.get(alice) is None
+    assert user_cache.get(bob) is None
+
+    await authenticate(bearer(bob), async_db)
+    assert deactivate_user(db, bob)
+    with pytest.raises(HTTPException) as exc_info:
+        await authenticate(bearer(bob), async_db)
+    assert exc_info.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_claims_only_tier_needs_no_user_row(db, async_db):
+    """Test get_current_user_id trusts the verified token and rejects bad ones"""
+    credentials = bearer("no-such-user")
+    assert await get_current_user_id(credentials) == "no-such-user"
+
+    with pytest.raises(HTTPException) as exc_info:
+        await authenticate(credentials, async_db)
+    assert exc_info.value.status_code == 401
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user_id(HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-jwt"))
+    assert exc_info.value.status_code == 401
+
+
+def test_revocation_filter_remembers_ids_for_its_window():
+    """Test added ids are found for at least one window and forgotten after two"""
+    revoked = RevocationFilter(num_bits=1 << 16, num_hashes=4, window_seconds=0.05)
+    revoked.add("session-1")
+
+    assert revoked.might_contain("session-1")
+    assert not any(revoked.might_contain(f"other-{i}") for i in range(100))
+    time.sleep(0.06)
+    assert revoked.might_contain("session-1")
+    time.sleep(0.11)
+    assert not revoked.might_contain("session-1")
+
+
+@pytest.mark.asyncio
+async def test_refresh_tokens_rotate_and_reuse_revokes_session(db, async_db):
+    """Test a refresh token works once, and replaying it revokes the whole session"""
+    alice = create_test_user("alice", db)
+    first = start_session(db, alice)
+    assert first["expires_in"] > 0
+
+    user_id, second = rotate_refresh_token(db, first["refresh_token"])
+    assert user_id == alice
+    assert second["refresh_token"] != first["refresh_token"]
+    access = HTTPAuthorizationCredentials(scheme="Bearer", credentials=second["access_token"])
+    assert await get_current_user_id(access, async_db) == alice
+
+    # Replaying the rotated token revokes the session: the newer pair stops working too
+    assert rotate_refresh_token(db, first["refresh_token"]) is None
+    assert rotate_refresh_token(db, second["refresh_token"]) is None
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user_id(access, async_db)
+    assert exc.value.status_code == 401
+    assert rotate_refresh_token(db, "not-a-token") is None
+
+
+@pytest.mark.asyncio
+async def test_logout_and_deactivation_revoke_access_tokens(db, async_db):
+    """Test revoked sessions reject their access tokens before they expire"""
+    alice, bob = create_test_user("alice", db), create_test_user("bob", db)
+    alice_tokens, bob_tokens, other = start_session(db, alice), start_session(db, bob), start_session(db, alice)
+    alice_access = HTTPAuthorizationCredentials(scheme="Bearer", credentials=alice_tokens["access_token"])
+    other_access = HTTPAuthorizationCredentials(scheme="Bearer", credentials=other["access_token"])
+
+    revoke_session(db, decode_token(alice_tokens["access_token"])["sid"])
+    with pytest.raises(HTTPException):
+        await get_current_user_id(alice_access, async_db)
+    # Alice's other session is unaffected
+    assert await get_current_user_id(other_access, async_db) == alice
+
+    assert deactivate_user(db, bob)
+    with pytest.raises(HTTPException):
+        await get_current_user_id(HTTPAuthorizationCredentials(scheme="Bearer", credentials=bob_tokens["access_token"]), async_db)
+    assert rotate_refresh_token(db, bob_tokens["refresh_token"]) is None
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_pool_sheds_load_when_saturated(monkeypatch):
+    """Test hashing runs off the loop and excess requests fail fast with 503"""
+    import asyncio
+    from app.core import security
+    from app.core.security import get_password_hash_async, verify_password_async
+
+    hashed = await get_password_hash_async("testpass123")
+    assert await verify_password_async("testpass123", hashed)
+    assert not await verify_password_async("wrong-password", hashed)
+
+    monkeypatch.setattr(security.settings, "PASSWORD_HASH_MAX_PENDING", 2)
+    results = await asyncio.gather(
+        *(verify_password_async("testpass123", hashed) for _ in range(4)),
+        return_exceptions=True,
+    )
+
+    assert results[:2] == [True, True]
+    assert all(isinstance(r, HTTPException) and r.status_code == 503 for r in results[2:])
+    assert security._hash_in_flight == 0
+
+
+def other_type_token(user_id: str) -> str:
+    """A validly signed JWT that is not an access token"""
+    from datetime import datetime, timedelta
+    from jose import jwt
+    from app.core.config import settings
+    claims = {"sub": user_id, "type": "refresh", "exp": datetime.utcnow() + timedelta(minutes=5)}
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+@pytest.mark.asyncio
+async def test_signaling_socket_rejects_revoked_and_non_access_tokens(db, monkeypatch):
+    """Test the WebRTC socket authenticates like get_current_user_id"""
+    from app.routes import webrtc
+    monkeypatch.setattr(webrtc, "AsyncSessionLocal", AsyncTestingSessionLocal)
+    alice = create_test_user("alice", db)
+    tokens = start_session(db, alice)
+
+    assert await webrtc.get_user_from_token(tokens["access_token"]) == alice
+    assert await webrtc.get_user_from_token(f"Bearer {tokens['access_token']}") == alice
+    assert await webrtc.get_user_from_token(other_type_token(alice)) is None
+
+    revoke_session(db, decode_token(tokens["access_token"])["sid"])
+    assert await webrtc.get_user_from_token(tokens["access_token"]) is None
+
+
+def test_presence_socket_rejects_revoked_and_non_access_tokens(db, monkeypatch):
+    """Test the presence socket refuses tokens of logged-out sessions and non-access tokens"""
+    from fastapi.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+    from app.main import app
+    from app.routes import calls
+    monkeypatch.setattr(calls, "AsyncSessionLocal", AsyncTestingSessionLocal)
+    alice = create_test_user("alice", db)
+    tokens = start_session(db, alice)
+    revoke_session(db, decode_token(tokens["access_token"])["sid"])
+
+    client = TestClient(app)
+    for token in (tokens["access_token"], other_type_token(alice)):
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with client.websocket_connect(f"/calls/ws/{alice}?token={token}") as websocket:
+                websocket.receive_text()
+        assert exc.value.code == 1008
@@ -0,0 +1,99 @@
+"""Tests for user search and the in-process search index"""
+from app.schemas.user import UserCreate, UserUpdate
+from app.utils.user_search import (
+    search_users, normalize_query, trigrams, similarity,
+    encode_search_cursor, decode_search_cursor
+)
+from app.utils.user_service import block_user, create_user, update_user
+
+
+def usernames(results):
+    return [result.username for result in results]
+
+
+def test_trigrams_match_pg_trgm():
+    """Test trigrams and similarity follow pg_trgm's definitions"""
+    assert trigrams("Word") == {"  w", " wo", "wor", "ord", "rd "}
+    assert trigrams("a_b") == trigrams("a b")
+    assert round(similarity(trigrams("word"), trigrams("two words")), 6) == 0.363636
+    assert normalize_query("  Priya   SHARMA ") == "priya sharma"
+
+
+def test_prefix_matches_username_and_name_words(db, create_test_user):
+    """Test prefixes of the username, the full name and later name words all match"""
+    viewer = create_test_user("viewer", db, full_name="Viewer")
+    create_test_user("priya_s", db, full_name="Priya Sharma")
+    create_test_user("rahul", db, full_name="Rahul Sharma")
+    create_test_user("ananya", db, full_name="Ananya Iyer")
+
+    assert usernames(search_users(db, viewer, "pr")) == ["priya_s"]
+    assert sorted(usernames(search_users(db, viewer, "sha"))) == ["priya_s", "rahul"]
+    assert usernames(search_users(db, viewer, "rahul sh")) == ["rahul"]
+    assert search_users(db, viewer, "vi") == []
+
+
+def test_fuzzy_matches_rank_after_prefix_matches(db, create_test_user):
+    """Test typos match by similarity, below exact prefix matches"""
+    viewer = create_test_user("viewer", db, full_name="Viewer")
+    create_test_user("sharmila", db, full_name="Sharmila Rao")
+    create_test_user("rahul", db, full_name="Rahul Sharma")
+
+    results = search_users(db, viewer, "sharmla")
+    assert usernames(results)[0] == "sharmila"
+    assert all(result.score < 1.0 for result in results)
+    assert search_users(db, viewer, "xyzzy") == []
+
+    results = search_users(db, viewer, "sharm")
+    assert sorted(usernames(results)) == ["rahul", "sharmila"]
+    assert all(result.score > 1.0 for result in results)
+    # The username prefix is closer to the query than the surname in a longer name
+    assert usernames(results)[0] == "sharmila"
+
+
+def test_search_hides_blocks_and_unavailable_users(db, create_test_user):
+    """Test blocked users, blockers, inactive and unverified users are never returned"""
+    viewer = create_test_user("viewer", db, full_name="Viewer")
+    blocked = create_test_user("sam_blocked", db, full_name="Sam One")
+    blocker = create_test_user("sam_blocker", db, full_name="Sam Two")
+    create_test_user("sam_inactive", db, full_name="Sam Three", is_active=False)
+    create_test_user("sam_unverified", db, full_name="Sam Four", is_verified=False)
+    create_test_user("sam_ok", db, full_name="Sam Five")
+    block_user(db, viewer, blocked)
+    block_user(db, blocker, viewer)
+
+    assert usernames(search_users(db, viewer, "sam")) == ["sam_ok"]
+
+
+def test_search_pages_cover_every_match_once(db, create_test_user):
+    """Test keyset pages return each match exactly once, best first"""
+    viewer = create_test_user("viewer", db, full_name="Viewer")
+    expected = {create_test_user(f"kiit{i:02d}", db, full_name=f"Student {i}") for i in range(11)}
+
+    seen, after, scores = [], None, []
+    while True:
+        page = search_users(db, viewer, "kiit", limit=4, after=after)
+        seen.extend(result.id for result in page)
+        scores.extend(result.score for result in page)
+        if len(page) < 4:
+            break
+        after = decode_search_cursor(encode_search_cursor(page[-1].score, page[-1].id))
+
+    assert sorted(seen) == sorted(expected)
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_index_follows_new_and_renamed_users(db, create_test_user):
+    """Test create_user and update_user keep a built index current"""
+    viewer = create_test_user("viewer", db, full_name="Viewer")
+    assert search_users(db, viewer, "meera") == []
+
+    user = create_user(db, UserCreate(
+        email="meera@kiit.ac.in", username="meera", full_name="Meera Nair", password="password123"
+    ), hashed_password="not-a-real-hash")
+    user.is_verified = True
+    db.commit()
+    assert usernames(search_users(db, viewer, "meera")) == ["meera"]
+
+    update_user(db, user, UserUpdate(full_name="Meera Krishnan"))
+    assert usernames(search_users(db, viewer, "krish")) == ["meera"]
+    assert search_users(db, viewer, "nair") == []
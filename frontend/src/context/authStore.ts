@@ -19,7 +19,7 @@ export interface AuthStore {
   isAuthenticated: boolean
   initialized: boolean
   setUser: (user: User) => void
-  setToken: (token: string) => void
+  setToken: (token: string, refreshToken?: string) => void
   init: () => Promise<void>
   logout: () => void
 }
@@ -32,8 +32,11 @@ export const useAuthStore = create<AuthStore>((set) => ({
   
   setUser: (user: User) => set({ user, isAuthenticated: true }),
   
-  setToken: (token: string) => {
+  setToken: (token: string, refreshToken?: string) => {
     localStorage.setItem('token', token)
+    if (refreshToken) {
+      localStorage.setItem('refresh_token', refreshToken)
+    }
     set({ token, isAuthenticated: true })
   },
 
@@ -46,16 +49,19 @@ export const useAuthStore = create<AuthStore>((set) => ({
 
     try {
       const user = await authService.getCurrentUser()
-      set({ user, token, isAuthenticated: true, initialized: true })
+      // The request may have refreshed an expired access token
+      set({ user, token: localStorage.getItem('token'), isAuthenticated: true, initialized: true })
     } catch (err) {
       console.error('Auth init failed', err)
       localStorage.removeItem('token')
+      localStorage.removeItem('refresh_token')
       set({ user: null, token: null, isAuthenticated: false, initialized: true })
     }
   },
   
   logout: () => {
     localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
     set({ user: null, token: null, isAuthenticated: false, initialized: true })
   }
 }))
@@ -440,6 +440,14 @@ export const Call = () => {
         }, 500)
         return
       }
+      if (message.type === 'call_missed') {
+        setError('No answer.')
+        cleanupCall()
+        setTimeout(() => {
+          window.location.href = '/dashboard'
+        }, 500)
+        return
+      }
       if (message.type === 'call_ended') {
         setError('Call ended.')
         cleanupCall()
@@ -23,6 +23,13 @@ interface CallResponse {
   duration_seconds: number
 }
 
+interface DashboardResponse {
+  pending_call: CallResponse | null
+  active_call: CallResponse | null
+  available_users: AvailableUser[]
+  available_users_cursor: string | null
+}
+
 export const Dashboard = () => {
   const user = useAuthStore(state => state.user)
   const [availableUsers, setAvailableUsers] = useState<AvailableUser[]>([])
@@ -49,7 +56,7 @@ export const Dashboard = () => {
       }
 
       isPollingRef.current = true
-      await Promise.all([fetchAvailableUsers(), fetchPendingCall()])
+      await fetchDashboard()
       isPollingRef.current = false
 
       if (isMountedRef.current) {
@@ -67,14 +74,16 @@ export const Dashboard = () => {
     }
   }, [user?.id])
 
-  const fetchAvailableUsers = async () => {
+  // Available users and the pending call in one request
+  const fetchDashboard = async () => {
     try {
       setError(null)
-      const response = await api.get('/calls/available')
+      const response = await api.get<DashboardResponse>('/dashboard')
       if (!isMountedRef.current) return
-      setAvailableUsers(response.data)
+      setAvailableUsers(response.data.available_users)
+      setPendingCall(response.data.pending_call)
     } catch (err: any) {
-      console.error('Error fetching available users:', err)
+      console.error('Error fetching dashboard:', err)
       if (!isMountedRef.current) return
       if (err.response?.status !== 404) {
         setError(err.response?.data?.detail || 'Failed to fetch available users')
@@ -82,16 +91,6 @@ export const Dashboard = () => {
     }
   }
 
-  const fetchPendingCall = async () => {
-    try {
-      const response = await api.get<CallResponse | null>('/calls/pending')
-      if (!isMountedRef.current) return
-      setPendingCall(response.data)
-    } catch (err) {
-      console.error('Error fetching pending call:', err)
-    }
-  }
-
   const handleAcceptCall = async () => {
     if (!pendingCall) return
 
@@ -155,6 +154,7 @@ export const Dashboard = () => {
       api.post('/auth/logout').catch(() => null)
     } finally {
       localStorage.removeItem('token')
+      localStorage.removeItem('refresh_token')
       navigate('/login')
     }
   }
@@ -30,7 +30,7 @@ export const Login: FC = () => {
         }
       } else {
         const response = await authService.verifyLoginOtp(email, otp)
-        setToken(response.access_token)
+        setToken(response.access_token, response.refresh_token)
         setUser(response.user)
 
         setTimeout(() => {
@@ -29,7 +29,7 @@ export const VerifyEmail: FC = () => {
         token,
       })
 
-      setToken(response.data.access_token)
+      setToken(response.data.access_token, response.data.refresh_token)
       setUser(response.data.user)
       setSuccess(true)
 
@@ -1,4 +1,4 @@
-import axios, { InternalAxiosRequestConfig } from 'axios'
+import axios, { AxiosError, InternalAxiosRequestConfig } from 'axios'
 
 const API_BASE_URL = (((import.meta as unknown) as Record<string, Record<string, string>>).env.VITE_API_URL) || 'http://localhost:8000'
 
@@ -19,4 +19,36 @@ api.interceptors.request.use((config: InternalAxiosRequestConfig) => {
   return config
 })
 
+// Access tokens are short-lived: on a 401, trade the refresh token for a new pair once
+// and retry. Concurrent 401s share one refresh request, since each refresh token works once.
+let refreshing: Promise<string | null> | null = null
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) return null
+  try {
+    const response = await axios.post(`${API_BASE_URL}/auth/refresh`, { refresh_token: refreshToken }, { withCredentials: true })
+    localStorage.setItem('token', response.data.access_token)
+    localStorage.setItem('refresh_token', response.data.refresh_token)
+    return response.data.access_token
+  } catch {
+    localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
+    return null
+  }
+}
+
+api.interceptors.response.use(undefined, async (error: AxiosError) => {
+  const config = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined
+  if (error.response?.status !== 401 || !config || config._retried || config.url?.startsWith('/auth/')) {
+    throw error
+  }
+  refreshing = refreshing || refreshAccessToken().finally(() => { refreshing = null })
+  const token = await refreshing
+  if (!token) throw error
+  config._retried = true
+  config.headers.Authorization = `Bearer ${token}`
+  return api(config)
+})
+
 export default api